@@ -0,0 +1,256 @@
+# ODV parser benchmark
+# times the stages of the ODV parser (reading, building the table, processing and saving) on synthetic ODV files,
+# records their peak memory and saves the results, so that they can be compared between versions
+
+
+
+import os
+import sys
+import re
+import time
+import json
+import shutil
+import logging
+import platform
+import argparse
+import tempfile
+import tracemalloc
+import warnings
+from types import NoneType
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import ODV_parse
+import ODV_generate
+
+
+
+# USER VARIABLES
+
+# the benchmark runs, each one with its own generated files (name, file count, minimum rows, maximum rows)
+setting_benchmark_run_list = [
+    ("small_files", 2000, 1, 10),
+    ("large_files", 100, 200, 2000)
+]
+
+# number of times each run is timed, the fastest time is kept
+setting_repeat_count = 3
+
+# level of the messages of the parser during the benchmark (its log is not written to a file)
+# at levels above "INFO" the valid measurements are not counted after each processing step
+setting_logger_level = "WARNING"
+
+# directory in which the results are saved (one .json file for each benchmark)
+setting_result_directory = "benchmark_results"
+
+
+
+# PROGRAM CONSTANTS
+
+# the timed stages of the parser, in order
+_stage_list = ["get_odv_file_contents", "get_table", "process_and_improve_data", "save_data"]
+
+
+
+# FUNCTION DEFINITIONS
+
+
+# sets up the parser as its main function would, but without writing a log file
+def parser_init() -> None:
+    ODV_parse._datetime_regex = re.compile(ODV_parse._datetime_regex_string)
+    ODV_parse._logger.handlers = [logging.NullHandler()]
+    ODV_parse._logger.setLevel(setting_logger_level)
+    ODV_parse._logger.propagate = False
+    # files with nearly identical Chl values make the z-score calculation warn about its precision
+    warnings.simplefilter("ignore", RuntimeWarning)
+
+
+# runs all stages of the parser on the files once
+# if measure_memory is True, the peak memory of each stage is measured instead of the time (tracing the memory slows the stages down)
+# returns a dictionary with the seconds (or peak bytes) for each stage, and the number of rows and files in and out of each stage
+def run_stages(file_list: list, filename_out: str, measure_memory: bool = False) -> dict:
+    result = {stage: {"value": 0, "rows_in": 0, "rows_out": 0, "files_in": 0, "files_out": 0} for stage in _stage_list}
+
+    # starts measuring a stage, returns the start time
+    def measure_start() -> float:
+        if measure_memory:
+            tracemalloc.reset_peak()
+            return tracemalloc.get_traced_memory()[0]
+        return time.perf_counter()
+    # stops measuring a stage, adds the time to the total (or keeps the highest peak memory)
+    def measure_stop(stage: str, start: float) -> None:
+        if measure_memory:
+            result[stage]["value"] = max(result[stage]["value"], tracemalloc.get_traced_memory()[1] - start)
+        else:
+            result[stage]["value"] += time.perf_counter() - start
+    # counts the rows and the files going in and out of a stage
+    def count(stage: str, rows_in: int, rows_out: int, valid: bool = True) -> None:
+        result[stage]["rows_in"] += rows_in
+        result[stage]["rows_out"] += rows_out
+        result[stage]["files_in"] += 1
+        result[stage]["files_out"] += int(valid)
+
+    # the files are filtered the same way as in the main function of the parser, using its own functions
+    file_list = [(file_full_path, file_dict) for (file_full_path, file_dict) in file_list if ODV_parse.file_quality_is_sufficient(file_dict)]
+    data_list = []
+    for (seq, (file_full_path, file_dict)) in enumerate(file_list, start = 1):
+        start = measure_start()
+        (column_name_list, value_table) = ODV_parse.get_odv_file_contents(file_full_path, ODV_parse.get_row_limit(file_dict))
+        measure_stop("get_odv_file_contents", start)
+        row_count = max([len(values) for values in value_table if values is not None], default = 0)
+        count("get_odv_file_contents", row_count, row_count)
+
+        start = measure_start()
+        dataObject = ODV_parse.get_table(column_name_list, value_table)
+        measure_stop("get_table", start)
+        count("get_table", row_count, dataObject.row_count())
+        dataObject.file_name = os.path.basename(file_full_path)
+        dataObject.settings = file_dict
+
+        if not ODV_parse.dataObject_is_useful(dataObject):
+            continue
+        ODV_parse.dataObject_select_first(dataObject)
+
+        row_count = dataObject.row_count()
+        start = measure_start()
+        dataObject = ODV_parse.process_and_improve_data(dataObject, seq)
+        measure_stop("process_and_improve_data", start)
+        count("process_and_improve_data", row_count, dataObject.row_count() if dataObject.valid else 0, dataObject.valid)
+        if dataObject.valid:
+            data_list.append(dataObject)
+
+    row_count = sum([dataObject.row_count() for dataObject in data_list])
+    start = measure_start()
+    ODV_parse.save_data(data_list, filename_out)
+    measure_stop("save_data", start)
+    result["save_data"].update({"rows_in": row_count, "rows_out": row_count, "files_in": len(data_list), "files_out": len(data_list)})
+    return result
+
+
+# runs a single benchmark: generates the files, times each stage (keeping the fastest of the repeats) and measures their peak memory
+def run_benchmark(directory: str, name: str, file_count: int, row_count_min: int, row_count_max: int, seed: int, repeat_count: int) -> dict:
+    directory_run = os.path.join(directory, name)
+    ODV_generate.setting_row_count_min = row_count_min
+    ODV_generate.setting_row_count_max = row_count_max
+    filelist_path = ODV_generate.generate_odv_files(directory_run, file_count, seed)
+    file_list = ODV_parse.get_filenames_to_be_parsed(filelist_path)
+    filename_out = os.path.join(directory_run, "situ.csv")
+
+    time_list = []
+    for _ in range(max(1, repeat_count)):
+        time_list.append(run_stages(file_list, filename_out))
+    tracemalloc.start()
+    memory = run_stages(file_list, filename_out, measure_memory = True)
+    tracemalloc.stop()
+
+    stage_list = []
+    for stage in _stage_list:
+        seconds = min([result[stage]["value"] for result in time_list])
+        counts = time_list[0][stage]
+        stage_list.append({
+            "stage": stage,
+            "seconds": seconds,
+            "peak_memory_bytes": memory[stage]["value"],
+            "rows_in": counts["rows_in"],
+            "rows_out": counts["rows_out"],
+            "files_in": counts["files_in"],
+            "files_out": counts["files_out"],
+            "rows_per_second": counts["rows_in"] / seconds if seconds > 0 else None
+        })
+    return {
+        "name": name,
+        "file_count": file_count,
+        "row_count_min": row_count_min,
+        "row_count_max": row_count_max,
+        "seed": seed,
+        "repeat_count": repeat_count,
+        "stages": stage_list
+    }
+
+
+# finds the results of the same benchmark and stage in previously saved results, returns None if they don't exist
+def find_previous_stage(previous: dict | NoneType, name: str, stage: str) -> dict | NoneType:
+    if previous is None:
+        return None
+    for benchmark in previous["benchmarks"]:
+        if benchmark["name"] != name:
+            continue
+        for previous_stage in benchmark["stages"]:
+            if previous_stage["stage"] == stage:
+                return previous_stage
+    return None
+
+
+# prints the results, along with the change from the previous results (if given)
+def print_results(results: dict, previous: dict | NoneType) -> None:
+    print("{:<14s}{:<26s}{:>12s}{:>10s}{:>14s}{:>10s}{:>12s}".format("benchmark", "stage", "seconds", "change", "peak memory", "change", "rows/s"))
+    for benchmark in results["benchmarks"]:
+        for stage in benchmark["stages"]:
+            previous_stage = find_previous_stage(previous, benchmark["name"], stage["stage"])
+            time_change = ""
+            memory_change = ""
+            if previous_stage is not None:
+                if previous_stage["seconds"] > 0:
+                    time_change = "{:+.1%}".format(stage["seconds"] / previous_stage["seconds"] - 1)
+                if previous_stage["peak_memory_bytes"] > 0:
+                    memory_change = "{:+.1%}".format(stage["peak_memory_bytes"] / previous_stage["peak_memory_bytes"] - 1)
+            print("{:<14s}{:<26s}{:>12.4f}{:>10s}{:>12.2f}MB{:>10s}{:>12.0f}".format(
+                benchmark["name"], stage["stage"], stage["seconds"], time_change,
+                stage["peak_memory_bytes"] / (1 << 20), memory_change, stage["rows_per_second"] or 0))
+
+
+
+
+# main function
+def main() -> None:
+
+    argument_parser = argparse.ArgumentParser(description="Benchmarks the ODV parser on synthetic ODV files.")
+    argument_parser.add_argument("--label", default=time.strftime("%Y%m%d_%H%M%S"), help="name of the saved results (for example the version of the parser)")
+    argument_parser.add_argument("--compare", default=None, help="previously saved results (.json file) to compare with")
+    argument_parser.add_argument("--repeat", type=int, default=setting_repeat_count, help="number of times each benchmark is timed")
+    argument_parser.add_argument("--seed", type=int, default=ODV_generate.setting_seed, help="seed of the generated files")
+    argument_parser.add_argument("--scale", type=float, default=1.0, help="multiplies the number of files of each benchmark")
+    argument_parser.add_argument("--directory", default=None, help="directory for the generated files (a temporary directory is used and removed if not given)")
+    arguments = argument_parser.parse_args()
+
+    parser_init()
+
+    directory = arguments.directory
+    if directory is None:
+        directory = tempfile.mkdtemp(prefix="odv_benchmark_")
+    try:
+        benchmark_list = []
+        for (name, file_count, row_count_min, row_count_max) in setting_benchmark_run_list:
+            file_count = max(1, int(file_count * arguments.scale))
+            benchmark_list.append(run_benchmark(directory, name, file_count, row_count_min, row_count_max, arguments.seed, arguments.repeat))
+    finally:
+        if arguments.directory is None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    results = {
+        "label": arguments.label,
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": ODV_parse.np.__version__,
+        "platform": platform.platform(),
+        "benchmarks": benchmark_list
+    }
+
+    previous = None
+    if arguments.compare is not None:
+        with open(arguments.compare, "r", encoding="UTF-8") as f:
+            previous = json.load(f)
+    print_results(results, previous)
+
+    os.makedirs(setting_result_directory, exist_ok=True)
+    filepath_result = os.path.join(setting_result_directory, arguments.label + ".json")
+    with open(filepath_result, "w", encoding="UTF-8") as f:
+        json.dump(results, f, indent=4)
+    print("Saved results to '{:}'.".format(filepath_result))
+
+
+
+
+
+
+if __name__ == "__main__":
+    main()
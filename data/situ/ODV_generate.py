@@ -0,0 +1,244 @@
+# synthetic ODV file generator
+# generates SeaDataNet-like ODV files (and a file list for them) that can be used to test and benchmark the ODV parser
+
+
+
+import os
+import sys
+import random
+import argparse
+import typing as ty
+from types import NoneType
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import ODV_parse
+
+
+
+# USER VARIABLES
+
+# number of generated files
+setting_file_count = 500
+
+# minimum and maximum number of measurements (rows) in a generated file
+setting_row_count_min = 1
+setting_row_count_max = 40
+
+# seed of the random number generator, the same seed always generates the same files
+setting_seed = 1
+
+# probability that a file starts with a byte order mark
+setting_probability_bom = 0.3
+# probability that a file has a column with the floor depth
+setting_probability_floor_depth = 0.3
+# probability that a file has another (lower priority) Chl column
+setting_probability_duplicate_chl = 0.1
+# probability that a numerical value uses a comma as the decimal separator
+setting_probability_comma_decimal = 0.05
+# probability that a measurement repeats the Chl value of the measurement before it
+setting_probability_repeated_row = 0.2
+# probability that a value is missing
+setting_probability_missing_value = 0.05
+# probability that a comment line is inserted between the measurements
+setting_probability_inline_comment = 0.02
+# probability that the date of a station is not a real date (February 30th), which the parser keeps and the joining scripts have to leave out
+setting_probability_invalid_date = 0.01
+
+# the share of the files of each kind
+# profile: measurements at different depths of a single station (same time and location)
+# series: measurements at changing times (and locations)
+# single: a single measurement
+# constant: measurements with the same Chl value
+setting_file_kind_weights = {
+    "profile": 4,
+    "series": 4,
+    "single": 1,
+    "constant": 1
+}
+
+
+
+# PROGRAM CONSTANTS
+
+# the spelling of each column name in the generated files (the columns that are not parsed are also present in real files)
+_column_header_time = ["yyyy-mm-ddThh:mm:ss.sss", "time_ISO8601 [yyyy-mm-ddThh:mm:ss.sss]"]
+_column_header_metadata = ["Cruise", "Station", "Type"]
+_column_header_unused = ["LOCAL_CDI_ID", "EDMO_code"]
+_column_header_lon = "Longitude [degrees_east]"
+_column_header_lat = "Latitude [degrees_north]"
+_column_header_bot_depth = "Bot. Depth [m]"
+_column_header_floor_depth = "Sea-floor depth [m]"
+_column_header_quality = ODV_parse._column_name_quality
+
+# the quality values of the Chl measurements, and how often they occur
+_quality_value_list = ["1", "1", "1", "1", "2", "3", "4", "9", ""]
+
+# the area of the generated measurements (Adriatic Sea)
+_lon_range = (12.0, 19.5)
+_lat_range = (40.0, 45.7)
+_year_range = (2009, 2021)
+
+
+
+# FUNCTION DEFINITIONS
+
+
+# gets the names of all columns in the name map that are mapped to the given column name
+# a name is written in one of the ways it appears in the real files (lower case units)
+def get_column_header_list(column_name: str) -> ty.List[str]:
+    header_list = []
+    for header, name in ODV_parse._column_name_map.items():
+        if name != column_name:
+            continue
+        if "[" in header:
+            ri = header.find("[")
+            header = header[:ri].capitalize() + header[ri:].lower()
+        header_list.append(header)
+    return header_list
+
+
+# formats a float value, using a comma as the decimal separator with the given probability
+def format_float(rnd: random.Random, value: float, precision: int = 3) -> str:
+    text = str(round(value, precision))
+    if rnd.random() < setting_probability_comma_decimal:
+        text = text.replace(".", ",")
+    return text
+
+
+# generates the lines of a single ODV file
+def generate_odv_file_lines(rnd: random.Random) -> ty.List[str]:
+    kind = rnd.choices(list(setting_file_kind_weights.keys()), list(setting_file_kind_weights.values()))[0]
+    row_count = 1 if kind == "single" else rnd.randint(max(2, setting_row_count_min), max(2, setting_row_count_max))
+
+    # the columns of the file, each data column is followed by its quality column
+    header_time = rnd.choice(_column_header_time)
+    header_depth = rnd.choice(get_column_header_list("SampleDepth"))
+    header_chl_list = rnd.sample(get_column_header_list("Chl"), 2)
+    has_duplicate_chl = rnd.random() < setting_probability_duplicate_chl
+    has_floor_depth = rnd.random() < setting_probability_floor_depth
+    header_list = _column_header_metadata + [header_time, _column_header_lon, _column_header_lat] + _column_header_unused + [_column_header_bot_depth]
+    header_list += [header_depth, _column_header_quality, header_chl_list[0], _column_header_quality]
+    if has_duplicate_chl:
+        header_list += [header_chl_list[1], _column_header_quality]
+    if has_floor_depth:
+        header_list += [_column_header_floor_depth]
+
+    # the station
+    lon = rnd.uniform(*_lon_range)
+    lat = rnd.uniform(*_lat_range)
+    year = rnd.randint(*_year_range)
+    month = rnd.randint(1, 12)
+    day = rnd.randint(1, 28)
+    if rnd.random() < setting_probability_invalid_date:
+        (month, day) = (2, 30)
+    hour = rnd.randint(0, 23)
+    bot_depth = rnd.uniform(5, 200)
+    chl = rnd.uniform(0.05, 3)
+
+    lines = []
+    lines.append(("\ufeff" if rnd.random() < setting_probability_bom else "") + "//<Encoding>UTF-8</Encoding>")
+    lines.append("//<Creator>synthetic</Creator>")
+    for i in range(rnd.randint(0, 5)):
+        lines.append("//<MetaVariable>label=\"Variable {:}\" var_type=\"TEXT\"</MetaVariable>".format(i))
+    lines.append("\t".join(header_list))
+
+    for row in range(row_count):
+        if kind == "series" and row > 0:
+            # the time and the location change between the measurements
+            hour += 1
+            if hour == 24:
+                (hour, day) = (0, min(day + 1, 28))
+            lon += rnd.choice([0, 0, 0.01])
+        if kind != "constant" and not (row > 0 and rnd.random() < setting_probability_repeated_row):
+            chl = rnd.uniform(-0.1, 4)
+        value_map = {
+            header_time: "{:04d}-{:02d}-{:02d}T{:02d}:{:02d}:00.000".format(year, month, day, hour, rnd.choice([0, 30]) if kind == "series" else 0),
+            _column_header_lon: format_float(rnd, lon, 4),
+            _column_header_lat: format_float(rnd, lat, 4),
+            _column_header_bot_depth: format_float(rnd, bot_depth, 1),
+            header_depth: format_float(rnd, row * 2.5 + 0.5, 1),
+            header_chl_list[0]: format_float(rnd, chl),
+            header_chl_list[1]: format_float(rnd, rnd.uniform(0.05, 3)),
+            _column_header_floor_depth: format_float(rnd, bot_depth + 1, 1),
+            "Cruise": "CR{:}".format(rnd.randint(1, 9)),
+            "Station": "ST{:}".format(rnd.randint(1, 99)),
+            "Type": rnd.choice(["B", "C", "*"]),
+            "LOCAL_CDI_ID": "cdi{:}".format(rnd.randint(1, 99999)),
+            "EDMO_code": "120"
+        }
+        value_list = []
+        for index, header in enumerate(header_list):
+            if header == _column_header_quality:
+                value_list.append(rnd.choice(_quality_value_list) if header_list[index - 1] in header_chl_list else "1")
+            elif row > 0 and kind != "series" and header in [header_time, _column_header_lon, _column_header_lat, _column_header_bot_depth] + _column_header_metadata:
+                # like in the real files, the values of a station are only written in its first line
+                value_list.append("")
+            elif rnd.random() < setting_probability_missing_value:
+                value_list.append("")
+            else:
+                value_list.append(value_map.get(header, ""))
+        lines.append("\t".join(value_list))
+        if rnd.random() < setting_probability_inline_comment:
+            lines.append("//comment")
+    return lines
+
+
+# generates the ODV files and the file list for them
+# returns the path of the file list
+def generate_odv_files(directory: str, file_count: int, seed: int, filelist_path: str | NoneType = None) -> str:
+    rnd = random.Random(seed)
+    directory_raw = os.path.join(directory, "raw")
+    os.makedirs(directory_raw, exist_ok=True)
+    filename_list = []
+    for i in range(file_count):
+        filename = "{:06d}_ODV.txt".format(i)
+        lines = generate_odv_file_lines(rnd)
+        newline = "\r\n" if rnd.random() < 0.2 else "\n"
+        with open(os.path.join(directory_raw, filename), "w", encoding="UTF-8", newline="") as f:
+            f.write(newline.join(lines) + newline)
+        filename_list.append(filename)
+
+    if filelist_path is None:
+        filelist_path = os.path.join(directory, "filelist.txt")
+    with open(filelist_path, "w", encoding="UTF-8") as f:
+        f.write("# synthetic ODV files (seed {:})\n".format(seed))
+        f.write("[root]\n{:}\n\n[whitelist]\n".format(os.path.abspath(directory_raw).replace("\\", "/")))
+        for i, filename in enumerate(filename_list):
+            # the files are split into groups with different tags
+            if i == 0:
+                f.write("[quality:50]\n[filemark:a]\n")
+            elif i == file_count // 3:
+                f.write("[quality:80]\n[select:first]\n[filemark:b]\n")
+            elif i == 2 * file_count // 3:
+                f.write("[quality:100]\n[select:none]\n[filemark:c]\n")
+            f.write(filename + "\n")
+    return filelist_path
+
+
+
+
+# main function
+def main() -> None:
+    global setting_row_count_min
+    global setting_row_count_max
+
+    argument_parser = argparse.ArgumentParser(description="Generates synthetic ODV files with in-situ chlorophyll data.")
+    argument_parser.add_argument("directory", help="directory in which the files are generated (in the 'raw' subdirectory, along with 'filelist.txt')")
+    argument_parser.add_argument("--files", type=int, default=setting_file_count, help="number of generated files")
+    argument_parser.add_argument("--rows-min", type=int, default=setting_row_count_min, help="minimum number of measurements in a file")
+    argument_parser.add_argument("--rows-max", type=int, default=setting_row_count_max, help="maximum number of measurements in a file")
+    argument_parser.add_argument("--seed", type=int, default=setting_seed, help="seed of the random number generator")
+    arguments = argument_parser.parse_args()
+
+    setting_row_count_min = arguments.rows_min
+    setting_row_count_max = arguments.rows_max
+    filelist_path = generate_odv_files(arguments.directory, arguments.files, arguments.seed)
+    print("Generated {:} files, file list: '{:}'".format(arguments.files, filelist_path))
+
+
+
+
+
+
+if __name__ == "__main__":
+    main()
@@ -3,14 +3,28 @@
 
 
 import os
-import sys
 import logging
 import time
 import re
+import argparse
+import multiprocessing
 from types import FunctionType, NoneType
 import typing as ty
 from scipy import stats
+import numpy as np
 import pickle
+import functools
+import hashlib
+import io
+import glob
+import fnmatch
+import gzip
+import zipfile
+import tarfile
+import threading
+import concurrent.futures
+import json
+import csv
 
 
 
@@ -25,6 +39,10 @@ setting_z_score_threshold = float("Inf")
 # set to a value higher than 1 to disable removing measurements
 setting_filter_repeat_coefficient_threshold = 1.1
 
+# level of the messages written to the log file ("DEBUG", "INFO", "WARNING", "ERROR" or "CRITICAL")
+# at levels above "INFO" the valid measurements are not counted after each processing step
+setting_logger_level = "DEBUG"
+
 # print out full tables for each step (visible in the log file)
 setting_logger_print_table_after_each_step = False
 # print out full table at the start (visible in the log file)
@@ -37,9 +55,59 @@ setting_logger_print_table_at_end = False
 # set to '0' to disable
 setting_quality_min_threshold = 0
 
-# serialize and save the data from the parsed files (before the data is processed) and load it back into memory on the next script executions
+# serialize and save the data from each parsed file (before the data is processed) and load it back into memory on the next script executions
+# the saved data of a file is only used if the file has not changed since (same size and modification time), otherwise the file is parsed again
 setting_serialize_and_deserialize_parsed_data = False
 
+# when checking if a file has changed, also compare the hash of its contents (files that were only touched don't have to be parsed again)
+setting_serialize_compare_content_hash = False
+
+# also save the parsed data in a binary format (NumPy .npz file next to the output file, with the same columns)
+# it keeps the types of the values and is much faster to load than the .csv file
+setting_save_binary_output = False
+
+# also save the measurements sorted by their capture datetime (<output>_by_day.csv, with the same columns), along with a table of the row at which each day starts (<output>_by_day_index.csv)
+# the measurements within any time window can then be taken by slicing, without filtering or sorting the whole output (can be enabled with the '--day-index' argument)
+# the measurements without a datetime are left out, and so are the repeated measurements (the same datetime, position and Chl value as an earlier measurement, like 'distinct' in the joining notebook)
+setting_save_day_index = False
+
+# fill the missing sea floor depths (the 'floor_depth' output column) from the bathymetry data (can be enabled with the '--bathymetry' argument)
+# the paths to the bathymetry files are set in bathymetry.py, the depth is the negative of the height of the sea floor at the position of the measurement
+setting_bathymetry_fill_floor_depth = False
+# replace all sea floor depths with the ones from the bathymetry data, including those given in the files
+setting_bathymetry_replace_floor_depth = False
+
+# number of worker processes used to read and process the files (can be overridden with the '--workers' argument)
+# set to '1' to read and process the files sequentially in the main process
+setting_worker_count = 1
+
+# read, filter, process and save the files one at a time instead of keeping the data of all files in memory (can be enabled with the '--streaming' argument)
+# the memory used is then about the size of the largest file, which is needed for very large numbers of files
+# the output is the same, but the binary output (if enabled) still keeps all of its columns in memory until the end
+# the day index (if enabled) is made from the finished output file, keeping only the key columns of all measurements in memory while it is made
+setting_streaming = False
+
+# process all files at once instead of one at a time (can be enabled with the '--batch' argument)
+# the columns of all files are put one after another into a single array for each column, and each processing step is done on all of them together, which is much faster for many small files
+# the output is the same, but the number of valid measurements is not written to the log for each file (and the files are processed per file anyway if the tables are printed)
+setting_batch_processing = False
+
+# number of files that are read ahead (in background threads) while the current file is parsed and processed, hiding the time spent waiting for slow (network) storage
+# it is only used when the files are read in the main process (one worker) and without serialized data (where most files are not read at all)
+# set to '0' to disable (can be overridden with the '--read-ahead' argument)
+setting_read_ahead_file_count = 8
+# maximum number of bytes of the files that are read ahead and kept in memory at once (a larger file is still read when it is the only one)
+setting_read_ahead_max_bytes = 64 * 1024 * 1024
+# number of threads reading the files ahead
+setting_read_ahead_thread_count = 4
+
+# measure the time spent in each stage of the parsing and processing, along with the number of rows and rejected files (can be enabled with the '--instrumentation' argument)
+# the report is saved next to the output file (<output>_instrumentation.json and <output>_instrumentation.csv)
+setting_instrumentation = False
+
+# number of the slowest files listed in the instrumentation report
+setting_instrumentation_slowest_file_count = 10
+
 
 
 # PROGRAM VARIABLES
@@ -49,12 +117,26 @@ _logger = logging.getLogger("main")
 _time_start = None
 
 _column_names = []
+_column_name_index_map = {}
 
-_data_raw_serialized_filename = "data_raw_serialized.dat"
+_data_raw_serialized_directory = "data_raw_serialized"
+
+# increase when the parsing of the files changes, so that the previously serialized data is not used anymore
+_parser_version = 2
 
 _input_filename = "filelist.txt"
 _input_filename_out = "situ.csv"
 
+_worker_log_handler = None
+
+_read_ahead = None # FileReadAhead object, None if the files are not read ahead
+
+_bathymetry = None # bathymetry.BathymetryGrid object, None if the sea floor depths are not filled from the bathymetry data
+
+_archive_map = {} # the archives opened by this process (archive path -> ZipFile or TarFile object), kept open so that their index is only read once
+
+_instrumentation = None # Instrumentation object, None if the instrumentation is disabled
+
 
 
 # PROGRAM CONSTANTS
@@ -126,6 +208,36 @@ _column_names_out_list = [
     "file_type"
 ]
 
+# the columns of the dataObjects from which the values of the output columns are taken
+_column_out_source_map = {
+    "date_time": "DateTime",
+    "lon": "Lon",
+    "lat": "Lat",
+    "chl": "Chl",
+    "bot_depth": "BotDepth",
+    "floor_depth": "FloorDepth",
+    "sample_depth": "SampleDepth"
+}
+
+# the types of the output columns in the binary output file
+_column_out_binary_dtype_map = {
+    "file_id": np.int64,
+    "seq_in": np.int64,
+    "total_in": np.int64,
+    "seq_all": np.int64,
+    "date_time": str,
+    "exact_datetime": str,
+    "lon": np.float64,
+    "lat": np.float64,
+    "chl": np.float64,
+    "chl_repeat_coef": np.float64,
+    "bot_depth": np.float64,
+    "floor_depth": np.float64,
+    "sample_depth": np.float64,
+    "quality": np.float64,
+    "file_type": str
+}
+
 _column_original_name_priority_list = {
     "DateTime": [
         "YYYY-MM-DDTHH:MM:SS.SSS",
@@ -178,48 +290,183 @@ _column_name_to_metadata = [
 _column_name_quality = "QV:SEADATANET"
 
 
+# the arrays of a columnObject with a value for each row (see ColumnObject.take)
+_column_row_array_list = ["values", "missing", "quality", "has_quality", "valid", "copied", "is_repeated"]
+
+
+# the extensions of the archives whose members can be listed in the file list (with the archive as the root)
+# a single compressed file ('.gz') can be listed like any other file
+_archive_extension_list = (".zip", ".tar.gz", ".tgz", ".tar")
+_compressed_file_extension = ".gz"
+
+# the maximum number of distinct column definitions (headers) whose column plans are kept
+_column_plan_cache_size = 256
+
+# the days of the day index are counted from this time (the same as in the joining notebook)
+_day_index_origin = np.datetime64("2000-01-01T00:00:00", "s")
+
+# the columns of the output that identify a repeated measurement in the day index
+_day_index_key_column_list = ["date_time", "lon", "lat", "chl"]
+
+
 _datetime_regex_string = r"(?P<year>\d{4}).(?P<month>\d{1,2}).(?P<day>\d{1,2})[T|t]?(?P<hour>\d{1,2}).(?P<minute>\d{1,2}).(?P<second>\d{1,2})"
 _datetime_regex = None
 
+# the common ISO 8601 datetime layout ('YYYY-MM-DDTHH:MM:SS', optionally followed by the fractions of a second)
+_datetime_iso_length = 19
+_datetime_iso_separator_map = {
+    4: "-",
+    7: "-",
+    10: "T",
+    13: ":",
+    16: ":"
+}
+_datetime_iso_part_map = {
+    "year": (0, 4),
+    "month": (5, 7),
+    "day": (8, 10),
+    "hour": (11, 13),
+    "minute": (14, 16),
+    "second": (17, 19)
+}
+
 
 
 # OBJECT DEFINITIONS
 
 
 
-class ValueObject(object):
-    def __init__(self):
-        self.value = None # the value of the cell in this position; can be numeric, a string value (text or datetime), or None if the value is missing
-        self.quality = None # if the column had a corresponding QV:SEADATANET value, it is stored here
-        self.valid = True # if False, the value had a QV:SEADATANET value that indicated an error (was not 1)
-        self.copied = False # if True, the value was copied from the one above it during the processing of the data
-        self.is_repeated: bool = False # if True, it has the same value as the one above
-
 class ColumnObject(object):
     def __init__(self):
         self.name = None # the name of the column, can be one of several that are defined in the program
         self.original_name = None # the exact text that was used in the original file to name the column
-        self.values = [] # the list of values
+        self.values = np.empty(0, dtype=object) # the array of values; float64 for numerical columns (NaN where missing), object for text and datetime columns
+        self.missing = np.zeros(0, dtype=bool) # True where the value is missing (None)
+        self.quality = np.zeros(0, dtype=np.int8) # if the column had a corresponding QV:SEADATANET value, it is stored here
+        self.has_quality = np.zeros(0, dtype=bool) # True where the quality value is set
+        self.valid = np.ones(0, dtype=bool) # if False, the value had a QV:SEADATANET value that indicated an error (was not 1)
+        self.copied = np.zeros(0, dtype=bool) # if True, the value was copied from the one above it during the processing of the data
+        self.is_repeated = np.zeros(0, dtype=bool) # if True, it has the same value as the one above
         self.repeating = False # if there was more than one measurement but the value of this column was only in the first line, the value was repeated and this value is True
         self.repeat_coefficient = None # the coefficient indicating how many sequential pairs of values are the same; 0 if none are the same, 1 if all are
         self.low_priority = False # if there are multiple columns of a type in the same dataObject, only one of them can be main, others are marked with low_priority = True
-    def repeat_coefficient_recalculate(self) -> None: # recalculates the low_priority property
-        previous = None
-        count_all = 0
-        count_repeat = 0
-        for valueObject in self.values:
-            if previous != None and valueObject.value == previous.value:
-                count_repeat += 1
-            count_all += 1
-            previous = valueObject
+    def set_values(self, values: np.ndarray, missing: np.ndarray | NoneType = None) -> None: # sets the values and (re)allocates the per-value flag arrays
+        count = len(values)
+        self.values = values
+        self.missing = np.zeros(count, dtype=bool) if missing is None else missing
+        self.quality = np.zeros(count, dtype=np.int8)
+        self.has_quality = np.zeros(count, dtype=bool)
+        self.valid = np.ones(count, dtype=bool)
+        self.copied = np.zeros(count, dtype=bool)
+        self.is_repeated = np.zeros(count, dtype=bool)
+    def is_numeric(self) -> bool:
+        return self.values.dtype != object
+    def get_value(self, index: int): # returns the value at the given index as a Python object (None if missing)
+        if self.missing[index]:
+            return None
+        return self.values[index].item() if self.is_numeric() else self.values[index]
+    def set_value(self, index: int, value) -> None:
+        self.missing[index] = value is None
+        if self.is_numeric():
+            self.values[index] = float("NaN") if value is None else value
+        else:
+            self.values[index] = value
+    def get_value_list(self) -> list: # returns all values as a list of Python objects (None where missing)
+        value_list = self.values.tolist()
+        for index in np.flatnonzero(self.missing):
+            value_list[index] = None
+        return value_list
+    def none_mask(self) -> np.ndarray: # True where the value is None, NaN or an empty string
+        if self.is_numeric():
+            return np.isnan(self.values)
+        return self.missing | (self.values == "")
+    def equal_to_previous(self) -> np.ndarray: # for each value (except the first one), True if it is the same as the one above
+        if self.is_numeric():
+            missing = self.missing
+            return (self.values[1:] == self.values[:-1]) & ~missing[1:] & ~missing[:-1] | (missing[1:] & missing[:-1])
+        return np.asarray(self.values[1:] == self.values[:-1], dtype=bool)
+    def take(self, index) -> None: # keeps only the values selected by the index (array of indexes, boolean mask or slice)
+        self.values = self.values[index]
+        self.missing = self.missing[index]
+        self.quality = self.quality[index]
+        self.has_quality = self.has_quality[index]
+        self.valid = self.valid[index]
+        self.copied = self.copied[index]
+        self.is_repeated = self.is_repeated[index]
+    def min_value_index(self) -> int: # finds the index of the (first) lowest value, skipping the missing (NaN) values, which must not all be missing
+        if len(self.values) == 0:
+            return -1
+        return int(np.nanargmin(self.values))
+    def repeat_coefficient_recalculate(self) -> None: # recalculates the repeat_coefficient property
+        count_all = len(self.values)
+        count_repeat = int(np.count_nonzero(self.equal_to_previous())) if count_all > 1 else 0
         self.repeat_coefficient = None if count_all == 0 else (0 if count_all == 1 else count_repeat / (count_all - 1))
-    def repeat_values_recalculate(self) -> None: # recalculates (and marks) the repeating values in its list of values
+    def repeat_values_recalculate(self) -> None: # recalculates (and marks) the repeating values in its array of values
         if len(self.values) <= 1:
             return
-        value_previous = self.values[0]
-        for value in self.values[1:]:
-            value.is_repeated = (value.value == value_previous.value)
-            value_previous = value
+        self.is_repeated[1:] = self.equal_to_previous()
+
+class LogRecordListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = [] # the log records collected in a worker process, passed on to the main process with the task result
+    def emit(self, record: logging.LogRecord) -> None:
+        # format the message now, so that the record can be sent to the main process
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        self.records.append(record)
+    def pop_records(self) -> list:
+        records = self.records
+        self.records = []
+        return records
+
+class Instrumentation(object):
+    def __init__(self):
+        self.stage_map = {} # stage name -> [calls, seconds, rows in, rows out, files rejected]
+        self.file_time_map = {} # file name -> seconds spent on the file
+    def add(self, stage: str, seconds: float, rows_in: int, rows_out: int, rejected: int = 0, file_name: str | NoneType = None) -> None:
+        entry = self.stage_map.get(stage)
+        if entry is None:
+            entry = self.stage_map[stage] = [0, 0.0, 0, 0, 0]
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] += rows_in
+        entry[3] += rows_out
+        entry[4] += rejected
+        if file_name is not None:
+            self.file_time_map[file_name] = self.file_time_map.get(file_name, 0.0) + seconds
+    def merge(self, other) -> None: # adds the measurements of another Instrumentation object (from a worker process)
+        for (stage, other_entry) in other.stage_map.items():
+            entry = self.stage_map.get(stage)
+            if entry is None:
+                entry = self.stage_map[stage] = [0, 0.0, 0, 0, 0]
+            for i in range(len(entry)):
+                entry[i] += other_entry[i]
+        for (file_name, seconds) in other.file_time_map.items():
+            self.file_time_map[file_name] = self.file_time_map.get(file_name, 0.0) + seconds
+    def pop(self): # returns the measurements made so far and starts over
+        instrumentation = Instrumentation()
+        (instrumentation.stage_map, self.stage_map) = (self.stage_map, {})
+        (instrumentation.file_time_map, self.file_time_map) = (self.file_time_map, {})
+        return instrumentation
+    def get_stage_list(self) -> list: # returns a dictionary for each stage, in the order in which the stages were first run
+        stage_list = []
+        for (stage, (calls, seconds, rows_in, rows_out, rejected)) in self.stage_map.items():
+            stage_list.append({
+                "stage": stage,
+                "calls": calls,
+                "seconds": seconds,
+                "rows_in": rows_in,
+                "rows_out": rows_out,
+                "rows_removed": rows_in - rows_out,
+                "files_rejected": rejected,
+                "rows_per_second": rows_in / seconds if seconds > 0 else None
+            })
+        return stage_list
+    def get_slowest_file_list(self, count: int) -> list:
+        file_list = sorted(self.file_time_map.items(), key=lambda x : x[1], reverse=True)[:count]
+        return [{"file": file_name, "seconds": seconds} for (file_name, seconds) in file_list]
 
 class DataObject(object):
     def __init__(self):
@@ -229,15 +476,45 @@ class DataObject(object):
         self.valid = True
         self.metadata = {}
         self.settings = {}
+        self.row_valid = np.zeros(0, dtype=bool) # True for the rows where the values of all required columns are valid
+        self.valid_count = 0 # the number of rows where the values of all required columns are valid
+        self.track_validity = False # if False, row_valid and valid_count are not kept up to date (set when the processing starts)
     def is_single(self) -> bool | NoneType:
         if len(self.column_list) == 0:
             return None
         return len(self.column_list[0].values) == 1
+    def row_count(self) -> int:
+        if len(self.column_list) == 0:
+            return 0
+        return len(self.column_list[0].values)
     def check_if_valid(self) -> bool:
         column_name_set = set([columnObject.name for columnObject in self.column_list])
         if len(set(_column_name_required) - column_name_set) > 0:
             return False
         return len(self.column_list[0].values) > 0
+    def take_rows(self, index) -> None: # keeps only the rows selected by the index (array of indexes, boolean mask or slice) in all columns
+        for columnObject in self.column_list:
+            columnObject.take(index)
+        if self.track_validity:
+            self.row_valid = self.row_valid[index]
+            self.valid_count = int(np.count_nonzero(self.row_valid))
+    def invalidate_values(self, columnObject: ColumnObject, mask: np.ndarray) -> None: # marks the values of the column selected by the mask as invalid
+        columnObject.valid[mask] = False
+        if self.track_validity and columnObject.name in _column_name_required:
+            self.row_valid &= ~mask
+            self.valid_count = int(np.count_nonzero(self.row_valid))
+    def row_valid_recalculate(self) -> None: # recalculates the row validity from the values of all required columns
+        if not self.track_validity:
+            return
+        if len(self.column_list) == 0:
+            self.row_valid = np.zeros(0, dtype=bool)
+        else:
+            valid_list = [col.valid for col in self.column_list if col.name in _column_name_required]
+            if len(valid_list) == 0:
+                self.row_valid = np.ones(len(self.column_list[0].values), dtype=bool)
+            else:
+                self.row_valid = np.logical_and.reduce(valid_list)
+        self.valid_count = int(np.count_nonzero(self.row_valid))
     def __str__(self) -> str:
         s = []
         s.append("File name: '{:}'".format(self.file_name))
@@ -268,25 +545,27 @@ class DataObject(object):
             c.append("")
             c.append(columnObject.name)
             c.append("")
-            for valueObject in columnObject.values:
+            value_list = columnObject.get_value_list()
+            quality_list = columnObject.quality.tolist()
+            for i, value in enumerate(value_list):
                 cell = []
                 cell.append(" ")
                 cell.append("q")
-                cell.append(str(valueObject.quality) if valueObject.quality is not None else " ")
+                cell.append(str(quality_list[i]) if columnObject.has_quality[i] else " ")
                 cell.append(" ")
                 cell.append("v")
-                cell.append("T" if valueObject.valid else "F")
+                cell.append("T" if columnObject.valid[i] else "F")
                 cell.append(" ")
                 cell.append("c")
-                cell.append("T" if valueObject.copied else "F")
+                cell.append("T" if columnObject.copied[i] else "F")
                 cell.append(" ")
                 cell.append("r")
-                cell.append("T" if valueObject.is_repeated else "F")
+                cell.append("T" if columnObject.is_repeated[i] else "F")
                 cell.append(" ")
-                if type(valueObject.value) == str:
-                    cell.append(valueObject.value)
-                elif type(valueObject.value) == float or type(valueObject.value) == int:
-                    cell.append("{:10.3f}".format(float(valueObject.value)))
+                if type(value) == str:
+                    cell.append(value)
+                elif type(value) == float or type(value) == int:
+                    cell.append("{:10.3f}".format(float(value)))
                 else:
                     cell.append("")
                 cell.append(" ")
@@ -307,6 +586,212 @@ class DataObject(object):
 
 
 
+class ColumnPlan(object):
+    def __init__(self):
+        self.column_list = [] # a tuple (value index, name, original name, quality index or None) for each column of the table, in order
+        self.index_list = [] # the sorted indexes of all columns that have to be read (values and quality)
+        self.low_priority_list = () # for each column of the table, True if it is a duplicate that is removed (see remove_duplicate_columns)
+        self.has_required_columns = False # True if there is a column for each of the required column names
+
+class ProcessingStage(object):
+    def __init__(self, name: str, function: FunctionType, message: str, is_noop: FunctionType | NoneType = None,
+        invalidates: tuple = (), requires: tuple = (), refreshes: tuple = ()):
+        self.name = name # the name of the stage (used by the instrumentation)
+        self.function = function # processes the dataObject, returns True if it changed the rows (or values)
+        self.message = message # the message written to the log after the stage
+        self.is_noop = is_noop # if set, returns True when the stage can't change the dataObject with the current settings, so it is skipped
+        self.invalidates = invalidates # the column properties that are out of date once the stage changes the rows
+        self.requires = requires # the column properties that have to be up to date before the stage
+        self.refreshes = refreshes # the column properties that have to be up to date after the stage
+
+class BatchObject(object):
+    def __init__(self, dataObject_list: list):
+        self.dataObject_list = dataObject_list # the dataObjects of the files, in order
+        self.column_map = {} # column name -> ColumnObject with the values of all files one after another (missing values where a file doesn't have the column)
+        self.present_map = {} # column name -> for each file, True if it has the column
+        self.offsets = np.zeros(1, dtype=np.int64) # the row at which each file starts, followed by the number of all rows
+        self.repeat_count_map = {} # column name -> for each file, the number of values that are the same as the one above (see batch_repeat_coefficient_recalculate)
+        self.repeat_coefficient_map = {} # column name -> for each file, the repeat coefficient of the column (see ColumnObject.repeat_coefficient)
+        self.repeating_map = {} # column name -> for each file, True if the value was only in the first line and was repeated (see ColumnObject.repeating)
+    def file_count(self) -> int:
+        return len(self.dataObject_list)
+    def row_count(self) -> int:
+        return int(self.offsets[-1])
+    def counts(self) -> np.ndarray: # the number of rows of each file
+        return np.diff(self.offsets)
+    def starts(self) -> np.ndarray: # the first row of each file
+        return self.offsets[:-1]
+    def row_file(self) -> np.ndarray: # the index of the file of each row
+        return np.repeat(np.arange(self.file_count()), self.counts())
+    def first_row_mask(self) -> np.ndarray: # True for the first row of each file
+        mask = np.zeros(self.row_count(), dtype=bool)
+        mask[self.starts()[self.counts() > 0]] = True
+        return mask
+    def take_rows(self, mask: np.ndarray) -> None: # keeps only the rows selected by the boolean mask in all columns
+        counts = np.bincount(self.row_file()[mask], minlength=self.file_count())
+        for columnObject in self.column_map.values():
+            columnObject.take(mask)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+class FileReadAhead(object):
+    def __init__(self, filepath_list: ty.List[str], file_count: int, max_bytes: int, thread_count: int):
+        self.filepath_list = filepath_list # the files that are read ahead, in the order in which they are used
+        self.index_map = {} # file path -> index of the file in the list
+        for index, filepath in enumerate(filepath_list):
+            self.index_map.setdefault(filepath, index)
+        self.file_count = file_count # the number of files that are read ahead of the current one
+        self.max_bytes = max_bytes # the maximum number of bytes that are kept in memory at once
+        self.condition = threading.Condition() # guards all of the following properties
+        self.used_index = -1 # the index of the file that is currently used, all files before it are released
+        self.next_reserve_index = 0 # the index of the next file that can reserve memory, the memory is reserved in the order of the files
+        self.reserved_bytes = 0 # the number of bytes reserved by the files that are read ahead (and not released yet)
+        self.size_map = {} # index -> the number of bytes reserved for the file
+        self.future_map = {} # index -> Future of the contents of the file
+        self.next_submit_index = 0 # the index of the next file that is submitted for reading
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, thread_count), thread_name_prefix="read_ahead")
+        self.submit()
+    def submit(self) -> None: # submits the files up to the given number of files ahead of the current one for reading
+        with self.condition:
+            while self.next_submit_index < len(self.filepath_list) and self.next_submit_index <= self.used_index + self.file_count:
+                self.future_map[self.next_submit_index] = self.executor.submit(self.read, self.next_submit_index)
+                self.next_submit_index += 1
+    def read(self, index: int) -> bytes | NoneType: # reads a file (in a background thread), once there is enough memory for it, returns None if it was released before it was read
+        filepath = self.filepath_list[index]
+        try:
+            size = os.path.getsize(filepath)
+        except OSError:
+            size = 0
+        with self.condition:
+            self.condition.wait_for(lambda : index < self.used_index or
+                (index == self.next_reserve_index and (self.reserved_bytes == 0 or self.reserved_bytes + size <= self.max_bytes)))
+            if index < self.used_index:
+                return None
+            self.next_reserve_index = index + 1
+            self.reserved_bytes += size
+            self.size_map[index] = size
+            self.condition.notify_all()
+        try:
+            with open(filepath, "rb") as f:
+                return f.read()
+        except OSError:
+            # the error is raised again when the file is opened without reading ahead
+            return None
+    def get(self, filepath: str) -> bytes | NoneType: # returns the contents of a file that was read ahead (None if it wasn't), releasing all files before it
+        index = self.index_map.get(filepath)
+        if index is None:
+            return None
+        with self.condition:
+            if index > self.used_index:
+                self.used_index = index
+                self.next_reserve_index = max(self.next_reserve_index, index)
+                for i in [i for i in self.size_map if i < index]:
+                    self.reserved_bytes -= self.size_map.pop(i)
+                for i in [i for i in self.future_map if i < index]:
+                    del self.future_map[i]
+                self.condition.notify_all()
+            future = self.future_map.get(index)
+        self.submit()
+        if future is None:
+            return None
+        return future.result()
+    def close(self) -> None: # stops reading ahead and releases all files
+        with self.condition:
+            self.used_index = len(self.filepath_list)
+            self.size_map = {}
+            self.future_map = {}
+            self.reserved_bytes = 0
+            self.condition.notify_all()
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+class OutputWriter(object):
+    def __init__(self, filename: str, filename_binary: str | NoneType = None, filename_day_index: str | NoneType = None):
+        self.filename = filename # the output (.csv) file
+        self.file = open(filename, "w", encoding="UTF-8", buffering=1 << 20)
+        self.file.write(",".join(_column_names_out_list) + "\n")
+        self.file_id = 0 # the id of the last written dataObject
+        self.counter = 0 # the number of written lines (measurements)
+        self.filename_binary = filename_binary # the binary (.npz) output file, if any
+        self.binary_column_map = {column_name: [] for column_name in _column_names_out_list} # the arrays of each column, for each written dataObject
+        self.filename_day_index = filename_day_index # the output file sorted by the capture day, if any
+    def write(self, dataObject: DataObject) -> None: # writes the measurements of a dataObject, whole columns at a time
+        self.file_id += 1
+        total = len(dataObject.column_list[0].values)
+        seq_all_start = self.counter + 1
+        self.counter += total
+        if total == 0:
+            return
+        # find each column only once
+        column_map = {column_name: try_get_column(dataObject, column_name) for column_name in _column_out_source_map.values()}
+        column_datetime = column_map["DateTime"]
+        column_chl = column_map["Chl"]
+        quality = dataObject.settings["QUALITY"]
+        filemark = dataObject.settings["FILEMARK"]
+
+        text_columns = []
+        for column_name in _column_names_out_list:
+            if column_name == "file_id": # same for each measurement inside an individual file
+                text = [str(self.file_id)] * total
+            elif column_name == "seq_in": # different for each measurement in a file
+                text = list(map(str, range(1, total + 1)))
+            elif column_name == "total_in": # number of measurements inside each file
+                text = [str(total)] * total
+            elif column_name == "seq_all": # counts each line in the output file
+                text = list(map(str, range(seq_all_start, seq_all_start + total)))
+            elif column_name == "exact_datetime": # is the datetime exact
+                text = [("" if column_datetime is None else ("N" if column_datetime.repeating else "Y"))] * total
+            elif column_name == "chl_repeat_coef": # chlorophyll-a repeat coefficient
+                text = [("" if column_chl is None else str(column_chl.repeat_coefficient))] * total
+            elif column_name == "quality":
+                text = [(str(quality) if quality is not None else "")] * total
+            elif column_name == "file_type":
+                text = [(str(filemark) if filemark is not None else "")] * total
+            else: # values of the measurements (date_time, lon, lat, chl, bot_depth, floor_depth, sample_depth)
+                columnObject = column_map[_column_out_source_map[column_name]]
+                if columnObject is None:
+                    text = [""] * total
+                else:
+                    text = ["" if value is None else str(value) for value in columnObject.get_value_list()]
+            text_columns.append(text)
+        line_list = [",".join(line) + "\n" for line in zip(*text_columns)]
+        self.file.write("".join(line_list))
+
+        if self.filename_binary is None:
+            return
+        number_map = {
+            "file_id": np.full(total, self.file_id),
+            "seq_in": np.arange(1, total + 1),
+            "total_in": np.full(total, total),
+            "seq_all": np.arange(seq_all_start, seq_all_start + total),
+            "chl_repeat_coef": np.full(total, float("NaN") if column_chl is None or column_chl.repeat_coefficient is None else column_chl.repeat_coefficient),
+            "quality": np.full(total, quality if type(quality) in (int, float) else float("NaN"))
+        }
+        for column_name, text in zip(_column_names_out_list, text_columns):
+            dtype = _column_out_binary_dtype_map[column_name]
+            if column_name in number_map:
+                values = number_map[column_name].astype(dtype)
+            elif dtype == str:
+                values = np.array(text, dtype=str)
+            elif column_map[_column_out_source_map[column_name]] is not None:
+                # numerical values are taken directly from the column (missing values are NaN)
+                values = column_map[_column_out_source_map[column_name]].values.astype(dtype)
+            else:
+                values = np.full(total, float("NaN"), dtype=dtype)
+            self.binary_column_map[column_name].append(values)
+    def close(self) -> None:
+        self.file.close()
+        if self.filename_day_index is not None:
+            save_day_index(self.filename, self.filename_day_index)
+        if self.filename_binary is None:
+            return
+        binary_columns = {}
+        for column_name, values_list in self.binary_column_map.items():
+            dtype = _column_out_binary_dtype_map[column_name]
+            binary_columns[column_name] = np.concatenate(values_list) if len(values_list) > 0 else np.zeros(0, dtype=dtype)
+        np.savez(self.filename_binary, **binary_columns)
+
+
+
+
 # FUNCTION DEFINITIONS
 
 
@@ -333,6 +818,45 @@ def time_format(seconds, precision: int = 3) -> str:
     return string_format.format(s, m, h)
 
 
+# starts measuring a stage of the parsing or processing of a file
+# returns None if the instrumentation is disabled
+# without a dataObject (reading a file), the number of rows in is the same as the number of rows out
+def stage_timer_start(dataObject: DataObject | NoneType = None) -> tuple | NoneType:
+    if _instrumentation is None:
+        return None
+    if dataObject is None:
+        return (time.perf_counter(), None, True)
+    return (time.perf_counter(), dataObject.row_count(), dataObject.valid)
+# stops measuring a stage and adds the measurement to the instrumentation
+# the file is counted as rejected by the stage if it was valid before the stage and isn't anymore
+def stage_timer_stop(stage: str, timer: tuple | NoneType, dataObject: DataObject, check_valid: bool = True) -> None:
+    if timer is None:
+        return
+    seconds = time.perf_counter() - timer[0]
+    rejected = check_valid and timer[2] and not (dataObject.valid and dataObject.check_if_valid())
+    rows_out = dataObject.row_count()
+    _instrumentation.add(stage, seconds, rows_out if timer[1] is None else timer[1], rows_out, int(rejected), dataObject.file_name)
+
+
+# saves the instrumentation report (a .json file with the stages and the slowest files, and a .csv file with the stages)
+def save_instrumentation_report(instrumentation: Instrumentation, filename_base: str) -> None:
+    stage_list = instrumentation.get_stage_list()
+    report = {
+        "stages": stage_list,
+        "slowest_files": instrumentation.get_slowest_file_list(setting_instrumentation_slowest_file_count)
+    }
+    with open(filename_base + ".json", "w", encoding="UTF-8") as f:
+        json.dump(report, f, indent=4)
+    with open(filename_base + ".csv", "w", encoding="UTF-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["stage", "calls", "seconds", "rows_in", "rows_out", "rows_removed", "files_rejected", "rows_per_second"])
+        writer.writeheader()
+        writer.writerows(stage_list)
+    for stage in stage_list:
+        _logger.info("Stage '{:}': {:} calls, {:}, {:} rows in, {:} rows out, {:} files rejected.".format(
+            stage["stage"], stage["calls"], time_format(stage["seconds"], 6), stage["rows_in"], stage["rows_out"], stage["files_rejected"]))
+    _logger.info("Saved instrumentation report to '{:}.json' and '{:}.csv'.".format(filename_base, filename_base))
+
+
 # initialization
 def main_init() -> None:
     global _time_start
@@ -345,7 +869,7 @@ def main_init() -> None:
         datefmt="%Y-%m-%d %H:%M:%S",
         format="[%(asctime)s] %(levelname)s: %(message)s",
         #encoding="UTF-8",
-        level=logging.DEBUG
+        level=setting_logger_level
     )
 
     stopwatch_start()
@@ -431,52 +955,223 @@ def get_filenames_to_be_parsed(filename_in: str) -> list:
         elif mode == "ROOT":
             root = line
         elif mode == "WHITELIST":
-            filepath = root + "/" + line
-            prop = (filepath, {"QUALITY": mark_dict["QUALITY"], "SELECT": mark_dict["SELECT"], "FILEMARK": mark_dict["FILEMARK"]})
-            filenames_list.append(prop)
+            # a file name with wildcards is replaced by all matching files (or members of the archive)
+            if glob.has_magic(line):
+                filepath_list = [root + "/" + name for name in find_matching_files(root, line)]
+            else:
+                filepath_list = [root + "/" + line]
+            for filepath in filepath_list:
+                prop = (filepath, {"QUALITY": mark_dict["QUALITY"], "SELECT": mark_dict["SELECT"], "FILEMARK": mark_dict["FILEMARK"]})
+                filenames_list.append(prop)
 
     return filenames_list
 
 
-# reads the .odv file containing the data
-# returns the unprocessed values
-def get_odv_file_contents(filepath_in: str) -> ty.Tuple[ty.List[str], ty.List[ty.List[str]]]:
-    # read the file
-    f = open(filepath_in, mode="r", encoding="UTF-8")
-    lines = f.readlines()
-    f.close()
+# finds the names of the files in the root folder (or the members of the root archive) that match the pattern
+# returns the names relative to the root, in the order of the archive (or sorted)
+def find_matching_files(root: str, pattern: str) -> ty.List[str]:
+    if root.lower().endswith(_archive_extension_list) and os.path.isfile(root):
+        return [name for name in get_archive_member_list(root) if fnmatch.fnmatchcase(name, pattern)]
+    return sorted([os.path.relpath(filepath, root).replace("\\", "/") for filepath in glob.glob(os.path.join(root, pattern)) if os.path.isfile(filepath)])
+
+
+# splits the path of an archive member into the path of the archive and the name of the member
+# returns None if the path is not inside an archive
+def split_archive_path(filepath: str) -> ty.Tuple[str, str] | NoneType:
+    filepath_lower = filepath.lower()
+    for extension in _archive_extension_list:
+        ri = filepath_lower.find(extension + "/")
+        while ri != -1:
+            archive_path = filepath[:ri + len(extension)]
+            if os.path.isfile(archive_path):
+                return (archive_path, filepath[ri + len(extension) + 1:])
+            ri = filepath_lower.find(extension + "/", ri + 1)
+    return None
+
+
+# gets the opened archive (it is opened on first use and kept open)
+def get_archive(archive_path: str) -> zipfile.ZipFile | tarfile.TarFile:
+    archive = _archive_map.get(archive_path)
+    if archive is None:
+        if archive_path.lower().endswith(".zip"):
+            archive = zipfile.ZipFile(archive_path, "r")
+        else:
+            # the compression of a tar archive is detected automatically
+            archive = tarfile.open(archive_path, "r:*")
+        _archive_map[archive_path] = archive
+    return archive
+
+
+# gets the names of all files in an archive, in the order in which they are stored
+def get_archive_member_list(archive_path: str) -> ty.List[str]:
+    archive = get_archive(archive_path)
+    if isinstance(archive, zipfile.ZipFile):
+        return [info.filename for info in archive.infolist() if not info.is_dir()]
+    return [info.name for info in archive.getmembers() if info.isfile()]
+
+
+# gets the size and the modification time (in nanoseconds) of a file or an archive member (the modification time of the archive is used)
+def get_file_stat(filepath: str) -> ty.Tuple[int, int]:
+    archive_path_member = split_archive_path(filepath)
+    if archive_path_member is None:
+        stat = os.stat(filepath)
+        return (stat.st_size, stat.st_mtime_ns)
+    (archive_path, member) = archive_path_member
+    archive = get_archive(archive_path)
+    if isinstance(archive, zipfile.ZipFile):
+        size = archive.getinfo(member).file_size
+    else:
+        size = archive.getmember(member).size
+    return (size, os.stat(archive_path).st_mtime_ns)
+
+
+# opens a file, an archive member or a compressed ('.gz') file for reading in binary mode, the contents are decompressed while they are read
+def open_file_binary(filepath: str) -> ty.BinaryIO:
+    archive_path_member = split_archive_path(filepath)
+    if archive_path_member is not None:
+        (archive_path, member) = archive_path_member
+        archive = get_archive(archive_path)
+        if isinstance(archive, zipfile.ZipFile):
+            return archive.open(member, "r")
+        return archive.extractfile(member)
+    contents = _read_ahead.get(filepath) if _read_ahead is not None else None
+    if filepath.lower().endswith(_compressed_file_extension):
+        return gzip.open(filepath, "rb") if contents is None else gzip.GzipFile(fileobj=io.BytesIO(contents), mode="rb")
+    return open(filepath, "rb") if contents is None else io.BytesIO(contents)
+
+
+# opens an .odv file (which can also be an archive member or a compressed file) for reading
+def open_odv_file(filepath: str) -> ty.TextIO:
+    if split_archive_path(filepath) is not None or filepath.lower().endswith(_compressed_file_extension):
+        return io.TextIOWrapper(open_file_binary(filepath), encoding="UTF-8")
+    contents = _read_ahead.get(filepath) if _read_ahead is not None else None
+    if contents is None:
+        return open(filepath, mode="r", encoding="UTF-8")
+    return io.TextIOWrapper(io.BytesIO(contents), encoding="UTF-8")
+
+
+# compiles the column definition (header) of a file into a column plan
+# files share only a handful of distinct headers, so the plans are cached by the header
+@functools.lru_cache(maxsize=_column_plan_cache_size)
+def get_column_plan(col_tuple: ty.Tuple[str, ...]) -> ColumnPlan:
+    columnPlan = ColumnPlan()
+    column = None
+    for index, col in enumerate(col_tuple):
+        if col == _column_name_quality:
+            if column is not None:
+                # the quality column belongs to the column before it, a later quality column replaces an earlier one
+                column = (column[0], column[1], column[2], index)
+        else:
+            # add previous to list (if it exists)
+            if column is not None:
+                columnPlan.column_list.append(column)
+            column = None
+            col_upper = col.upper()
+            if col_upper in _column_name_map:
+                column = (index, _column_name_map[col_upper], col, None)
+    # the last column is only added if its name is different from the name of the column before it
+    if column is not None and (len(columnPlan.column_list) == 0 or column[1] != columnPlan.column_list[-1][1]):
+        columnPlan.column_list.append(column)
+
+    columnPlan.index_list = sorted([index for column in columnPlan.column_list for index in (column[0], column[3]) if index is not None])
+    columnPlan.low_priority_list = get_duplicate_columns(tuple([(name, original_name) for (_, name, original_name, _) in columnPlan.column_list]))
+    columnPlan.has_required_columns = _column_name_required.issubset([name for (_, name, _, _) in columnPlan.column_list])
+    return columnPlan
+
+
+# reads the lines of an .odv file up to (and including) the column definition, the iterator is left at the first line after it
+# returns the column names, or None if the file has no column definition
+def get_odv_stream_header(line_iterator: ty.Iterator[str]) -> ty.List[str] | NoneType:
+    first_line = True
+    for line in line_iterator:
+        line = line.strip("\n")
+        if first_line:
+            if line.find("\ufeff") == 0:
+                line = line[1:]
+            first_line = False
+
+        # skip all commented (that start with '//') and empty lines
+        if line.find("//") == 0 or len(line) == 0:
+            continue
 
-    lines = [line.strip("\n") for line in lines]
-    if lines[0].find("\ufeff") == 0:
-        lines[0] = lines[0][1:]
+        # the first line is the column definition
+        return line.split("\t")
+    return None
 
-    # remove all un-commented (that don't start with '//') and empty lines
-    lines = [line for line in lines if line.find("//") != 0 or len(line) == 0]
 
-    # split each line into individual entries
-    entries = [line.split("\t") for line in lines]
+# reads the values of an .odv file line by line, starting after the column definition
+# only the values of the columns that are used are kept, and only up to the row limit (if given)
+# returns the unprocessed values (None for the columns that are not used)
+def get_odv_stream_values(columns: ty.List[str], line_iterator: ty.Iterator[str], row_limit: int | NoneType = None) -> ty.List[ty.List[str] | NoneType]:
+    index_list = get_column_plan(tuple(columns)).index_list
+    buffer_list = [[] for _ in index_list]
+    width = index_list[-1] + 1 if len(index_list) > 0 else 0
+    row_count = 0
 
-    # parse the entries
-    # the first line is the column definition
-    columns = entries[0]
-    # the following lines are values
-    values = entries[1:]
+    for line in line_iterator:
+        if row_limit is not None and row_count >= row_limit:
+            break
+        line = line.strip("\n")
+
+        # skip all commented (that start with '//') and empty lines
+        if line.find("//") == 0 or len(line) == 0:
+            continue
 
-    # transform value list from [line_num][column_index] to [column_index][line_num]
-    values = [list(x) for x in zip(*values)]
+        # split the line into individual entries, keep only the ones in used columns
+        entries = line.split("\t")
+        if len(entries) < width:
+            entries += [""] * (width - len(entries))
+        for buffer, index in zip(buffer_list, index_list):
+            buffer.append(entries[index])
+        row_count += 1
 
-    return (columns, values)
+    values = [None] * len(columns)
+    for buffer, index in zip(buffer_list, index_list):
+        values[index] = buffer
+    return values
+
+
+# reads the contents of an .odv file line by line, in a single pass
+# only the values of the columns that are used are kept, and only up to the row limit (if given)
+# returns the column names and the unprocessed values (None for the columns that are not used)
+def get_odv_stream_contents(lines: ty.Iterable[str], row_limit: int | NoneType = None) -> ty.Tuple[ty.List[str], ty.List[ty.List[str] | NoneType]]:
+    line_iterator = iter(lines)
+    columns = get_odv_stream_header(line_iterator)
+    if columns is None:
+        return ([], [])
+    return (columns, get_odv_stream_values(columns, line_iterator, row_limit))
+
+
+# reads the .odv file containing the data
+# returns the column names and the unprocessed values (None for the columns that are not used)
+def get_odv_file_contents(filepath_in: str, row_limit: int | NoneType = None) -> ty.Tuple[ty.List[str], ty.List[ty.List[str] | NoneType]]:
+    with open_odv_file(filepath_in) as f:
+        return get_odv_stream_contents(f, row_limit)
+
+
+# reads the .odv file containing the data, but only if its column definition has all required columns
+# the values of a file without them are never read, as the file would be detected as invalid anyway
+# returns the column names and the unprocessed values, or None if the file doesn't have all required columns
+def get_odv_file_contents_if_valid(filepath_in: str, row_limit: int | NoneType = None) -> ty.Tuple[ty.List[str], ty.List[ty.List[str] | NoneType]] | NoneType:
+    with open_odv_file(filepath_in) as f:
+        line_iterator = iter(f)
+        columns = get_odv_stream_header(line_iterator)
+        if columns is None or not get_column_plan(tuple(columns)).has_required_columns:
+            return None
+        return (columns, get_odv_stream_values(columns, line_iterator, row_limit))
     
 
 # maps column names into indexes, creating new indexes if necessary, returning an array of column indexes
 def get_column_indexes(column_names: list) -> list:
     global _column_names
+    global _column_name_index_map
     column_indexes = []
     for column_name in column_names:
-        if column_name not in _column_names:
+        if column_name not in _column_name_index_map:
+            _column_name_index_map[column_name] = len(_column_names)
             _column_names.append(column_name)
-        column_index = _column_names.index(column_name)
-        column_indexes.append(column_index)
+        column_indexes.append(_column_name_index_map[column_name])
+    return column_indexes
 
 # gets the name of the column with the given index
 def get_column_name(column_index: int) -> str:
@@ -488,11 +1183,105 @@ def get_column_name(column_index: int) -> str:
 
 # finds and returns the column index with the given name
 def get_column_index(column_name: str) -> int:
-    global _column_names
-    if column_name not in _column_names:
+    global _column_name_index_map
+    if column_name not in _column_name_index_map:
         _logger.warning("Trying to access column index by name, but no column with the given name exists. Column name: '{0}'".format(column_name))
         return None
-    return _column_names.index(column_name)
+    return _column_name_index_map[column_name]
+
+
+# parses the quality (QV:SEADATANET) values of a column
+# returns the array of quality values and the mask of the values that were successfully parsed
+def parse_quality_values(vals: ty.List[str]) -> ty.Tuple[np.ndarray, np.ndarray]:
+    # the quality flags only take a handful of distinct values, so each one is only parsed once
+    unique_list, inverse = np.unique(np.asarray(vals, dtype=str), return_inverse=True)
+    unique_quality = []
+    for quality in unique_list.tolist():
+        try:
+            quality_int = int(quality)
+        except:
+            quality_int = None
+        unique_quality.append(quality_int)
+    unique_has_quality = np.array([quality is not None for quality in unique_quality], dtype=bool)
+    unique_quality = [0 if quality is None else quality for quality in unique_quality]
+    dtype = np.int8 if all([-128 <= quality <= 127 for quality in unique_quality]) else np.int64
+    unique_quality = np.array(unique_quality, dtype=dtype)
+    inverse = inverse.reshape(-1)
+    return (unique_quality[inverse], unique_has_quality[inverse])
+
+
+# parses the values of a numerical column into floats (a comma can be used as the decimal separator)
+# returns the array of values (NaN where missing), the mask of missing values and the mask of values that failed to parse
+def parse_float_values(raw_values: np.ndarray) -> ty.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    if len(raw_values) == 0:
+        return (np.zeros(0), np.zeros(0, dtype=bool), np.zeros(0, dtype=bool))
+    text = np.char.replace(np.asarray(raw_values, dtype=str), ",", ".")
+    missing = text == ""
+    text[missing] = "0"
+    try:
+        # fast path, all values are numbers
+        values = text.astype(np.float64)
+        failed = np.zeros(len(text), dtype=bool)
+    except ValueError:
+        # some values are not numbers, parse each distinct value on its own
+        unique_list, inverse = np.unique(text, return_inverse=True)
+        unique_values = np.full(len(unique_list), float("NaN"))
+        unique_failed = np.zeros(len(unique_list), dtype=bool)
+        for i, value in enumerate(unique_list.tolist()):
+            try:
+                unique_values[i] = float(value)
+            except ValueError:
+                unique_failed[i] = True
+        inverse = inverse.reshape(-1)
+        values = unique_values[inverse]
+        failed = unique_failed[inverse] & ~missing
+    values[missing | failed] = float("NaN")
+    return (values, missing | failed, failed)
+
+
+# checks if the parts of a datetime are out of range
+def datetime_is_incorrect(month, day, hour, minute, second):
+    return (month > 12) | (day > 31) | (hour >= 24) & (minute >= 60) | (second >= 60)
+
+
+# parses the values of a datetime column into the 'YYYY-MM-DDTHH:MM:SS' format
+# values in the common ISO 8601 layout are parsed all at once, only the other values are matched with the regex one by one
+# values that can't be parsed are kept as they are
+# returns the array of values and the mask of values that were parsed but are out of range
+def parse_datetime_values(raw_values: np.ndarray) -> ty.Tuple[np.ndarray, np.ndarray]:
+    values = np.array(raw_values, dtype=object)
+    count = len(values)
+    text = np.asarray(values, dtype=str)
+    incorrect = np.zeros(count, dtype=bool)
+    fast = np.zeros(count, dtype=bool)
+
+    if count > 0 and text.dtype.itemsize // 4 >= _datetime_iso_length:
+        # look at the characters as numbers (code points), non-digits end up outside of the 0-9 range
+        codes = text.view(np.uint32).reshape(count, -1)[:, :_datetime_iso_length]
+        digits = codes - ord("0")
+        digit_positions = [i for i in range(_datetime_iso_length) if i not in _datetime_iso_separator_map]
+        fast = np.all(digits[:, digit_positions] <= 9, axis=1)
+        for position, separator in _datetime_iso_separator_map.items():
+            fast &= codes[:, position] == ord(separator)
+        digits = digits.astype(np.int64)
+        parts = {}
+        for part, (start, end) in _datetime_iso_part_map.items():
+            parts[part] = sum([digits[:, i] * 10 ** (end - 1 - i) for i in range(start, end)])
+        incorrect = fast & datetime_is_incorrect(parts["month"], parts["day"], parts["hour"], parts["minute"], parts["second"])
+        # the layout is already correct, only the fractions of a second are cut off
+        values[fast] = text[fast].astype("U{:}".format(_datetime_iso_length)).astype(object)
+
+    for i in np.flatnonzero(~fast & (text != "")):
+        value = values[i]
+        if value is None:
+            continue
+        regex_match = _datetime_regex.match(value)
+        if regex_match is not None:
+            (year, month, day, hour, minute, second) = [int(x) for x in regex_match.groups()]
+            incorrect[i] = datetime_is_incorrect(month, day, hour, minute, second)
+            values[i] = "{0:04d}-{1:02d}-{2:02d}T{3:02d}:{4:02d}:{5:02d}".format(year, month, day, hour, minute, second)
+
+    return (values, incorrect)
 
 
 # parses the values inside the given column based on column name
@@ -501,83 +1290,44 @@ def parse_column_values(column: ColumnObject) -> None:
     parse_type = _column_parse_format_map[column.name]
 
     if parse_type == "str":
-        for valueObject in column.values:
-            if valueObject.value == "":
-                valueObject.value = None
+        missing = column.values == ""
+        column.values[missing] = None
+        column.missing = missing
         return
     
     if parse_type == "float":
-        for valueObject in column.values:
-            if valueObject.value == None or valueObject.value == "":
-                valueObject.value = None
-                continue
-            try:
-                val = float(valueObject.value.replace(",", "."))
-            except:
-                val = None
-                _logger.warning("Failed to parse value '{:}' into float for column '{:}'.".format(val, column.name))
-            valueObject.value = val
+        raw_values = column.values
+        (column.values, column.missing, failed) = parse_float_values(raw_values)
+        failed_count = np.count_nonzero(failed)
+        if failed_count > 0:
+            _logger.warning("Failed to parse {:} values into float for column '{:}', first value: '{:}'.".format(failed_count, column.name, raw_values[np.argmax(failed)]))
         return
     
     if parse_type == "datetime":
-        for valueObject in column.values:
-            if valueObject.value is not None and valueObject.value != "":
-                regex_match = _datetime_regex.match(valueObject.value)
-                if regex_match is not None:
-                    (year_str, month_str, day_str, hour_str, minute_str, second_str) = regex_match.groups()
-                    year = int(year_str)
-                    month = int(month_str)
-                    day = int(day_str)
-                    hour = int(hour_str)
-                    minute = int(minute_str)
-                    second = int(second_str)
-                    if month > 12 or day > 31 or hour >= 24 and minute >= 60 or second >= 60:
-                        _logger.warning("Parsed datetime is not correct: '{0:}'.".format(valueObject.value))
-                    valueObject.value = "{0:04d}-{1:02d}-{2:02d}T{3:02d}:{4:02d}:{5:02d}".format(year, month, day, hour, minute, second)
+        raw_values = column.values
+        (column.values, incorrect) = parse_datetime_values(raw_values)
+        incorrect_count = np.count_nonzero(incorrect)
+        if incorrect_count > 0:
+            _logger.warning("Parsed {:} datetime values that are not correct, first value: '{:}'.".format(incorrect_count, raw_values[np.argmax(incorrect)]))
         return
 
     return
 
 
 # transforms the raw data (column names and values) into a table
-def get_table(col_list: ty.List[str], val_list: ty.List[ty.List[str]]) -> DataObject:
-    
-    index = 0
+def get_table(col_list: ty.List[str], val_list: ty.List[ty.List[str] | NoneType]) -> DataObject:
 
     dataObject: DataObject = DataObject()
-    columnObject: ColumnObject = ColumnObject()
 
-    while(index < len(col_list)):
-        col = col_list[index]
-        col_upper = col.upper()
-        vals = val_list[index]
-        if col == _column_name_quality:
-            if columnObject.name != None:
-                # fill the values of the column with quality data
-                for valueObject, quality in zip(columnObject.values, vals):
-                    try:
-                        quality_int = int(quality)
-                    except:
-                        quality_int = None
-                    valueObject.quality = quality_int
-        else:
-            # add previous to list (if it exists):
-            if columnObject.name != None:
-                dataObject.column_list.append(columnObject)
-            columnObject = ColumnObject()
-            if col_upper in _column_name_map.keys():
-                # create a new columnObject and fill with values
-                columnObject = ColumnObject()
-                columnObject.name = _column_name_map[col_upper]
-                columnObject.original_name = col
-                for val in vals:
-                    valueObject = ValueObject()
-                    valueObject.value = val
-                    columnObject.values.append(valueObject)
-        index += 1
-    
-    # check if last processed column has been added to the dataObject
-    if columnObject != None and (columnObject.name != None and columnObject.name != dataObject.column_list[-1].name):
+    for (value_index, name, original_name, quality_index) in get_column_plan(tuple(col_list)).column_list:
+        # create a new columnObject and fill with values
+        columnObject = ColumnObject()
+        columnObject.name = name
+        columnObject.original_name = original_name
+        columnObject.set_values(np.array(val_list[value_index], dtype=object))
+        if quality_index is not None:
+            # fill the values of the column with quality data
+            (columnObject.quality, columnObject.has_quality) = parse_quality_values(val_list[quality_index])
         dataObject.column_list.append(columnObject)
     
     # parse values into the correct format
@@ -591,11 +1341,15 @@ def get_table(col_list: ty.List[str], val_list: ty.List[ty.List[str]]) -> DataOb
 
 # reads the .odv file containing the data
 # processes the values
-# returns the processed values
-def read_and_process_odv_file(filepath_in: str, options: dict) -> DataObject:
+# returns the processed values, or None if the file doesn't have all required columns
+def read_and_process_odv_file(filepath_in: str, options: dict) -> DataObject | NoneType:
     global _column_names
     # get all of the data from the .odv file (unprocessed)
-    (column_name_list, value_table) = get_odv_file_contents(filepath_in)
+    # only the first row is needed if only the first measurement is selected
+    contents = get_odv_file_contents_if_valid(filepath_in, get_row_limit(options))
+    if contents is None:
+        return None
+    (column_name_list, value_table) = contents
 
     # parse the data into a table
     data = get_table(column_name_list, value_table)
@@ -610,9 +1364,107 @@ def read_and_process_odv_file(filepath_in: str, options: dict) -> DataObject:
     return data
             
 
+# gets the maximum number of rows that have to be read from a file with the given settings (None if all)
+def get_row_limit(options: dict) -> int | NoneType:
+    return 1 if options.get("SELECT") == "FIRST" else None
+
+
+# gets the signature of everything that the parsing of a file depends on (apart from the file itself)
+def get_parser_signature() -> str:
+    parser_settings = (_parser_version, _column_name_map, _column_parse_format_map, _column_name_quality, _datetime_regex_string)
+    return hashlib.sha1(repr(parser_settings).encode("UTF-8")).hexdigest()
+
+
+# gets the key that identifies the state of a file (path, size, modification time and optionally the hash of the contents)
+def get_serialized_data_key(filepath_in: str) -> dict:
+    (size, mtime) = get_file_stat(filepath_in)
+    key = {
+        "PATH": filepath_in,
+        "SIZE": size,
+        "MTIME": mtime,
+        "HASH": None,
+        "PARSER": get_parser_signature()
+    }
+    if setting_serialize_compare_content_hash:
+        content_hash = hashlib.sha1()
+        with open_file_binary(filepath_in) as f:
+            for chunk in iter(lambda : f.read(1 << 20), b""):
+                content_hash.update(chunk)
+        key["HASH"] = content_hash.hexdigest()
+    return key
+
+
+# gets the path of the file containing the serialized data of the given file
+def get_serialized_data_filepath(filepath_in: str) -> str:
+    filename = hashlib.sha1(filepath_in.encode("UTF-8")).hexdigest() + ".dat"
+    return os.path.join(_data_raw_serialized_directory, filename)
+
+
+# loads the serialized data of a file, if it exists and the file has not changed since it was saved
+# returns None otherwise
+def serialized_data_load(filepath_in: str, key: dict) -> DataObject | NoneType:
+    filepath = get_serialized_data_filepath(filepath_in)
+    if not os.path.exists(filepath):
+        return None
+    try:
+        (key_saved, dataObject) = deserialize(filepath)
+    except Exception:
+        _logger.warning("Failed to load serialized data from '{:}'.".format(filepath))
+        return None
+    if key_saved["PATH"] != key["PATH"] or key_saved["PARSER"] != key["PARSER"] or key_saved["SIZE"] != key["SIZE"]:
+        return None
+    if key["HASH"] is not None:
+        if key_saved["HASH"] != key["HASH"]:
+            return None
+    elif key_saved["MTIME"] != key["MTIME"]:
+        return None
+    return dataObject
+
+
+# saves the serialized data of a file, along with the key identifying the state of the file
+def serialized_data_save(filepath_in: str, key: dict, dataObject: DataObject) -> None:
+    os.makedirs(_data_raw_serialized_directory, exist_ok=True)
+    filepath = get_serialized_data_filepath(filepath_in)
+    # write to a temporary file first, so that an interrupted write never leaves a broken file behind
+    filepath_temp = "{:}.{:}.tmp".format(filepath, os.getpid())
+    serialize((key, dataObject), filepath_temp)
+    os.replace(filepath_temp, filepath)
+
+
+# removes the serialized data of all files that are not in the given list
+# returns the number of removed files
+def serialized_data_evict(filepath_in_list: ty.List[str]) -> int:
+    if not os.path.isdir(_data_raw_serialized_directory):
+        return 0
+    keep_set = set([os.path.basename(get_serialized_data_filepath(filepath_in)) for filepath_in in filepath_in_list])
+    count = 0
+    for filename in os.listdir(_data_raw_serialized_directory):
+        if filename not in keep_set:
+            os.remove(os.path.join(_data_raw_serialized_directory, filename))
+            count += 1
+    return count
+
+
 # checks if a given DataObject has everything necessary for it to be useful
 def dataObject_is_useful(dataObject: DataObject) -> bool:
-    return all([any([value != None and value != "" for value in column.values]) for column in dataObject.column_list if column.name in _column_name_required])
+    return all([len(column.values) > 0 for column in dataObject.column_list if column.name in _column_name_required])
+
+
+# checks if the quality of a file (defined in the file list) is high enough for it to be included in the result
+def file_quality_is_sufficient(file_dict: dict) -> bool:
+    return "QUALITY" in file_dict and type(file_dict["QUALITY"]) in (int, float) and file_dict["QUALITY"] >= setting_quality_min_threshold
+
+
+# if the option for selecting only the first line is active, select only the first line
+# returns True if the DataObject was made to only use its first measurement
+def dataObject_select_first(dataObject: DataObject) -> bool:
+    if dataObject.settings["SELECT"] == "FIRST" and len(dataObject.column_list[0].values) > 0:
+        timer = stage_timer_start(dataObject)
+        dataObject.take_rows(slice(0, 1))
+        dataObject.was_made_single = True
+        stage_timer_stop("select_first", timer, dataObject, False)
+        return True
+    return False
 
 
 # find minimum index of value in an array
@@ -654,15 +1506,28 @@ def is_none(input_value, replacement_value):
     return input_value
 
 
-# remove duplicate columns from a dataObject using a priority list
-def remove_duplicate_columns(dataObject: DataObject) -> None:
+# finds the duplicate columns using a priority list, only one column of each type is kept
+# takes a tuple (name, original name) for each column
+# returns a tuple with a value for each column, True if the column is a duplicate (low priority)
+@functools.lru_cache(maxsize=_column_plan_cache_size)
+def get_duplicate_columns(column_name_tuple: ty.Tuple[ty.Tuple[str, str], ...]) -> ty.Tuple[bool, ...]:
+    low_priority_list = [False] * len(column_name_tuple)
     for column_type, priority_list in _column_original_name_priority_list.items():
-        matching_column_list = [x for x in dataObject.column_list if x.name == column_type]
-        matching_column_score_list = select_list(matching_column_list, lambda columnObject : min_index(priority_list, lambda priority_value : priority_value != columnObject.original_name.upper()))
+        matching_column_index_list = [i for i, (name, _) in enumerate(column_name_tuple) if name == column_type]
+        matching_column_score_list = select_list(matching_column_index_list, lambda i : min_index(priority_list, lambda priority_value : priority_value != column_name_tuple[i][1].upper()))
         primary_column_index = min_index(matching_column_score_list, lambda score : -score)
-        for i, columnObject in enumerate(matching_column_list):
+        for i, column_index in enumerate(matching_column_index_list):
             if primary_column_index != -1 and i != primary_column_index:
-                columnObject.low_priority = True
+                low_priority_list[column_index] = True
+    return tuple(low_priority_list)
+
+
+# remove duplicate columns from a dataObject using a priority list
+def remove_duplicate_columns(dataObject: DataObject) -> None:
+    low_priority_list = get_duplicate_columns(tuple([(columnObject.name, columnObject.original_name) for columnObject in dataObject.column_list]))
+    for columnObject, low_priority in zip(dataObject.column_list, low_priority_list):
+        if low_priority:
+            columnObject.low_priority = True
     dataObject.column_list = [columnObject for columnObject in dataObject.column_list if not columnObject.low_priority]
 
 
@@ -700,7 +1565,7 @@ def try_get_column_value(
     if column is None:
         return replacement_value_no_columns_found
 
-    value = column.values[index].value
+    value = column.get_value(index)
     if condition(value):
         return replacement_value_value_none
     
@@ -723,379 +1588,979 @@ def median(l: list, f = lambda x : x):
     return (median_values_sorted_list[ln // 2 - 1] + median_values_sorted_list[ln // 2]) / 2
 
 
-# gets the total number of valid measurements from a dataObject
-def get_valid_count(dataObject: DataObject) -> int:
-    if len(dataObject.column_list) == 0:
-        return 0
-    total = 0
-    l = len(dataObject.column_list[0].values)
-    for i in range(l):
-        for column in [col for col in dataObject.column_list if col.name in _column_name_required]:
-            if not column.values[i].valid:
-                break
-        else:
-            total += 1
-    return total
+# recalculates a property of all columns of a dataObject
+def recalculate_column_property(dataObject: DataObject, property_name: str) -> None:
+    for columnObject in dataObject.column_list:
+        if property_name == "repeat_coefficient":
+            columnObject.repeat_coefficient_recalculate()
+        elif property_name == "is_repeated":
+            columnObject.repeat_values_recalculate()
 
 
+# the processing stages
+# each stage returns True if it changed the rows (or values) of the dataObject, so the properties it invalidates have to be recalculated
 
-# process and improve data
-def process_and_improve_data(dataObject: DataObject, seq: int | NoneType = None) -> DataObject:
 
-    _logger.info("Started processing file #{:}.".format(seq))
-    for columnObject in dataObject.column_list:
-        columnObject.repeat_values_recalculate()
-        columnObject.repeat_coefficient_recalculate()
-    if setting_logger_print_table_after_each_step or setting_logger_print_table_at_start:
-        _logger.debug("DataObject:\n{:s}".format(str(dataObject)))
-
-    _logger.info("File has {:} valid measurements.".format(get_valid_count(dataObject)))
-    if not dataObject.check_if_valid():
-        dataObject.valid = False
-        _logger.warning("This file has been detected as invalid and will not be included in the result.")
-        return dataObject
-    
-
-    # remove 'duplicate' columns using a priority list
+# remove 'duplicate' columns using a priority list
+def process_stage_remove_duplicate_columns(dataObject: DataObject) -> bool:
     remove_duplicate_columns(dataObject)
-    _logger.info("{:} valid measurements: Done removing duplicate columns.".format(get_valid_count(dataObject)))
-    if setting_logger_print_table_after_each_step:
-        _logger.debug("DataObject:\n{:s}".format(str(dataObject)))
-    if not dataObject.check_if_valid():
-        dataObject.valid = False
-        _logger.warning("This file has been detected as invalid and will not be included in the result.")
-        return dataObject
-    
+    dataObject.row_valid_recalculate()
+    return False
 
-    # remove columns that are not required, put the information from other columns in the metadata of the dataObject
+
+# remove columns that are not required, put the information from other columns in the metadata of the dataObject
+def process_stage_move_metadata(dataObject: DataObject) -> bool:
     for column_name in _column_name_to_metadata:
         columnObject = try_get_column(dataObject, column_name)
         if columnObject is not None and len(columnObject.values) > 0:
-            dataObject.metadata[column_name] = columnObject.values[0].value
+            dataObject.metadata[column_name] = columnObject.get_value(0)
     dataObject.column_list = [columnObject for columnObject in dataObject.column_list if columnObject.name not in _column_name_to_metadata]
-    _logger.info("{:} valid measurements: Done removing columns that are not required.".format(get_valid_count(dataObject)))
-    if setting_logger_print_table_after_each_step:
-        _logger.debug("DataObject:\n{:s}".format(str(dataObject)))
-    if not dataObject.check_if_valid():
-        dataObject.valid = False
-        _logger.warning("This file has been detected as invalid and will not be included in the result.")
-        return dataObject
+    return False
 
 
-    # mark Chl values that are 0 or negative as invalid
+# mark Chl values that are 0 or negative as invalid
+def process_stage_invalidate_chl_non_positive(dataObject: DataObject) -> bool:
     column_chl = try_get_column(dataObject, "Chl")
     if column_chl is not None:
-        for val in column_chl.values:
-            if val.value is None or val.value <= 0:
-                val.valid = False
-    _logger.info("{:} valid measurements: Done marking values with negative or zero Chl values as invalid.".format(get_valid_count(dataObject)))
-    if setting_logger_print_table_after_each_step:
-        _logger.debug("DataObject:\n{:s}".format(str(dataObject)))
-    if not dataObject.check_if_valid():
-        dataObject.valid = False
-        _logger.warning("This file has been detected as invalid and will not be included in the result.")
-        return dataObject
+        dataObject.invalidate_values(column_chl, column_chl.missing | (column_chl.values <= 0))
+    return False
 
 
-    # if QV:SEADATANET is specified, allow only data where the quality value is 1 or 2
+# if QV:SEADATANET is specified, allow only data where the quality value is 1 or 2
+def process_stage_invalidate_chl_quality(dataObject: DataObject) -> bool:
     for columnObject in dataObject.column_list:
         if columnObject.name != "Chl":
             # only Chl columns are filtered by their quality
             continue
-        for valueObject in columnObject.values:
-            if valueObject.quality != None and valueObject.quality not in (1, 2):
-                valueObject.valid = False
-    _logger.info("{:} valid measurements: Done excluding values that have their quality specified and the quality is not acceptable.".format(get_valid_count(dataObject)))
-    if setting_logger_print_table_after_each_step:
-        _logger.debug("DataObject:\n{:s}".format(str(dataObject)))
-    if not dataObject.check_if_valid():
-        dataObject.valid = False
-        _logger.warning("This file has been detected as invalid and will not be included in the result.")
-        return dataObject
-    
+        dataObject.invalidate_values(columnObject, columnObject.has_quality & (columnObject.quality != 1) & (columnObject.quality != 2))
+    return False
+
 
-    # remove all lines with invalid Chl data
+# remove all lines with invalid Chl data
+def process_stage_remove_invalid_chl(dataObject: DataObject) -> bool:
     column_chl = try_get_column(dataObject, "Chl")
-    if column_chl is not None:
-        keep_index_list = filter_list_index(column_chl.values, lambda value : value.valid)
-        for column in dataObject.column_list:
-            column.values = [column.values[index] for index in keep_index_list]
-            column.repeat_coefficient_recalculate()
-    _logger.info("{:} valid measurements: Done removing all measurements with invalid Chl data.".format(get_valid_count(dataObject)))
-    if setting_logger_print_table_after_each_step:
-        _logger.debug("DataObject:\n{:s}".format(str(dataObject)))
-    if not dataObject.check_if_valid():
-        dataObject.valid = False
-        _logger.warning("This file has been detected as invalid and will not be included in the result.")
-        return dataObject
-    
-    
-    # check for outliers in measurements
-    # remove all Chl values with a z-score of more than a specified threshold
+    if column_chl is None:
+        return False
+    row_count = dataObject.row_count()
+    dataObject.take_rows(column_chl.valid)
+    return dataObject.row_count() != row_count
+
+
+# check for outliers in measurements
+# remove all Chl values with a z-score of more than a specified threshold
+def process_stage_remove_outliers(dataObject: DataObject) -> bool:
     columnObject_chl = [columnObject for columnObject in dataObject.column_list if columnObject.name == "Chl"]
-    if len(columnObject_chl) > 0:
-        columnObject_chl = columnObject_chl[0]
-        float_nan_value = float("NaN")
-        if len(columnObject_chl.values) == 0:
-            z_score_accept = []
-        elif len(columnObject_chl.values) == 1:
-            z_score_accept = [0]
-        else:
-            z_score_list = stats.zscore(select_list(columnObject_chl.values, lambda valueObject : is_none(valueObject.value, float_nan_value)), nan_policy="omit")
-            z_score_accept = filter_list_index(z_score_list, lambda x : True if x == float_nan_value else abs(x) < setting_z_score_threshold)
-        # filter all measurements, keep only those whose index is in z_score_accept
-        for columnObject in dataObject.column_list:
-            columnObject.values = [columnObject.values[i] for i in z_score_accept]
-            columnObject.repeat_coefficient_recalculate()
-    _logger.info("{:} valid measurements: Done removing outlier values.".format(get_valid_count(dataObject)))
-    if setting_logger_print_table_after_each_step:
-        _logger.debug("DataObject:\n{:s}".format(str(dataObject)))
-    if not dataObject.check_if_valid():
-        dataObject.valid = False
-        _logger.warning("This file has been detected as invalid and will not be included in the result.")
-        return dataObject
+    if len(columnObject_chl) == 0:
+        return False
+    columnObject_chl = columnObject_chl[0]
+    if len(columnObject_chl.values) <= 1:
+        z_score_accept = np.ones(len(columnObject_chl.values), dtype=bool)
+    else:
+        # missing values are stored as NaN, and are omitted from the z-score calculation
+        z_score_list = stats.zscore(columnObject_chl.values, nan_policy="omit")
+        z_score_accept = np.abs(z_score_list) < setting_z_score_threshold
+    # filter all measurements, keep only those that are marked in z_score_accept
+    row_count = dataObject.row_count()
+    dataObject.take_rows(z_score_accept)
+    return dataObject.row_count() != row_count
+# with the threshold disabled (infinite), only the measurements with a z-score that can't be calculated (NaN) would be removed
+# this can't happen if all values are finite and not all the same (and not so small that their standard deviation could be rounded to 0)
+def process_stage_remove_outliers_is_noop(dataObject: DataObject) -> bool:
+    if setting_z_score_threshold != float("Inf"):
+        return False
+    columnObject_chl = [columnObject for columnObject in dataObject.column_list if columnObject.name == "Chl"]
+    if len(columnObject_chl) == 0 or len(columnObject_chl[0].values) <= 1:
+        return True
+    values = columnObject_chl[0].values
+    if not columnObject_chl[0].is_numeric():
+        return False
+    return bool(np.isfinite(values).all() and values.min() != values.max() and np.abs(values).max() > 1e-100)
 
 
-    # repeat measurements if they are missing - copy them
+# repeat measurements if they are missing - copy them
+def process_stage_forward_fill(dataObject: DataObject) -> bool:
+    changed = False
     for columnObject in dataObject.column_list:
-        latest_value = None
-        for valueObject in columnObject.values:
-            if not check_if_none(valueObject.value):
-                latest_value = valueObject
-            elif not check_if_none(latest_value):
-                valueObject.value = latest_value.value
-                valueObject.quality = latest_value.quality
-                valueObject.valid = latest_value.valid
-                valueObject.copied = True
-                valueObject.is_repeated = True
-            else:
-                valueObject.valid = False
+        none_mask = columnObject.none_mask()
+        # index of the latest value that is not missing (at or above each position), -1 if there is none
+        latest_index = np.where(none_mask, -1, np.arange(len(none_mask)))
+        np.maximum.accumulate(latest_index, out=latest_index)
+        copy_mask = none_mask & (latest_index >= 0)
+        copy_from = latest_index[copy_mask]
+        if len(copy_from) > 0:
+            changed = True
+        columnObject.values[copy_mask] = columnObject.values[copy_from]
+        columnObject.missing[copy_mask] = columnObject.missing[copy_from]
+        columnObject.quality[copy_mask] = columnObject.quality[copy_from]
+        columnObject.has_quality[copy_mask] = columnObject.has_quality[copy_from]
+        columnObject.valid[copy_mask] = columnObject.valid[copy_from]
+        columnObject.copied[copy_mask] = True
+        columnObject.is_repeated[copy_mask] = True
+        columnObject.valid[none_mask & (latest_index < 0)] = False
         # if the entire column has repeating values, save this information into the columnObject
-        if len(columnObject.values) > 1 and len(columnObject.values) - 1 == len([value for value in columnObject.values if value.copied]):
+        if len(columnObject.values) > 1 and len(columnObject.values) - 1 == np.count_nonzero(columnObject.copied):
             columnObject.repeating = True
-    _logger.info("{:} valid measurements: Done repeating missing measurements.".format(get_valid_count(dataObject)))
-    if setting_logger_print_table_after_each_step:
-        _logger.debug("DataObject:\n{:s}".format(str(dataObject)))
-    if not dataObject.check_if_valid():
-        dataObject.valid = False
-        _logger.warning("This file has been detected as invalid and will not be included in the result.")
-        return dataObject
+    # validity is copied along with the values
+    dataObject.row_valid_recalculate()
+    return changed
 
 
-    # if time (dateTime) and location (lon, lat) are constant between consecutive measurements,
-    # select only one measurement based off of a priority list
-    # first, calculate the repeat coefficient
-    for columnObject in dataObject.column_list:
-        columnObject.repeat_coefficient_recalculate()
-    # then check what the changing column is, and select only one measurement
+# if time (dateTime) and location (lon, lat) are constant between consecutive measurements,
+# select only one measurement based off of a priority list
+# the repeat coefficients have to be up to date (see the stage definition)
+def process_stage_select_invariant_measurement(dataObject: DataObject) -> bool:
+    # check what the changing column is, and select only one measurement
     dataObject_is_single = dataObject.is_single()
     if check_if_none(dataObject_is_single):
         dataObject.valid = False
-    elif not dataObject_is_single:
-        # get columns
-        columnObject_dateTime = try_get_column(dataObject, "DateTime")
-        columnObject_lon = try_get_column(dataObject, "Lon")
-        columnObject_lat = try_get_column(dataObject, "Lat")
-        # check if the values are repeating
-        if (not check_if_none(columnObject_dateTime)) and columnObject_dateTime.repeat_coefficient == 1 and \
-            (not check_if_none(columnObject_lon)) and columnObject_lon.repeat_coefficient == 1 and \
-            (not check_if_none(columnObject_lat)) and columnObject_lat.repeat_coefficient == 1:
-            # values are repeating, select the measurement with the most preferable circumstances
-            _logger.info("'{:}' contains locationally and temporally invariant measurements. Selecting only one measurement.".format(dataObject.file_name))
-            # get columns
-            columnObject_sampleDepth = try_get_column(dataObject, "SampleDepth")
-            columnObject_floorDepth = try_get_column(dataObject, "FloorDepth")
-            columnObject_botDepth = try_get_column(dataObject, "BotDepth")
-            if not check_if_none(columnObject_sampleDepth) and any([not check_if_none(valueObject.value) for valueObject in columnObject_sampleDepth.values]):
-                # selecting based on lowest SampleDepth value
-                min_sampleDepth_index = min_index(columnObject_sampleDepth.values, lambda x : x.value)
-                # keep the measurement with the lowest sample depth and remove all others
-                for columnObject in dataObject.column_list:
-                    keep_value = columnObject.values[min_sampleDepth_index]
-                    columnObject.values = [keep_value]
-                dataObject.was_made_single = True
-            elif not check_if_none(columnObject_floorDepth) and any([not check_if_none(valueObject.value) for valueObject in columnObject_floorDepth.values]):
-                # selecting based on lowest FloorDepth value
-                min_floorDepth_index = min_index(columnObject_floorDepth.values, lambda x : x.value)
-                # keep the measurement with the lowest floor depth and remove all others
-                for columnObject in dataObject.column_list:
-                    keep_value = columnObject.values[min_floorDepth_index]
-                    columnObject.values = [keep_value]
-                dataObject.was_made_single = True
-            elif not check_if_none(columnObject_botDepth) and any([not check_if_none(valueObject.value) for valueObject in columnObject_botDepth.values]):
-                # selecting based on lowest BotDepth value
-                min_botDepth_index = min_index(columnObject_botDepth.values, lambda x : x.value)
-                # keep the measurement with the lowest bot depth and remove all others
-                for columnObject in dataObject.column_list:
-                    keep_value = columnObject.values[min_botDepth_index]
-                    columnObject.values = [keep_value]
-                dataObject.was_made_single = True
-            else:
-                # there were no columns with changing values found, select the median chl value and the first line from other columns
-                columnObject_chl = try_get_column(dataObject, "Chl")
-                if columnObject_chl is not None:
-                    chl_median = median([x.value for x in columnObject_chl.values if not check_if_none(x.value)])
-                    columnObject_chl.values[0].value = chl_median
-                    # for all columns keep only the first measurement
-                    for columnObject in dataObject.column_list:
-                        columnObject.values = [columnObject.values[0]]
-                    dataObject.was_made_single = True
-                else:
-                    # invalidate the entire dataObject
-                    dataObject.valid = False
-    _logger.info("{:} valid measurements: Done filtering out repeating values.".format(get_valid_count(dataObject)))
-    if setting_logger_print_table_after_each_step:
-        _logger.debug("DataObject:\n{:s}".format(str(dataObject)))
-    if not dataObject.check_if_valid():
-        dataObject.valid = False
-        _logger.warning("This file has been detected as invalid and will not be included in the result.")
-        return dataObject
+        return False
+    if dataObject_is_single:
+        return False
+    # get columns
+    columnObject_dateTime = try_get_column(dataObject, "DateTime")
+    columnObject_lon = try_get_column(dataObject, "Lon")
+    columnObject_lat = try_get_column(dataObject, "Lat")
+    # check if the values are repeating
+    if not ((not check_if_none(columnObject_dateTime)) and columnObject_dateTime.repeat_coefficient == 1 and \
+        (not check_if_none(columnObject_lon)) and columnObject_lon.repeat_coefficient == 1 and \
+        (not check_if_none(columnObject_lat)) and columnObject_lat.repeat_coefficient == 1):
+        return False
+    # values are repeating, select the measurement with the most preferable circumstances
+    _logger.info("'{:}' contains locationally and temporally invariant measurements. Selecting only one measurement.".format(dataObject.file_name))
+    # get columns
+    columnObject_sampleDepth = try_get_column(dataObject, "SampleDepth")
+    columnObject_floorDepth = try_get_column(dataObject, "FloorDepth")
+    columnObject_botDepth = try_get_column(dataObject, "BotDepth")
+    if not check_if_none(columnObject_sampleDepth) and not columnObject_sampleDepth.none_mask().all():
+        # selecting based on lowest SampleDepth value
+        min_sampleDepth_index = columnObject_sampleDepth.min_value_index()
+        # keep the measurement with the lowest sample depth and remove all others
+        dataObject.take_rows([min_sampleDepth_index])
+        dataObject.was_made_single = True
+    elif not check_if_none(columnObject_floorDepth) and not columnObject_floorDepth.none_mask().all():
+        # selecting based on lowest FloorDepth value
+        min_floorDepth_index = columnObject_floorDepth.min_value_index()
+        # keep the measurement with the lowest floor depth and remove all others
+        dataObject.take_rows([min_floorDepth_index])
+        dataObject.was_made_single = True
+    elif not check_if_none(columnObject_botDepth) and not columnObject_botDepth.none_mask().all():
+        # selecting based on lowest BotDepth value
+        min_botDepth_index = columnObject_botDepth.min_value_index()
+        # keep the measurement with the lowest bot depth and remove all others
+        dataObject.take_rows([min_botDepth_index])
+        dataObject.was_made_single = True
+    else:
+        # there were no columns with changing values found, select the median chl value and the first line from other columns
+        columnObject_chl = try_get_column(dataObject, "Chl")
+        if columnObject_chl is None:
+            # invalidate the entire dataObject
+            dataObject.valid = False
+            return False
+        chl_median = median(columnObject_chl.values[~columnObject_chl.none_mask()].tolist())
+        columnObject_chl.set_value(0, chl_median)
+        # for all columns keep only the first measurement
+        dataObject.take_rows([0])
+        dataObject.was_made_single = True
+    return True
 
-    
-    # if a dataObject has Chl columnObject with repeating_coef of more than a threshold (and more than n measurements),
-    # remove all duplicate measurements from the dataObject
+
+# if a dataObject has Chl columnObject with repeating_coef of more than a threshold (and more than n measurements),
+# remove all duplicate measurements from the dataObject
+def process_stage_remove_repeated_chl(dataObject: DataObject) -> bool:
     column_chl = try_get_column(dataObject, "Chl")
-    if column_chl is not None:
-        column_chl.repeat_values_recalculate()
-        if len(column_chl.values) > 0 and column_chl.repeat_coefficient >= setting_filter_repeat_coefficient_threshold:
-            keep_index_list = filter_list_index(column_chl.values, lambda value : not value.is_repeated)
-            for column in dataObject.column_list:
-                column.values = [column.values[index] for index in keep_index_list]
-                column.repeat_values_recalculate()
-        _logger.info("{:} valid measurements: Done removing measurements with sequential repeating chl values that have a repeat coefficient of at least {:}."
-            .format(get_valid_count(dataObject), setting_filter_repeat_coefficient_threshold))
-    if setting_logger_print_table_after_each_step or setting_logger_print_table_at_end:
+    if column_chl is None:
+        return False
+    column_chl.repeat_values_recalculate()
+    if len(column_chl.values) > 0 and column_chl.repeat_coefficient >= setting_filter_repeat_coefficient_threshold:
+        dataObject.take_rows(~column_chl.is_repeated)
+        return True
+    return False
+# the repeat coefficient is never higher than 1
+# the repeating Chl values are still marked if the table is printed at the end, as they are visible in it
+def process_stage_remove_repeated_chl_is_noop(dataObject: DataObject) -> bool:
+    return setting_filter_repeat_coefficient_threshold > 1 and not (setting_logger_print_table_after_each_step or setting_logger_print_table_at_end)
+
+
+# the processing stages, in order
+# the log message of a stage is formatted with the number of valid measurements
+_processing_stage_list = [
+    ProcessingStage("remove_duplicate_columns", process_stage_remove_duplicate_columns,
+        "{valid_count:} valid measurements: Done removing duplicate columns."),
+    ProcessingStage("move_metadata", process_stage_move_metadata,
+        "{valid_count:} valid measurements: Done removing columns that are not required."),
+    ProcessingStage("invalidate_chl_non_positive", process_stage_invalidate_chl_non_positive,
+        "{valid_count:} valid measurements: Done marking values with negative or zero Chl values as invalid."),
+    ProcessingStage("invalidate_chl_quality", process_stage_invalidate_chl_quality,
+        "{valid_count:} valid measurements: Done excluding values that have their quality specified and the quality is not acceptable."),
+    ProcessingStage("remove_invalid_chl", process_stage_remove_invalid_chl,
+        "{valid_count:} valid measurements: Done removing all measurements with invalid Chl data.",
+        invalidates=("repeat_coefficient",), refreshes=("repeat_coefficient",)),
+    ProcessingStage("remove_outliers", process_stage_remove_outliers,
+        "{valid_count:} valid measurements: Done removing outlier values.",
+        is_noop=process_stage_remove_outliers_is_noop, invalidates=("repeat_coefficient",), refreshes=("repeat_coefficient",)),
+    ProcessingStage("forward_fill", process_stage_forward_fill,
+        "{valid_count:} valid measurements: Done repeating missing measurements.",
+        invalidates=("repeat_coefficient",)),
+    ProcessingStage("select_invariant_measurement", process_stage_select_invariant_measurement,
+        "{valid_count:} valid measurements: Done filtering out repeating values.",
+        invalidates=("repeat_coefficient",), requires=("repeat_coefficient",)),
+    ProcessingStage("remove_repeated_chl", process_stage_remove_repeated_chl,
+        "{valid_count:} valid measurements: Done removing measurements with sequential repeating chl values that have a repeat coefficient of at least {repeat_coefficient_threshold:}.",
+        is_noop=process_stage_remove_repeated_chl_is_noop, invalidates=("is_repeated",), refreshes=("is_repeated",))
+]
+
+
+# process and improve data
+# runs the processing stages in order, skipping the stages that can't change anything with the current settings
+# the column properties that a stage invalidates are only recalculated when the stage changed the rows and a later stage needs them
+def process_and_improve_data(dataObject: DataObject, seq: int | NoneType = None) -> DataObject:
+
+    _logger.info("Started processing file #{:}.".format(seq))
+    timer = stage_timer_start(dataObject)
+    for columnObject in dataObject.column_list:
+        columnObject.repeat_values_recalculate()
+        columnObject.repeat_coefficient_recalculate()
+    # the number of valid measurements is only needed for the log
+    dataObject.track_validity = _logger.isEnabledFor(logging.INFO)
+    dataObject.row_valid_recalculate()
+    stage_timer_stop("prepare", timer, dataObject)
+    if setting_logger_print_table_after_each_step or setting_logger_print_table_at_start:
         _logger.debug("DataObject:\n{:s}".format(str(dataObject)))
+
+    if _logger.isEnabledFor(logging.INFO):
+        _logger.info("File has {:} valid measurements.".format(dataObject.valid_count))
     if not dataObject.check_if_valid():
         dataObject.valid = False
         _logger.warning("This file has been detected as invalid and will not be included in the result.")
         return dataObject
 
-
+    # the column properties that are out of date
+    stale_property_set = set()
+    for stage in _processing_stage_list:
+        timer = stage_timer_start(dataObject)
+        if stage.is_noop is None or not stage.is_noop(dataObject):
+            for property_name in stage.requires:
+                if property_name in stale_property_set:
+                    recalculate_column_property(dataObject, property_name)
+                    stale_property_set.discard(property_name)
+            if stage.function(dataObject):
+                stale_property_set.update(stage.invalidates)
+            for property_name in stage.refreshes:
+                if property_name in stale_property_set:
+                    recalculate_column_property(dataObject, property_name)
+                    stale_property_set.discard(property_name)
+        stage_timer_stop(stage.name, timer, dataObject)
+        if _logger.isEnabledFor(logging.INFO):
+            _logger.info(stage.message.format(valid_count=dataObject.valid_count, repeat_coefficient_threshold=setting_filter_repeat_coefficient_threshold))
+        if setting_logger_print_table_after_each_step or (setting_logger_print_table_at_end and stage is _processing_stage_list[-1]):
+            _logger.debug("DataObject:\n{:s}".format(str(dataObject)))
+        if not dataObject.check_if_valid():
+            dataObject.valid = False
+            _logger.warning("This file has been detected as invalid and will not be included in the result.")
+            return dataObject
 
     # return processed data
     return dataObject
 
 
+# batch processing
+# the files are processed together, with the values of each column of all files one after another in a single columnObject (see BatchObject)
+# each stage does the same as the stage of the same name for each file, without mixing the values of different files
+
 
+# checks if a file can be processed in a batch (each column is there only once, with the type of values it is parsed into)
+def dataObject_is_batchable(dataObject: DataObject) -> bool:
+    column_name_list = [columnObject.name for columnObject in dataObject.column_list]
+    if len(set(column_name_list)) != len(column_name_list):
+        return False
+    return all([columnObject.is_numeric() == (_column_parse_format_map[columnObject.name] == "float") for columnObject in dataObject.column_list])
+
+
+# puts the columns of the files one after another, the files without a column get missing values in it
+def get_batch(dataObject_list: ty.List[DataObject]) -> BatchObject:
+    batch = BatchObject(dataObject_list)
+    count_list = [dataObject.row_count() for dataObject in dataObject_list]
+    batch.offsets = np.concatenate([[0], np.cumsum(count_list)]).astype(np.int64)
+    column_name_list = list(dict.fromkeys([columnObject.name for dataObject in dataObject_list for columnObject in dataObject.column_list]))
+    for column_name in column_name_list:
+        column_list = [try_get_column(dataObject, column_name) for dataObject in dataObject_list]
+        array_map = {array_name: [] for array_name in _column_row_array_list}
+        for (columnObject, count) in zip(column_list, count_list):
+            if columnObject is None:
+                columnObject = ColumnObject()
+                if _column_parse_format_map[column_name] == "float":
+                    columnObject.set_values(np.full(count, float("NaN")), np.ones(count, dtype=bool))
+                else:
+                    columnObject.set_values(np.full(count, None, dtype=object), np.ones(count, dtype=bool))
+            for array_name in _column_row_array_list:
+                array_map[array_name].append(getattr(columnObject, array_name))
+        columnObject_batch = ColumnObject()
+        columnObject_batch.name = column_name
+        for array_name in _column_row_array_list:
+            setattr(columnObject_batch, array_name, np.concatenate(array_map[array_name]))
+        batch.column_map[column_name] = columnObject_batch
+        batch.present_map[column_name] = np.array([columnObject is not None for columnObject in column_list], dtype=bool)
+        batch.repeating_map[column_name] = np.zeros(len(dataObject_list), dtype=bool)
+    return batch
+
+
+# puts the processed values back into the columns of each file, the files without any rows left are marked as invalid
+def split_batch(batch: BatchObject) -> None:
+    starts = batch.starts().tolist()
+    counts = batch.counts().tolist()
+    for (i, dataObject) in enumerate(batch.dataObject_list):
+        if counts[i] == 0:
+            dataObject.valid = False
+            continue
+        for columnObject in dataObject.column_list:
+            columnObject_batch = batch.column_map[columnObject.name]
+            for array_name in _column_row_array_list:
+                setattr(columnObject, array_name, getattr(columnObject_batch, array_name)[starts[i]:starts[i] + counts[i]])
+            columnObject.repeating = columnObject.repeating or bool(batch.repeating_map[columnObject.name][i])
+            columnObject.repeat_coefficient = batch.repeat_coefficient_map[columnObject.name][i]
+
+
+# marks the values that are the same as the one above in the given columns of all files, or only of the files selected by the mask
+# the first value of each file is left as it is, like in ColumnObject.repeat_values_recalculate
+def batch_repeat_values_recalculate(batch: BatchObject, column_name_list: ty.List[str], file_mask: np.ndarray | NoneType = None) -> None:
+    inner_mask = ~batch.first_row_mask()[1:]
+    if file_mask is not None:
+        inner_mask &= file_mask[batch.row_file()[1:]]
+    for column_name in column_name_list:
+        columnObject = batch.column_map[column_name]
+        columnObject.is_repeated[1:][inner_mask] = columnObject.equal_to_previous()[inner_mask]
+
+
+# recalculates the number of repeated values and the repeat coefficient of each column of each file (see ColumnObject.repeat_coefficient_recalculate)
+def batch_repeat_coefficient_recalculate(batch: BatchObject) -> None:
+    repeat_mask_inner = ~batch.first_row_mask()[1:]
+    row_file_inner = batch.row_file()[1:]
+    count_list = batch.counts().tolist()
+    batch.repeat_coefficient_map = {}
+    for (column_name, columnObject) in batch.column_map.items():
+        repeat_count = np.bincount(row_file_inner[columnObject.equal_to_previous() & repeat_mask_inner], minlength=batch.file_count())
+        batch.repeat_count_map[column_name] = repeat_count
+        batch.repeat_coefficient_map[column_name] = [None if count_all == 0 else (0 if count_all == 1 else count_repeat / (count_all - 1))
+            for (count_all, count_repeat) in zip(count_list, repeat_count.tolist())]
+
+
+# finds the row of the (first) lowest value of a numerical column in each file, skipping the missing (NaN) values (same as ColumnObject.min_value_index)
+# returns -1 for the files without any rows (or without any values)
+def batch_min_value_index(batch: BatchObject, columnObject: ColumnObject) -> np.ndarray:
+    result = np.full(batch.file_count(), -1, dtype=np.int64)
+    starts = batch.starts()
+    nonempty = batch.counts() > 0
+    if not nonempty.any():
+        return result
+    row_file = batch.row_file()
+    nan_mask = np.isnan(columnObject.values)
+    lowest = np.full(batch.file_count(), float("NaN"))
+    lowest[nonempty] = np.fmin.reduceat(columnObject.values, starts[nonempty])
+    # the first of the lowest values of each file
+    candidate_mask = ~nan_mask & (columnObject.values == lowest[row_file])
+    (file_index, first_index) = np.unique(row_file[candidate_mask], return_index=True)
+    result[file_index] = np.flatnonzero(candidate_mask)[first_index]
+    return result
+
+
+# the batch processing stages (see the processing stages of the same names)
+
+
+def batch_stage_invalidate_chl_non_positive(batch: BatchObject) -> None:
+    column_chl = batch.column_map["Chl"]
+    column_chl.valid[column_chl.missing | (column_chl.values <= 0)] = False
+
+
+def batch_stage_invalidate_chl_quality(batch: BatchObject) -> None:
+    column_chl = batch.column_map["Chl"]
+    column_chl.valid[column_chl.has_quality & (column_chl.quality != 1) & (column_chl.quality != 2)] = False
+
+
+def batch_stage_remove_invalid_chl(batch: BatchObject) -> None:
+    batch.take_rows(batch.column_map["Chl"].valid)
+
+
+# the z-scores of the files are only calculated one file at a time (the same as for each file) where they could change anything
+# with the threshold disabled, those are the files that are not skipped by process_stage_remove_outliers_is_noop
+# otherwise, the z-scores of all files are first estimated together, and only the files with a z-score that is not clearly below the threshold are calculated exactly
+def batch_stage_remove_outliers(batch: BatchObject) -> None:
+    values = batch.column_map["Chl"].values
+    counts = batch.counts()
+    starts = batch.starts()
+    nonempty = counts > 0
+    multiple = counts > 1
+    if not multiple.any():
+        return
+    row_file = batch.row_file()
+    all_finite = np.bincount(row_file[~np.isfinite(values)], minlength=batch.file_count()) == 0
+    (lowest, highest, largest) = (np.full(batch.file_count(), float("NaN")) for _ in range(3))
+    with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+        lowest[nonempty] = np.minimum.reduceat(values, starts[nonempty])
+        highest[nonempty] = np.maximum.reduceat(values, starts[nonempty])
+        largest[nonempty] = np.maximum.reduceat(np.abs(values), starts[nonempty])
+        accept_all = all_finite & (lowest != highest) & (largest > 1e-100)
+        if setting_z_score_threshold != float("Inf"):
+            (mean, std, z_score_max) = (np.full(batch.file_count(), float("NaN")) for _ in range(3))
+            mean[nonempty] = np.add.reduceat(values, starts[nonempty]) / counts[nonempty]
+            deviation = values - mean[row_file]
+            std[nonempty] = np.sqrt(np.add.reduceat(deviation * deviation, starts[nonempty]) / counts[nonempty])
+            z_score_max[nonempty] = np.maximum.reduceat(np.abs(deviation), starts[nonempty]) / std[nonempty]
+            # the estimate is close enough unless the standard deviation is very small compared to the values
+            accept_all &= (z_score_max < setting_z_score_threshold * (1 - 1e-6)) & (std > 1e-3 * largest)
+    keep_mask = np.ones(batch.row_count(), dtype=bool)
+    for i in np.flatnonzero(multiple & ~accept_all).tolist():
+        (start, stop) = (starts[i], starts[i] + counts[i])
+        z_score_list = stats.zscore(values[start:stop], nan_policy="omit")
+        keep_mask[start:stop] = np.abs(z_score_list) < setting_z_score_threshold
+    if not keep_mask.all():
+        batch.take_rows(keep_mask)
+
+
+def batch_stage_forward_fill(batch: BatchObject) -> None:
+    counts = batch.counts()
+    row_file = batch.row_file()
+    row_start = np.repeat(batch.starts(), counts)
+    for (column_name, columnObject) in batch.column_map.items():
+        none_mask = columnObject.none_mask()
+        latest_index = np.where(none_mask, -1, np.arange(len(none_mask)))
+        np.maximum.accumulate(latest_index, out=latest_index)
+        # the values are only copied from the same file
+        latest_index[latest_index < row_start] = -1
+        copy_mask = none_mask & (latest_index >= 0)
+        copy_from = latest_index[copy_mask]
+        columnObject.values[copy_mask] = columnObject.values[copy_from]
+        columnObject.missing[copy_mask] = columnObject.missing[copy_from]
+        columnObject.quality[copy_mask] = columnObject.quality[copy_from]
+        columnObject.has_quality[copy_mask] = columnObject.has_quality[copy_from]
+        columnObject.valid[copy_mask] = columnObject.valid[copy_from]
+        columnObject.copied[copy_mask] = True
+        columnObject.is_repeated[copy_mask] = True
+        columnObject.valid[none_mask & (latest_index < 0)] = False
+        copied_count = np.bincount(row_file[columnObject.copied], minlength=batch.file_count())
+        batch.repeating_map[column_name] |= batch.present_map[column_name] & (counts > 1) & (counts - 1 == copied_count)
+
+
+# the repeat coefficients are recalculated first, they are the ones saved in the output
+def batch_stage_select_invariant_measurement(batch: BatchObject) -> None:
+    batch_repeat_coefficient_recalculate(batch)
+    counts = batch.counts()
+    invariant = counts > 1
+    for column_name in ["DateTime", "Lon", "Lat"]:
+        invariant &= batch.present_map[column_name] & (batch.repeat_count_map[column_name] == counts - 1)
+    if not invariant.any():
+        return
+    for i in np.flatnonzero(invariant).tolist():
+        _logger.info("'{:}' contains locationally and temporally invariant measurements. Selecting only one measurement.".format(batch.dataObject_list[i].file_name))
+        batch.dataObject_list[i].was_made_single = True
+    row_file = batch.row_file()
+    starts = batch.starts()
+    selected_row = np.full(batch.file_count(), -1, dtype=np.int64)
+    remaining = invariant.copy()
+    # selecting based on the lowest SampleDepth value, then FloorDepth and BotDepth, in the files where the column has any values
+    for column_name in ["SampleDepth", "FloorDepth", "BotDepth"]:
+        if column_name not in batch.column_map:
+            continue
+        columnObject = batch.column_map[column_name]
+        has_values = batch.present_map[column_name] & (np.bincount(row_file[~columnObject.none_mask()], minlength=batch.file_count()) > 0)
+        chosen = remaining & has_values
+        if not chosen.any():
+            continue
+        selected_row[chosen] = batch_min_value_index(batch, columnObject)[chosen]
+        remaining &= ~chosen
+    # there were no columns with changing values found, select the median chl value and the first line from other columns
+    column_chl = batch.column_map["Chl"]
+    for i in np.flatnonzero(remaining).tolist():
+        (start, stop) = (starts[i], starts[i] + counts[i])
+        chl_median = median(column_chl.values[start:stop][~column_chl.none_mask()[start:stop]].tolist())
+        column_chl.set_value(start, chl_median)
+        selected_row[i] = start
+    keep_mask = ~invariant[row_file]
+    keep_mask[selected_row[invariant]] = True
+    batch.take_rows(keep_mask)
+
+
+# the repeat coefficient is never higher than 1 (the tables, where the marked repeating values would be visible, are not printed in a batch)
+def batch_stage_remove_repeated_chl(batch: BatchObject) -> None:
+    if setting_filter_repeat_coefficient_threshold > 1:
+        return
+    batch_repeat_values_recalculate(batch, ["Chl"])
+    remove_file = np.array([coefficient is not None and coefficient >= setting_filter_repeat_coefficient_threshold for coefficient in batch.repeat_coefficient_map["Chl"]], dtype=bool)
+    remove_file &= batch.counts() > 0
+    keep_mask = ~(remove_file[batch.row_file()] & batch.column_map["Chl"].is_repeated)
+    if not keep_mask.all():
+        batch.take_rows(keep_mask)
+    # the repeating values of all columns of the files whose measurements were filtered are marked again (the stage refreshes them)
+    batch_repeat_values_recalculate(batch, list(batch.column_map.keys()), remove_file)
+
+
+# the batch processing stages, in order (the columns are removed and moved to the metadata for each file before the batch is made)
+# the log message of a stage is formatted with the number of measurements and files that have any measurements left
+_batch_processing_stage_list = [
+    ProcessingStage("invalidate_chl_non_positive", batch_stage_invalidate_chl_non_positive,
+        "{row_count:} measurements in {file_count:} files: Done marking values with negative or zero Chl values as invalid."),
+    ProcessingStage("invalidate_chl_quality", batch_stage_invalidate_chl_quality,
+        "{row_count:} measurements in {file_count:} files: Done excluding values that have their quality specified and the quality is not acceptable."),
+    ProcessingStage("remove_invalid_chl", batch_stage_remove_invalid_chl,
+        "{row_count:} measurements in {file_count:} files: Done removing all measurements with invalid Chl data."),
+    ProcessingStage("remove_outliers", batch_stage_remove_outliers,
+        "{row_count:} measurements in {file_count:} files: Done removing outlier values."),
+    ProcessingStage("forward_fill", batch_stage_forward_fill,
+        "{row_count:} measurements in {file_count:} files: Done repeating missing measurements."),
+    ProcessingStage("select_invariant_measurement", batch_stage_select_invariant_measurement,
+        "{row_count:} measurements in {file_count:} files: Done filtering out repeating values."),
+    ProcessingStage("remove_repeated_chl", batch_stage_remove_repeated_chl,
+        "{row_count:} measurements in {file_count:} files: Done removing measurements with sequential repeating chl values that have a repeat coefficient of at least {repeat_coefficient_threshold:}.")
+]
+
+
+# process and improve the data of all files at once
+# gives the same result as process_and_improve_data for each file, the files that can't be processed in a batch (or all files, if the tables are printed) are processed one at a time
+# returns the dataObjects in the same order, the invalid ones are marked as such
+def process_and_improve_data_batch(dataObject_list: ty.List[DataObject]) -> ty.List[DataObject]:
+    if setting_logger_print_table_after_each_step or setting_logger_print_table_at_start or setting_logger_print_table_at_end:
+        _logger.info("The tables of the files are printed, so the files are processed one at a time.")
+        return [process_and_improve_data(dataObject, seq) for (seq, dataObject) in enumerate(dataObject_list, start = 1)]
+
+    _logger.info("Started processing {:} files in a batch.".format(len(dataObject_list)))
+    time_start = time.perf_counter()
+    batch_list = []
+    for (seq, dataObject) in enumerate(dataObject_list, start = 1):
+        process_stage_remove_duplicate_columns(dataObject)
+        process_stage_move_metadata(dataObject)
+        if not dataObject.check_if_valid():
+            dataObject.valid = False
+            _logger.warning("File #{:} ('{:}') has been detected as invalid and will not be included in the result.".format(seq, dataObject.file_name))
+        elif dataObject_is_batchable(dataObject):
+            batch_list.append(dataObject)
+        else:
+            _logger.info("File #{:} ('{:}') can't be processed in a batch, it is processed on its own.".format(seq, dataObject.file_name))
+            process_and_improve_data(dataObject, seq)
+    if len(batch_list) == 0:
+        return dataObject_list
+    batch = get_batch(batch_list)
+    batch_repeat_values_recalculate(batch, list(batch.column_map.keys()))
+    batch_repeat_coefficient_recalculate(batch)
+    if _instrumentation is not None:
+        _instrumentation.add("prepare", time.perf_counter() - time_start, batch.row_count(), batch.row_count())
+    _logger.info("{:} measurements in {:} files.".format(batch.row_count(), batch.file_count()))
+
+    for stage in _batch_processing_stage_list:
+        time_start = time.perf_counter()
+        (rows_in, nonempty_in) = (batch.row_count(), batch.counts() > 0)
+        stage.function(batch)
+        nonempty = batch.counts() > 0
+        if _instrumentation is not None:
+            _instrumentation.add(stage.name, time.perf_counter() - time_start, rows_in, batch.row_count(), int(np.count_nonzero(nonempty_in & ~nonempty)))
+        _logger.info(stage.message.format(row_count=batch.row_count(), file_count=int(np.count_nonzero(nonempty)), repeat_coefficient_threshold=setting_filter_repeat_coefficient_threshold))
+
+    split_batch(batch)
+    for dataObject in batch_list:
+        if not dataObject.valid:
+            _logger.warning("'{:}' has been detected as invalid and will not be included in the result.".format(dataObject.file_name))
+    return dataObject_list
+
+
+
+
+
+# gets the values of a numerical column as floats (NaN where missing), all NaN if the dataObject doesn't have the column
+def get_column_float_values(dataObject: DataObject, column_name: str) -> np.ndarray:
+    columnObject = try_get_column(dataObject, column_name)
+    if columnObject is None or not columnObject.is_numeric():
+        return np.full(dataObject.row_count(), float("NaN"))
+    return np.where(columnObject.missing, float("NaN"), columnObject.values.astype(np.float64))
+
+
+# fills the sea floor depths of the measurements of all dataObjects from the bathymetry data (sampled at once)
+# the dataObjects without a sea floor depth column get one
+# returns the number of filled values
+def fill_floor_depth(dataObject_list: ty.List[DataObject], replace: bool = setting_bathymetry_replace_floor_depth) -> int:
+    if len(dataObject_list) == 0:
+        return 0
+    lon = np.concatenate([get_column_float_values(dataObject, "Lon") for dataObject in dataObject_list])
+    lat = np.concatenate([get_column_float_values(dataObject, "Lat") for dataObject in dataObject_list])
+    depth = -_bathymetry.sample_height(lon, lat)
+    filled_count = 0
+    start = 0
+    for dataObject in dataObject_list:
+        count = dataObject.row_count()
+        values = depth[start:start + count]
+        start += count
+        columnObject = try_get_column(dataObject, "FloorDepth")
+        if columnObject is None:
+            columnObject = ColumnObject()
+            columnObject.name = "FloorDepth"
+            columnObject.original_name = "BATHYMETRY"
+            columnObject.set_values(np.full(count, float("NaN")), np.ones(count, dtype=bool))
+            dataObject.column_list.append(columnObject)
+        mask = ~np.isnan(values)
+        if not replace:
+            mask &= columnObject.none_mask()
+        columnObject.values[mask] = values[mask]
+        columnObject.missing[mask] = False
+        filled_count += int(np.count_nonzero(mask))
+    return filled_count
+
+
+# converts the datetime texts of the output to NumPy datetimes, the texts that are not datetimes (empty or invalid ones) are NaT
+def parse_output_datetime_values(text_list: ty.List[str]) -> np.ndarray:
+    value_map = {}
+    for text in set(text_list):
+        try:
+            value_map[text] = np.datetime64(text, "s") if text != "" else np.datetime64("NaT", "s")
+        except ValueError:
+            value_map[text] = np.datetime64("NaT", "s")
+    return np.array([value_map[text] for text in text_list], dtype="datetime64[s]")
+
+
+# reads the key columns (see _day_index_key_column_list) of each line of the output, along with the position and the length of the line in the file
+def read_day_index_keys(filename: str) -> ty.Tuple[ty.List[tuple], np.ndarray, np.ndarray]:
+    # the key columns come before the text columns that could contain a comma, so only the columns up to the last of them are split
+    column_index_list = [_column_names_out_list.index(column_name) for column_name in _day_index_key_column_list]
+    split_count = max(column_index_list) + 1
+    key_list = []
+    length_list = []
+    with open(filename, "rb") as f:
+        header_length = len(f.readline())
+        for line in f:
+            value_list = line.decode("UTF-8").split(",", split_count)
+            key_list.append(tuple([value_list[i] for i in column_index_list]))
+            length_list.append(len(line))
+    length_array = np.array(length_list, dtype=np.int64)
+    offset_array = header_length + np.cumsum(length_array) - length_array
+    return (key_list, offset_array, length_array)
+
+
+# saves the lines of the output sorted by their capture datetime, without the repeated measurements and the measurements without a datetime
+# the lines are read back from the finished output file (only their key columns are kept in memory), so the memory used doesn't grow with the whole output
+# the table of the days (<filename>_index.csv) has a row for each day from the first to the last one (the number of days since 2000-01-01, its date, the row of its first measurement and its number of measurements)
+# the rows are counted from 0 (the first line after the header), so the measurements of days D1 to D2 are the rows from the offset of D1 to the offset of D2 plus its count
+def save_day_index(filename_in: str, filename: str) -> None:
+    (key_list, offset_array, length_array) = read_day_index_keys(filename_in)
+    # only the first of the repeated measurements is kept
+    first_map = {}
+    for (index, key) in enumerate(key_list):
+        first_map.setdefault(key, index)
+    index_array = np.array(sorted(first_map.values()), dtype=np.int64)
+    date_time = parse_output_datetime_values([key_list[index][0] for index in index_array])
+    del key_list
+    index_array = index_array[~np.isnat(date_time)]
+    date_time = date_time[~np.isnat(date_time)]
+    order = np.argsort(date_time, kind="stable")
+    index_array = index_array[order]
+    second = (date_time[order] - _day_index_origin).astype(np.int64)
+    day = np.floor_divide(second, 86400)
+
+    # the header and the lines are copied from the output file, the lines in the sorted order
+    with open(filename_in, "rb") as f_in, open(filename, "wb", buffering=1 << 20) as f:
+        f.write(f_in.readline())
+        for (offset, length) in zip(offset_array[index_array].tolist(), length_array[index_array].tolist()):
+            f_in.seek(offset)
+            f.write(f_in.read(length))
+
+    day_range = np.arange(day[0], day[-1] + 1) if len(day) > 0 else np.zeros(0, dtype=np.int64)
+    offset_start = np.searchsorted(day, day_range, side="left")
+    offset_stop = np.searchsorted(day, day_range, side="right")
+    date = (_day_index_origin + day_range * np.timedelta64(1, "D")).astype("datetime64[D]")
+    with open(os.path.splitext(filename)[0] + "_index.csv", "w", encoding="UTF-8") as f:
+        f.write("day,date,row_offset,row_count\n")
+        f.write("".join(["{:},{:},{:},{:}\n".format(d, str(dt), start, stop - start) for (d, dt, start, stop) in zip(day_range.tolist(), date, offset_start.tolist(), offset_stop.tolist())]))
+    _logger.info("Saved {:} measurements sorted by their capture day ({:} repeated measurements and {:} without a datetime were left out).".format(
+        len(index_array), len(offset_array) - len(first_map), len(first_map) - len(index_array)))
 
 
 # save the parsed data
-def save_data(dataObjects: list, filename: str) -> None:
+# if the binary filename is given, the data is also saved in a binary (NumPy .npz) format
+# if the day index filename is given, the data is also saved sorted by the capture day (see save_day_index)
+def save_data(dataObjects: list, filename: str, filename_binary: str | NoneType = None, filename_day_index: str | NoneType = None) -> None:
+    writer = OutputWriter(filename, filename_binary, filename_day_index)
+    for dataObject in dataObjects:
+        writer.write(dataObject)
+    writer.close()
+
 
-    nl = "\n"
-    c = ","
 
-    f = open(filename, "w", encoding="UTF-8")
 
-    # write the header
-    f.write(",".join(_column_names_out_list) + nl)
+# initialization of a worker process
+# the log records are collected and passed on to the main process instead of being written to the log file
+def worker_init(instrumentation: bool = False) -> None:
+    global _datetime_regex
+    global _worker_log_handler
+    global _instrumentation
+    global _archive_map
 
-    counter = 0
+    # the archives are opened again in each worker, as the open files can't be shared between processes
+    _archive_map = {}
 
-    # iterate through each dataObject and write its contents to the file
-    for id, dataObject in enumerate(dataObjects, start=1):
-        total = len(dataObject.column_list[0].values)
-        for i in range(total):
-            counter += 1
-            text_list = []
-            text_list.append(str(id)) # file_id - same for each measurement inside an individual file
-            text_list.append(str(i + 1)) # seq_in - different for each measurement in a file
-            text_list.append(str(total)) # total_in - number of measurements inside each file
-            text_list.append(str(counter)) # seq_all - counts each line in the output file
-            text_list.append(try_get_column_value(dataObject, "DateTime", i)) # date_time - date and time of the measurement
-            column_datetime = try_get_column(dataObject, "DateTime") # exact_datetime - is the datetime exact
-            if column_datetime is None:
-                text_list.append("")
-            else:
-                text_list.append("N" if column_datetime.repeating else "Y")
-            text_list.append(try_get_column_value(dataObject, "Lon", i)) # lon - longitude
-            text_list.append(try_get_column_value(dataObject, "Lat", i)) # lat - latitude
-            text_list.append(try_get_column_value(dataObject, "Chl", i)) # chl - chlorophyll-a concentration
-            column_chl = try_get_column(dataObject, "Chl") # chl_repeat_coef - chlorophyll-a repeat coefficient
-            if column_chl is None:
-                text_list.append("")
-            else:
-                text_list.append(str(column_chl.repeat_coefficient))
-            text_list.append(try_get_column_value(dataObject, "BotDepth", i)) # bot_depth
-            text_list.append(try_get_column_value(dataObject, "FloorDepth", i)) # floor_depth - the depth of the ocean floor
-            text_list.append(try_get_column_value(dataObject, "SampleDepth", i)) # sample_depth - the depth below the water surface at which the sample was taken
-            text_list.append(str(dataObject.settings["QUALITY"]) if dataObject.settings["QUALITY"] is not None else "")
-            text_list.append(str(dataObject.settings["FILEMARK"]) if dataObject.settings["FILEMARK"] is not None else "")
+    _datetime_regex = re.compile(_datetime_regex_string)
 
-            f.write(",".join(text_list) + nl)
+    if instrumentation:
+        _instrumentation = Instrumentation()
 
-    f.close()
+    _worker_log_handler = LogRecordListHandler()
+    _logger.handlers = [_worker_log_handler]
+    _logger.setLevel(setting_logger_level)
+    _logger.propagate = False
+
+
+# runs a single task in a worker process
+# returns the result of the task, the log records that were made while running it and its instrumentation measurements (None if disabled)
+def run_worker_task(function_and_task: tuple) -> tuple:
+    (function, task) = function_and_task
+    result = function(task)
+    return (result, _worker_log_handler.pop_records(), _instrumentation.pop() if _instrumentation is not None else None)
+
+
+# applies the function to each task and yields the results one by one, in the same order as the tasks
+# if a process pool is given, the tasks are run in parallel and the log records from the workers are written in the order of the tasks
+def imap_tasks(function: FunctionType, task_list: list, pool = None, worker_count: int = 1, chunksize: int | NoneType = None) -> ty.Iterator:
+    if pool is None:
+        for task in task_list:
+            yield function(task)
+        return
+    if chunksize is None:
+        chunksize = max(1, len(task_list) // (worker_count * 8))
+    for (result, record_list, instrumentation) in pool.imap(run_worker_task, [(function, task) for task in task_list], chunksize):
+        for record in record_list:
+            _logger.handle(record)
+        if instrumentation is not None:
+            _instrumentation.merge(instrumentation)
+        yield result
+
+
+# applies the function to each task and returns the results in the same order as the tasks
+def map_tasks(function: FunctionType, task_list: list, pool = None, worker_count: int = 1) -> list:
+    return list(imap_tasks(function, task_list, pool, worker_count))
+
+
+# reads a single .odv file (task: file number, file count, file path, file settings)
+# returns None if the file doesn't have all required columns
+def read_odv_file_task(task: tuple) -> DataObject | NoneType:
+    (i, count, file_full_path, file_dict) = task
+    _logger.info("Reading and processing data from {:}/{:} file: '{:}'".format(i, count, file_full_path))
+    timer = stage_timer_start()
+    if setting_serialize_and_deserialize_parsed_data:
+        file_key = get_serialized_data_key(file_full_path)
+        # the serialized data of a file from which only the first row was read can't be used for the whole file (and vice versa)
+        file_key["ROW_LIMIT"] = get_row_limit(file_dict)
+        filedata = serialized_data_load(file_full_path, file_key)
+        if filedata is not None:
+            filedata.settings = file_dict
+            stage_timer_stop("load_serialized", timer, filedata, False)
+            _logger.info("File loaded from serialized data.")
+            return filedata
+        filedata = read_and_process_odv_file(file_full_path, file_dict)
+        if filedata is not None:
+            serialized_data_save(file_full_path, file_key, filedata)
+    else:
+        filedata = read_and_process_odv_file(file_full_path, file_dict)
+    if filedata is None:
+        if timer is not None:
+            _instrumentation.add("read", time.perf_counter() - timer[0], 0, 0, 1, os.path.basename(file_full_path))
+        _logger.warning("File does not contain all required columns and will not be included in the result.")
+        return None
+    stage_timer_stop("read", timer, filedata, False)
+    _logger.info("File parsed.")
+    return filedata
+
+
+# processes the data of a single file (task: sequence number, DataObject)
+def process_data_task(task: tuple) -> DataObject:
+    (seq, dataObject) = task
+    return process_and_improve_data(dataObject, seq)
+
+
+# reads, filters and processes a single file (task: file number, file count, file path, file settings), used in the streaming mode
+# returns the processed DataObject (None if it was excluded) and the name of the step that excluded it (None if it was not)
+def read_and_process_file_task(task: tuple) -> ty.Tuple[DataObject | NoneType, str | NoneType]:
+    dataObject = read_odv_file_task(task)
+    if dataObject is None:
+        return (None, "columns")
+    if not dataObject_is_useful(dataObject):
+        return (None, "useless")
+    if dataObject_select_first(dataObject):
+        _logger.info("Made the file only use its first measurement.")
+    dataObject = process_and_improve_data(dataObject, task[0])
+    if not dataObject.valid:
+        return (None, "invalid")
+    return (dataObject, None)
+
+
+# reads, filters, processes and saves the files one at a time (the streaming mode)
+# the data of a file is written to the output as soon as it is processed, in the same order and with the same numbering as when all files are processed at once
+def stream_files(file_object_to_be_parsed_list: list, filename_out: str, filename_binary: str | NoneType = None, filename_day_index: str | NoneType = None, pool = None, worker_count: int = 1) -> None:
+    task_list = [(i, len(file_object_to_be_parsed_list), file_full_path, file_dict) for i, (file_full_path, file_dict) in enumerate(file_object_to_be_parsed_list, start = 1)]
+    excluded_count_map = {"columns": 0, "useless": 0, "invalid": 0}
+    writer = OutputWriter(filename_out, filename_binary, filename_day_index)
+    # small chunks, so that the workers don't get too far ahead of the writing
+    for (dataObject, excluded) in imap_tasks(read_and_process_file_task, task_list, pool, worker_count, chunksize = 1):
+        if dataObject is None:
+            excluded_count_map[excluded] += 1
+            continue
+        if _bathymetry is not None:
+            timer = stage_timer_start(dataObject)
+            fill_floor_depth([dataObject])
+            stage_timer_stop("bathymetry", timer, dataObject, False)
+        timer = stage_timer_start(dataObject)
+        writer.write(dataObject)
+        stage_timer_stop("save", timer, dataObject, False)
+    writer.close()
+    amount_written = len(task_list) - sum(excluded_count_map.values())
+    _logger.info("{:} files were excluded because they did not contain all required columns, {:} did not contain any useful data and {:} were detected as invalid. {:} files were saved."
+        .format(excluded_count_map["columns"], excluded_count_map["useless"], excluded_count_map["invalid"], amount_written))
 
 
 
 
 # main function
 def main() -> None:
+    global _instrumentation
+    global _read_ahead
+    global _bathymetry
 
     # initialization
     main_init()
     
-    # check if there are any input arguments
-    sys.argv.append(_input_filename)
-    sys.argv.append(_input_filename_out)
-
-    if len(sys.argv) < 3:
-        _logger.critical("No input arguments entered!")
-        exit(1)
-
     # read the input arguments
-    filename_with_input_files = sys.argv[1]
-    filename_out = sys.argv[2]
+    argument_parser = argparse.ArgumentParser(description="Parses ODV files with in-situ chlorophyll data.")
+    argument_parser.add_argument("filename_in", nargs="?", default=_input_filename, help="file containing the list of files to be parsed")
+    argument_parser.add_argument("filename_out", nargs="?", default=_input_filename_out, help="output file")
+    argument_parser.add_argument("--workers", type=int, default=setting_worker_count, help="number of worker processes")
+    argument_parser.add_argument("--instrumentation", action="store_true", default=setting_instrumentation, help="save a report of the time spent in each stage")
+    argument_parser.add_argument("--streaming", action="store_true", default=setting_streaming, help="process and save the files one at a time, using less memory")
+    argument_parser.add_argument("--batch", action="store_true", default=setting_batch_processing, help="process all files at once, faster for many small files")
+    argument_parser.add_argument("--day-index", action="store_true", default=setting_save_day_index, help="also save the measurements sorted by their capture day, with the row at which each day starts")
+    argument_parser.add_argument("--bathymetry", action="store_true", default=setting_bathymetry_fill_floor_depth, help="fill the missing sea floor depths from the bathymetry data")
+    argument_parser.add_argument("--read-ahead", type=int, default=setting_read_ahead_file_count, help="number of files read ahead in background threads (0 to disable)")
+    arguments = argument_parser.parse_args()
+
+    filename_with_input_files = arguments.filename_in
+    filename_out = arguments.filename_out
+
+    if arguments.instrumentation:
+        _instrumentation = Instrumentation()
+
+    # get the number of worker processes
+    worker_count = max(1, arguments.workers)
+    pool = None
+    if worker_count > 1:
+        pool = multiprocessing.Pool(processes=worker_count, initializer=worker_init, initargs=(arguments.instrumentation,))
+        _logger.info("Using {:} worker processes.".format(worker_count))
 
     # get the list of all files to be parsed
     file_object_to_be_parsed_list = get_filenames_to_be_parsed(filename_with_input_files)
     _logger.info("Found {:} files containing data.".format(len(file_object_to_be_parsed_list)))
-
-    # check if a serialized version od parsed file data already exists
-    # if it exists, use that, otherwise generate (and save) a new one
-    data_list = []
-    if setting_serialize_and_deserialize_parsed_data and os.path.exists(_data_raw_serialized_filename):
-        data_list = deserialize(_data_raw_serialized_filename)
-        amount1 = len(data_list)
-    else:
-        # get the processed contents of the odv file
-        for i, (file_full_path, file_dict) in enumerate(file_object_to_be_parsed_list, start = 1):
-            _logger.info("Reading and processing data from {:}/{:} file: '{:}'".format(i, len(file_object_to_be_parsed_list), file_full_path))
-            filedata = read_and_process_odv_file(file_full_path, file_dict)
-            _logger.info("File parsed.")
-            data_list.append(filedata)
-        amount1 = len(data_list)
-        _logger.info("Completed first stage of data processing for {:} files.".format(amount1))
-        # remove files with low quality
-        data_list = [d for d in data_list if "QUALITY" in d.settings and type(d.settings["QUALITY"]) in (int, float) and d.settings["QUALITY"] >= setting_quality_min_threshold]
-        amount2 = len(data_list)
-        _logger.info("{:} files were excluded because their quality was below specified, {:} files remain.".format(amount1 - amount2, amount2))
+    # the serialized data of the files that are excluded because of their quality is kept
+    file_path_list = [file_full_path for (file_full_path, _) in file_object_to_be_parsed_list]
+
+    # remove files with low quality, before they are read
+    timer = stage_timer_start()
+    amount0 = len(file_object_to_be_parsed_list)
+    file_object_to_be_parsed_list = [(file_full_path, file_dict) for (file_full_path, file_dict) in file_object_to_be_parsed_list if file_quality_is_sufficient(file_dict)]
+    amount1 = len(file_object_to_be_parsed_list)
+    if timer is not None:
+        _instrumentation.add("filter_quality", time.perf_counter() - timer[0], 0, 0, amount0 - amount1)
+    _logger.info("{:} files were excluded because their quality was below specified, {:} files remain.".format(amount0 - amount1, amount1))
+
+    filename_binary = os.path.splitext(filename_out)[0] + ".npz" if setting_save_binary_output else None
+    filename_day_index = os.path.splitext(filename_out)[0] + "_by_day.csv" if arguments.day_index else None
+
+    # load the bathymetry data (the bathymetry files are converted into binary files the first time)
+    # the module is only imported when it is used, since it uses the spatial index of the joining scripts
+    if arguments.bathymetry:
+        import bathymetry
+        _bathymetry = bathymetry.load_bathymetry()
+
+    # read the files ahead while the current one is parsed (the members of archives are read from the archive instead)
+    # the reading threads are always stopped, even if reading the files fails, as the ones waiting for memory would otherwise keep the script from exiting
+    try:
+        if pool is None and arguments.read_ahead > 0 and not setting_serialize_and_deserialize_parsed_data:
+            _read_ahead = FileReadAhead([file_full_path for (file_full_path, _) in file_object_to_be_parsed_list if split_archive_path(file_full_path) is None],
+                arguments.read_ahead, setting_read_ahead_max_bytes, setting_read_ahead_thread_count)
+
+        if arguments.streaming:
+            if arguments.batch:
+                _logger.warning("The files are not processed in a batch in the streaming mode.")
+            # read, filter, process and save each file on its own
+            stream_files(file_object_to_be_parsed_list, filename_out, filename_binary, filename_day_index, pool, worker_count)
+        else:
+            # get the processed contents of the odv file
+            # if serialized data of an unchanged file already exists, use that, otherwise parse the file (and save the serialized data)
+            task_list = [(i, len(file_object_to_be_parsed_list), file_full_path, file_dict) for i, (file_full_path, file_dict) in enumerate(file_object_to_be_parsed_list, start = 1)]
+            data_list = map_tasks(read_odv_file_task, task_list, pool, worker_count)
+    finally:
+        if _read_ahead is not None:
+            _read_ahead.close()
+
+    if arguments.streaming:
         if setting_serialize_and_deserialize_parsed_data:
-            serialize(data_list, _data_raw_serialized_filename)
+            amount_evicted = serialized_data_evict(file_path_list)
+            _logger.info("Removed serialized data of {:} files that are no longer listed.".format(amount_evicted))
+        if pool is not None:
+            pool.close()
+            pool.join()
+        if _instrumentation is not None:
+            save_instrumentation_report(_instrumentation, os.path.splitext(filename_out)[0] + "_instrumentation")
+        main_finish()
+        return
+
+    _logger.info("Completed first stage of data processing for {:} files.".format(amount1))
+    if setting_serialize_and_deserialize_parsed_data:
+        amount_evicted = serialized_data_evict(file_path_list)
+        _logger.info("Removed serialized data of {:} files that are no longer listed.".format(amount_evicted))
+    # remove files that don't have all required columns (their values were not read)
+    data_list = [d for d in data_list if d is not None]
+    amount2 = len(data_list)
+    _logger.info("{:} files were excluded because they did not contain all required columns, {:} files remain.".format(amount1 - amount2, amount2))
 
     # filter out useless data (has to have at lease one valid measurement of datetime, lon, lat, and chl each)
+    timer = stage_timer_start()
+    rows_in = sum([d.row_count() for d in data_list]) if timer is not None else 0
     data_list = [d for d in data_list if dataObject_is_useful(d)]
     amount3 = len(data_list)
-    _logger.info("Filtered out {:}/{:} processed files because they did not contain any useful data. {:} files remain.".format(amount1 - amount3, amount1, amount3))
+    if timer is not None:
+        _instrumentation.add("filter_useful", time.perf_counter() - timer[0], rows_in, sum([d.row_count() for d in data_list]), amount2 - amount3)
+    _logger.info("Filtered out {:}/{:} processed files because they did not contain any useful data. {:} files remain.".format(amount2 - amount3, amount2, amount3))
 
     # if the option for selecting only the first line is active, select only the first line
     amount4 = 0
     for dataObject in data_list:
-        if dataObject.settings["SELECT"] == "FIRST" and len(dataObject.column_list[0].values) > 0:
+        if dataObject_select_first(dataObject):
             amount4 += 1
-            for columnObject in dataObject.column_list:
-                columnObject.values = [columnObject.values[0]]
-            dataObject.was_made_single = True
     if amount4 > 0:
         _logger.info("Made {:} files only use their first measurement.".format(amount4))
 
     # process the data into a more useful form
-    data_list = [process_and_improve_data(d, i) for i, d in enumerate(data_list, start = 1)]
+    # in a batch, all files are processed at once in the main process
+    if arguments.batch:
+        data_list = process_and_improve_data_batch(data_list)
+    else:
+        data_list = map_tasks(process_data_task, list(enumerate(data_list, start = 1)), pool, worker_count)
     data_list = [x for x in data_list if x.valid]
 
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+    # fill the sea floor depths from the bathymetry data
+    if _bathymetry is not None:
+        timer = stage_timer_start()
+        filled_count = fill_floor_depth(data_list)
+        if timer is not None:
+            row_count = sum([dataObject.row_count() for dataObject in data_list])
+            _instrumentation.add("bathymetry", time.perf_counter() - timer[0], row_count, row_count)
+        _logger.info("Filled {:} sea floor depths from the bathymetry data.".format(filled_count))
+
     # save the parsed data to a file
-    save_data(data_list, filename_out)
+    timer = stage_timer_start()
+    save_data(data_list, filename_out, filename_binary, filename_day_index)
+    if timer is not None:
+        row_count = sum([dataObject.row_count() for dataObject in data_list])
+        _instrumentation.add("save", time.perf_counter() - timer[0], row_count, row_count)
+
+    # save the instrumentation report
+    if _instrumentation is not None:
+        save_instrumentation_report(_instrumentation, os.path.splitext(filename_out)[0] + "_instrumentation")
 
     # finalization
     main_finish()
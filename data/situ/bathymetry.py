@@ -0,0 +1,180 @@
+# bathymetry data
+# reads the bathymetry grids (tab separated text files with the heights, latitudes and longitudes of the grid points),
+# converts them once into binary files that are memory-mapped on the next uses, and samples the height of the sea floor at many points at once
+
+
+
+import os
+import sys
+import json
+import logging
+import argparse
+import typing as ty
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "joining"))
+import spatial_index
+
+
+
+# USER VARIABLES
+
+# paths to each of the bathymetry files
+setting_filepath_bathymetry_depth = "../bathymetry/bathy_h.ascii"
+setting_filepath_bathymetry_lat = "../bathymetry/bathy_lat.ascii"
+setting_filepath_bathymetry_lon = "../bathymetry/bathy_lon.ascii"
+
+
+
+# PROGRAM VARIABLES
+
+_logger = logging.getLogger("main")
+
+
+
+# PROGRAM CONSTANTS
+
+# the directory of the binary files (next to the bathymetry files)
+_cache_directory = "bathymetry_cache"
+
+# increase when the conversion of the bathymetry files changes, so that the previously converted files are not used anymore
+_cache_version = 1
+
+# the texts that are missing values in the bathymetry files
+_missing_value_list = ["", "NA", "NaN"]
+
+# the sampling method of the bathymetry grid (the same as in the joining notebook)
+_sampling_method = "BILIN_ADVANCED"
+
+
+
+# OBJECT DEFINITIONS
+
+
+class BathymetryGrid(object):
+    def __init__(self, height: np.ndarray, lat: np.ndarray, lon: np.ndarray):
+        self.height = height # the height of the sea floor (lat, lon), negative below sea level, usually memory-mapped
+        self.lat = lat # the latitude axis of the grid
+        self.lon = lon # the longitude axis of the grid
+    def sample_height(self, lon: np.ndarray, lat: np.ndarray) -> np.ndarray: # samples the height at all points at once, NaN for the points outside of the grid (or without a value)
+        lon = np.asarray(lon, dtype=np.float64)
+        lat = np.asarray(lat, dtype=np.float64)
+        result = np.full(len(lon), np.nan)
+        has_position = ~np.isnan(lon) & ~np.isnan(lat)
+        if not np.any(has_position):
+            return result
+        # the points at the same position are sampled only once
+        station_index = spatial_index.StationIndex(lon[has_position], lat[has_position])
+        location = station_index.get_grid_location(self.lon, self.lat)
+        station = np.flatnonzero(~location.is_outside)
+        values = np.full(len(station_index), np.nan)
+        if len(station) > 0:
+            # only the part of the grid around the points is read
+            window = location.get_sample_window(station)
+            grid = np.asarray(self.height[window[0]:window[1], window[2]:window[3]], dtype=np.float64)
+            values[station] = spatial_index.sample_grid(grid, location.index_lon[station], location.index_lat[station], _sampling_method, (window[0], window[2]))
+        result[has_position] = values[station_index.point_station]
+        return result
+
+
+
+# FUNCTION DEFINITIONS
+
+
+# reads a bathymetry file (like 'read_bathymetry_file' in the joining notebook)
+# returns the values as a 2D array, with a row for each line of the file, missing values are NaN
+def read_bathymetry_file(filepath: str) -> np.ndarray:
+    with open(filepath, "r", encoding="UTF-8") as f:
+        row_list = [line.rstrip("\r\n").split("\t") for line in f]
+    if len(row_list) == 0:
+        return np.zeros((0, 0))
+    # like in the notebook, the number of values in a row is taken from the first line
+    width = len(row_list[0])
+    row_list = [(row + [""] * width)[:width] for row in row_list]
+    values = np.array(row_list, dtype=str)
+    values = np.where(np.isin(values, _missing_value_list), "nan", values)
+    return values.astype(np.float64)
+
+
+# gets the size and the modification time of a file, a changed file has a different size or modification time
+def get_file_stat(filepath: str) -> ty.List[int]:
+    stat = os.stat(filepath)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+# gets the directory of the binary files of the bathymetry files
+def get_cache_directory(filepath_depth: str) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(filepath_depth)), _cache_directory)
+
+
+# converts the bathymetry files into binary files (the heights as a lat x lon grid, and the latitude and longitude axes)
+def save_cache(filepath_depth: str, filepath_lat: str, filepath_lon: str, key: dict) -> None:
+    # in the files, the rows are the longitudes and the columns are the latitudes
+    height = read_bathymetry_file(filepath_depth)
+    lat = read_bathymetry_file(filepath_lat)[0, :]
+    lon = read_bathymetry_file(filepath_lon)[:, 0]
+    directory = get_cache_directory(filepath_depth)
+    os.makedirs(directory, exist_ok=True)
+    np.save(os.path.join(directory, "height.npy"), np.ascontiguousarray(height.T))
+    np.save(os.path.join(directory, "lat.npy"), lat)
+    np.save(os.path.join(directory, "lon.npy"), lon)
+    # the key is saved last, so that incomplete binary files are never used
+    with open(os.path.join(directory, "key.json"), "w", encoding="UTF-8") as f:
+        json.dump(key, f)
+
+
+# loads the bathymetry grid from the binary files, which are first created (or recreated if the bathymetry files have changed since)
+def load_bathymetry(
+    filepath_depth: str = setting_filepath_bathymetry_depth,
+    filepath_lat: str = setting_filepath_bathymetry_lat,
+    filepath_lon: str = setting_filepath_bathymetry_lon
+) -> BathymetryGrid:
+    key = {
+        "version": _cache_version,
+        "depth": get_file_stat(filepath_depth),
+        "lat": get_file_stat(filepath_lat),
+        "lon": get_file_stat(filepath_lon)
+    }
+    directory = get_cache_directory(filepath_depth)
+    filepath_key = os.path.join(directory, "key.json")
+    key_saved = None
+    if os.path.isfile(filepath_key):
+        with open(filepath_key, "r", encoding="UTF-8") as f:
+            key_saved = json.load(f)
+    if key_saved != key:
+        _logger.info("Converting the bathymetry files into binary files in '{:}'.".format(directory))
+        save_cache(filepath_depth, filepath_lat, filepath_lon, key)
+    return BathymetryGrid(
+        np.load(os.path.join(directory, "height.npy"), mmap_mode="r"),
+        np.load(os.path.join(directory, "lat.npy")),
+        np.load(os.path.join(directory, "lon.npy"))
+    )
+
+
+
+
+# main function
+def main() -> None:
+
+    argument_parser = argparse.ArgumentParser(description="Converts the bathymetry files into binary files and samples the height of the sea floor.")
+    argument_parser.add_argument("--depth", default=setting_filepath_bathymetry_depth, help="the bathymetry file with the heights")
+    argument_parser.add_argument("--lat", default=setting_filepath_bathymetry_lat, help="the bathymetry file with the latitudes")
+    argument_parser.add_argument("--lon", default=setting_filepath_bathymetry_lon, help="the bathymetry file with the longitudes")
+    argument_parser.add_argument("--point", type=float, nargs=2, action="append", default=[], metavar=("LON", "LAT"), help="a point at which the height is sampled")
+    arguments = argument_parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    bathymetry = load_bathymetry(arguments.depth, arguments.lat, arguments.lon)
+    print("Bathymetry grid: {:} x {:} points, lon {:.4f} - {:.4f}, lat {:.4f} - {:.4f}".format(
+        len(bathymetry.lon), len(bathymetry.lat), np.nanmin(bathymetry.lon), np.nanmax(bathymetry.lon), np.nanmin(bathymetry.lat), np.nanmax(bathymetry.lat)))
+    if len(arguments.point) > 0:
+        point_array = np.array(arguments.point)
+        for ((lon, lat), height) in zip(arguments.point, bathymetry.sample_height(point_array[:, 0], point_array[:, 1])):
+            print("lon {:.4f}, lat {:.4f}: {:}".format(lon, lat, height))
+
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+# accuracy statistics of the joined data
+# calculates the statistical measurements of section 6 of notebook_main.Rmd (means, MAE, MSE, RMSE, R-squared, Pearson, Spearman and Kendall correlation),
+# along with the bias and MAPE in linear and log space, and their bootstrap confidence intervals
+# the Kendall correlation uses Knight's O(n log n) algorithm instead of the notebook's loop over all pairs of points
+
+
+
+import csv
+import logging
+import argparse
+import concurrent.futures
+import typing as ty
+from types import NoneType
+import numpy as np
+from scipy import stats
+
+
+
+# USER VARIABLES
+
+# the joined data (output of matchup.py)
+filepath_to_joined_data_csv = "joined_data.csv"
+
+# number of bootstrap resamples (0 to skip the confidence intervals)
+setting_bootstrap_resample_count = 1000
+
+# the confidence level of the bootstrap confidence intervals
+setting_bootstrap_confidence = 0.95
+
+# the seed of the bootstrap resampling, the same seed always gives the same intervals (regardless of the number of threads)
+setting_bootstrap_seed = 0
+
+# number of threads computing the bootstrap resamples
+setting_bootstrap_thread_count = 4
+
+
+
+# PROGRAM VARIABLES
+
+_logger = logging.getLogger("accuracy_stats")
+
+
+
+# PROGRAM CONSTANTS
+
+# the columns of the joined data with the in-situ (actual) and satellite (predicted) values
+_column_actu = "chl_a"
+_column_pred = "chl_a_sat"
+
+# number of bootstrap resamples computed by a thread at once
+_bootstrap_chunk_size = 16
+
+# the statistical measurements (name, description, decimal places), in the order of the notebook's output
+_stat_description_list = [
+    ("count", "Number of measurements", 0),
+    ("avg_actu", "Arithmetic mean (in-situ)", 3),
+    ("avg_pred", "Arithmetic mean (satellite)", 3),
+    ("avg_geom_actu", "Geometric mean (in-situ)", 3),
+    ("avg_geom_pred", "Geometric mean (satellite)", 3),
+    ("bias", "Bias", 3),
+    ("mae", "MAE", 3),
+    ("mae_arit", "MAE (arit. mean adjusted)", 3),
+    ("mae_geom", "MAE (geom. mean adjusted)", 3),
+    ("mse", "MSE", 3),
+    ("mse_arit", "MSE (arit. mean adjusted)", 3),
+    ("mse_geom", "MSE (geom. mean adjusted)", 3),
+    ("rmse", "RMSE", 3),
+    ("rmse_arit", "RMSE (arit. mean adjusted)", 3),
+    ("rmse_geom", "RMSE (geom. mean adjusted)", 3),
+    ("mape", "MAPE (%)", 2),
+    ("r2", "R-squared", 4),
+    ("r_pearson", "R (pearson)", 4),
+    ("r_spearman", "R (spearman)", 4),
+    ("r_kendall", "R (kendall)", 4),
+    ("bias_log", "Bias (log)", 4),
+    ("mae_log", "MAE (log)", 4),
+    ("rmse_log", "RMSE (log)", 4),
+    ("mape_log", "MAPE (log) (%)", 2),
+    ("r2_log", "R-squared (log)", 4),
+    ("r_log_pearson", "R (pearson) (log)", 4),
+    ("r_log_spearman", "R (spearman) (log)", 4)
+]
+
+
+
+# FUNCTION DEFINITIONS
+
+
+# gets the values of a column as a float array, without copying them if they already are (a NumPy array, a memory-mapped array or a column of a table)
+def get_float_values(values: ty.Any) -> np.ndarray:
+    return np.asarray(values, dtype=np.float64)
+
+
+# gets the rows at which both values are valid (not NaN, and positive if the values are used in log space)
+def get_valid_rows(actu: np.ndarray, pred: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore"):
+        return np.flatnonzero(~np.isnan(actu) & ~np.isnan(pred) & (actu > 0) & (pred > 0))
+
+
+# the Pearson correlation coefficient (like 'pearson_sample_correlation' in the notebook)
+def pearson_correlation(x: np.ndarray, y: np.ndarray) -> float:
+    if len(x) != len(y) or len(x) < 2:
+        return np.nan
+    dx = x - np.mean(x)
+    dy = y - np.mean(y)
+    denominator = np.sqrt(np.dot(dx, dx) * np.dot(dy, dy))
+    if denominator == 0:
+        return np.nan
+    return float(np.dot(dx, dy) / denominator)
+
+
+# the Spearman correlation coefficient (the Pearson correlation of the ranks, tied values get their average rank)
+def spearman_correlation(x: np.ndarray, y: np.ndarray) -> float:
+    if len(x) != len(y) or len(x) < 2:
+        return np.nan
+    return pearson_correlation(stats.rankdata(x), stats.rankdata(y))
+
+
+# counts the pairs of equal values in sorted values
+def count_tied_pairs(values_sorted: np.ndarray) -> int:
+    if len(values_sorted) < 2:
+        return 0
+    start = np.flatnonzero(np.r_[True, values_sorted[1:] != values_sorted[:-1]])
+    size = np.diff(np.r_[start, len(values_sorted)]).astype(np.int64)
+    return int(np.sum(size * (size - 1) // 2))
+
+
+# counts the pairs (i < j) with rank[i] > rank[j], the ranks are integers from 0 on
+# the ranks are sorted one bit at a time from the highest one (a radix sort), each pass counts the pairs that first differ in that bit,
+# so that it takes O(n log n) time with a few array operations per bit instead of a loop over the points
+def count_inversions(rank: np.ndarray) -> int:
+    n = len(rank)
+    if n < 2:
+        return 0
+    values = np.asarray(rank, dtype=np.int64)
+    position = np.arange(n)
+    count = 0
+    for bit in range(int(values.max()).bit_length() - 1, -1, -1):
+        # the values are sorted by their higher bits, the values with the same higher bits are a group (in their original order)
+        group = values >> (bit + 1)
+        is_one = (values >> bit) & 1
+        start = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+        group_index = np.repeat(np.arange(len(start)), np.diff(np.r_[start, n]))
+        group_start = start[group_index]
+        ones_before = np.cumsum(is_one) - is_one
+        ones_before -= ones_before[group_start]
+        zeros_before = position - group_start - ones_before
+        count += int(np.sum(ones_before[is_one == 0]))
+        # stable partition of each group by the bit
+        zeros_in_group = np.diff(np.r_[start, n]) - np.add.reduceat(is_one, start)
+        new_position = np.where(is_one == 0, group_start + zeros_before, group_start + zeros_in_group[group_index] + ones_before)
+        values_new = np.empty_like(values)
+        values_new[new_position] = values
+        values = values_new
+    return count
+
+
+# the Kendall correlation coefficient with Knight's algorithm (sort by x, count the pairs that are out of order in y)
+# variant "b" adjusts for tied values (like 'cor(method = "kendall")' in R), variant "a" doesn't (like 'kendall_correlation' in the notebook)
+def kendall_correlation(x: np.ndarray, y: np.ndarray, variant: str = "b") -> float:
+    n = len(x)
+    if n != len(y) or n < 2:
+        return np.nan
+    order = np.lexsort((y, x))
+    x_sorted = x[order]
+    y_sorted = y[order]
+    # the y ranks (equal values have equal ranks) in the order of x
+    (_, y_rank) = np.unique(y_sorted, return_inverse=True)
+    pair_count = n * (n - 1) // 2
+    x_tie_count = count_tied_pairs(x_sorted)
+    y_tie_count = count_tied_pairs(np.sort(y_sorted))
+    # pairs tied in both x and y (x is sorted and y is sorted within the same x values)
+    xy_same = np.r_[True, (x_sorted[1:] != x_sorted[:-1]) | (y_sorted[1:] != y_sorted[:-1])]
+    start = np.flatnonzero(xy_same)
+    size = np.diff(np.r_[start, n]).astype(np.int64)
+    xy_tie_count = int(np.sum(size * (size - 1) // 2))
+    discordant_count = count_inversions(y_rank)
+    numerator = pair_count - x_tie_count - y_tie_count + xy_tie_count - 2 * discordant_count
+    if variant == "a":
+        return numerator / pair_count
+    denominator = np.sqrt(float(pair_count - x_tie_count) * float(pair_count - y_tie_count))
+    if denominator == 0:
+        return np.nan
+    return float(numerator / denominator)
+
+
+# the error measurements of the predicted values (bias, MAE, MSE, RMSE and MAPE)
+def get_error_stats(actu: np.ndarray, pred: np.ndarray) -> ty.Dict[str, float]:
+    difference = pred - actu
+    absolute = np.abs(difference)
+    mse = float(np.mean(difference * difference))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mape = float(100 * np.mean(absolute / np.abs(actu)))
+    return {"bias": float(np.mean(difference)), "mae": float(np.mean(absolute)), "mse": mse, "rmse": float(np.sqrt(mse)), "mape": mape}
+
+
+# calculates all statistical measurements of the values at the given rows (all rows if None)
+# the log-space MAPE is the average multiplicative error (in %), as the percentage of a logarithm isn't meaningful
+def get_accuracy_stats(actu: ty.Any, pred: ty.Any, rows: np.ndarray | NoneType = None) -> ty.Dict[str, float]:
+    actu = get_float_values(actu)
+    pred = get_float_values(pred)
+    if rows is not None:
+        actu = actu[rows]
+        pred = pred[rows]
+    count = len(actu)
+    result = {"count": count}
+    if count == 0:
+        result.update({name: np.nan for (name, _, _) in _stat_description_list if name != "count"})
+        return result
+    actu_log = np.log(actu)
+    pred_log = np.log(pred)
+    result["avg_actu"] = float(np.mean(actu))
+    result["avg_pred"] = float(np.mean(pred))
+    result["avg_geom_actu"] = float(np.exp(np.mean(actu_log)))
+    result["avg_geom_pred"] = float(np.exp(np.mean(pred_log)))
+    error = get_error_stats(actu, pred)
+    error_arit = get_error_stats(actu, pred * (result["avg_actu"] / result["avg_pred"]))
+    error_geom = get_error_stats(actu, pred * (result["avg_geom_actu"] / result["avg_geom_pred"]))
+    for name in ["mae", "mse", "rmse"]:
+        result[name] = error[name]
+        result[name + "_arit"] = error_arit[name]
+        result[name + "_geom"] = error_geom[name]
+    result["bias"] = error["bias"]
+    result["mape"] = error["mape"]
+    error_log = get_error_stats(actu_log, pred_log)
+    result["bias_log"] = error_log["bias"]
+    result["mae_log"] = error_log["mae"]
+    result["rmse_log"] = error_log["rmse"]
+    result["mape_log"] = float(100 * (np.exp(error_log["mae"]) - 1))
+    result["r_pearson"] = pearson_correlation(actu, pred)
+    result["r2"] = result["r_pearson"] ** 2
+    result["r_spearman"] = spearman_correlation(actu, pred)
+    result["r_kendall"] = kendall_correlation(actu, pred)
+    result["r_log_pearson"] = pearson_correlation(actu_log, pred_log)
+    result["r2_log"] = result["r_log_pearson"] ** 2
+    # the logarithm doesn't change the ranks
+    result["r_log_spearman"] = result["r_spearman"]
+    return result
+
+
+# calculates the statistical measurements of a chunk of bootstrap resamples, each resample has its own random generator
+def get_bootstrap_chunk(actu: np.ndarray, pred: np.ndarray, rows: np.ndarray, seed_list: ty.List[np.random.SeedSequence]) -> ty.List[ty.Dict[str, float]]:
+    result_list = []
+    for seed in seed_list:
+        generator = np.random.default_rng(seed)
+        result_list.append(get_accuracy_stats(actu, pred, rows[generator.integers(0, len(rows), len(rows))]))
+    return result_list
+
+
+# calculates the bootstrap (percentile) confidence intervals of the statistical measurements of the values at the given rows (all rows if None)
+# the resamples are computed in threads, which share the values without copying them (NumPy releases the GIL while sorting and computing)
+# returns the lower and upper bound of each measurement
+def get_bootstrap_intervals(
+    actu: ty.Any,
+    pred: ty.Any,
+    rows: np.ndarray | NoneType = None,
+    resample_count: int = setting_bootstrap_resample_count,
+    confidence: float = setting_bootstrap_confidence,
+    seed: int = setting_bootstrap_seed,
+    thread_count: int = setting_bootstrap_thread_count
+) -> ty.Dict[str, ty.Tuple[float, float]]:
+    actu = get_float_values(actu)
+    pred = get_float_values(pred)
+    if rows is None:
+        rows = np.arange(len(actu))
+    seed_list = np.random.SeedSequence(seed).spawn(resample_count)
+    chunk_list = [seed_list[i:(i + _bootstrap_chunk_size)] for i in range(0, resample_count, _bootstrap_chunk_size)]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, thread_count)) as executor:
+        result_list = [result for chunk_result in executor.map(lambda chunk: get_bootstrap_chunk(actu, pred, rows, chunk), chunk_list) for result in chunk_result]
+    interval_map = {}
+    for (name, _, _) in _stat_description_list:
+        values = np.array([result[name] for result in result_list], dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if len(values) == 0 or len(rows) == 0:
+            interval_map[name] = (np.nan, np.nan)
+            continue
+        (low, high) = np.percentile(values, [50 * (1 - confidence), 50 * (1 + confidence)])
+        interval_map[name] = (float(low), float(high))
+    return interval_map
+
+
+# reads the in-situ and satellite values of the joined data
+def read_joined_data(filepath: str) -> ty.Tuple[np.ndarray, np.ndarray]:
+    with open(filepath, "r", encoding="UTF-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        (index_actu, index_pred) = (header.index(_column_actu), header.index(_column_pred))
+        value_list = [(row[index_actu], row[index_pred]) for row in reader]
+    values = np.array(value_list, dtype=str).reshape(-1, 2)
+    values = np.where(values == "", "nan", values).astype(np.float64)
+    return (values[:, 0], values[:, 1])
+
+
+# formats the statistical measurements as a table (like 'result_text_stats' in the notebook), with the confidence intervals if given
+def format_stats(result: ty.Dict[str, float], interval_map: ty.Dict[str, ty.Tuple[float, float]] | NoneType = None) -> str:
+    line_list = ["{:>35s} {:>10s}{:s}".format("Statistical indicator", "Value", "  Confidence interval" if interval_map else "")]
+    line_list.append("=" * len(line_list[0]))
+    for (name, description, decimal_places) in _stat_description_list:
+        line = "{:>35s} {:>10.{:}f}".format(description + ":", result[name], decimal_places)
+        if interval_map and name != "count":
+            line += "  [{:.{:}f}, {:.{:}f}]".format(interval_map[name][0], decimal_places, interval_map[name][1], decimal_places)
+        line_list.append(line)
+    return "\n".join(line_list)
+
+
+
+
+# main function
+def main() -> None:
+
+    argument_parser = argparse.ArgumentParser(description="Calculates the accuracy statistics of the joined data.")
+    argument_parser.add_argument("--joined", default=filepath_to_joined_data_csv, help="the joined data (output of matchup.py)")
+    argument_parser.add_argument("--bootstrap", type=int, default=setting_bootstrap_resample_count, help="number of bootstrap resamples (0 to skip the confidence intervals)")
+    argument_parser.add_argument("--confidence", type=float, default=setting_bootstrap_confidence, help="the confidence level of the intervals")
+    argument_parser.add_argument("--seed", type=int, default=setting_bootstrap_seed, help="the seed of the bootstrap resampling")
+    argument_parser.add_argument("--threads", type=int, default=setting_bootstrap_thread_count, help="number of threads computing the bootstrap resamples")
+    arguments = argument_parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    (actu, pred) = read_joined_data(arguments.joined)
+    rows = get_valid_rows(actu, pred)
+    if len(rows) < len(actu):
+        _logger.info("{:} points without a positive in-situ or satellite value are not used.".format(len(actu) - len(rows)))
+    result = get_accuracy_stats(actu, pred, rows)
+    interval_map = None
+    if arguments.bootstrap > 0:
+        interval_map = get_bootstrap_intervals(actu, pred, rows, arguments.bootstrap, arguments.confidence, arguments.seed, arguments.threads)
+    print(format_stats(result, interval_map))
+
+
+
+
+if __name__ == "__main__":
+    main()
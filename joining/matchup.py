@@ -0,0 +1,428 @@
+# satellite and in-situ data matchup
+# joins the in-situ measurements (situ.csv, the output of ODV_parse.py) with the satellite chlorophyll data (Copernicus REP NetCDF files)
+# it follows the 'combine_satellite_with_in-situ_data' block of notebook_main.Rmd, but all in-situ points of a satellite day are sampled at once
+
+
+
+import os
+import sys
+import csv
+import logging
+import argparse
+import typing as ty
+from types import NoneType
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import sat_reader
+import sat_catalog
+import spatial_index
+import matchup_cache
+
+
+
+# USER VARIABLES
+
+# which sampling method to use
+# options are:
+#   "BILIN_NAIVE": naive bilinear interpolation (least valid joins between data)
+#   "NN": nearest neighbour
+#   "BILIN_ADVANCED": advanced bilinear interpolation (most valid joins between data), naive + processing some null values
+setting_matchup_sampling_method = "BILIN_ADVANCED"
+
+# limit the longitude and latitude (filter data beforehand)
+setting_limit_lon_min = 11.8
+setting_limit_lon_max = 19.7
+setting_limit_lat_min = 39.9
+setting_limit_lat_max = 45.9
+
+# remove in-situ measurements that have their quality lower than the specified threshold
+# can be set to None to ignore condition
+setting_situ_min_quality_threshold = 0
+
+# remove in-situ measurements with the Chl value at or above this value
+setting_situ_chl_max = 70
+
+# only use the in-situ measurements captured within this time range (exclusive)
+setting_situ_datetime_min = "2010-01-01"
+setting_situ_datetime_max = "2022-01-15"
+
+# what difference in time is still considered to be a match between in-situ and satellite data
+setting_day_width_interval = 1 # one day
+# offset for where to center the interval
+setting_day_offset_interval = 0.5 # mid-day (noon)
+
+# fill the points without a satellite value (clouds) with the average of the nearest satellite values within this distance (in meters)
+# set to '0' to disable (as in the notebook)
+setting_matchup_gap_fill_radius = 0
+# the maximum number of the nearest satellite values used to fill a point
+setting_matchup_gap_fill_count = 4
+
+# limit the processed in-situ data to only those with these file marks (empty list processes all)
+# file marks are specified in the "filelist.txt" file and taken into account before the in-situ data is parsed with the Python script
+setting_acceptable_file_mark_list = [
+    #"filemarkname1",
+    #"filemarkname2",
+]
+
+
+# paths to files or directories
+
+# path to in-situ data (the .csv output of ODV_parse.py, or its binary .npz output)
+path_to_in_situ = "../data/situ/situ.csv"
+# path to satellite folder containing the files
+path_to_sat = "../data/sat"
+# the satellite data files in the satellite folder, used in alphabetical order
+setting_sat_filename_pattern = "REP_L3_*.nc"
+
+# path to the joined data
+filepath_to_joined_data_csv = "joined_data.csv"
+
+# also save the quality index (QI) of the nearest satellite pixel and its distance from the in-situ point (in meters) in the joined data
+setting_joined_sat_quality_columns = False
+
+# path to the matchup cache, which keeps the sampled satellite values between runs (None to not use it)
+filepath_to_matchup_cache = None
+
+
+
+# PROGRAM VARIABLES
+
+_logger = logging.getLogger("matchup")
+
+
+
+# PROGRAM CONSTANTS
+
+_sampling_method_list = ["NN", "BILIN_NAIVE", "BILIN_ADVANCED"]
+
+# the days of the in-situ and satellite data are counted from this time
+_day_origin = sat_reader._day_origin
+_seconds_per_day = sat_reader._seconds_per_day
+
+_joined_column_list = ["id", "seq", "file_type", "cap_date", "lat", "lon", "chl_a", "sat_day", "chl_a_sat"]
+_joined_quality_column_list = ["qi_sat", "sat_distance"]
+
+
+
+# OBJECT DEFINITIONS
+
+
+class SituData(object):
+    def __init__(self, columns: ty.Dict[str, np.ndarray]):
+        self.id = columns["file_id"] # id of the file of each measurement
+        self.file_type = columns["file_type"] # file mark of each measurement
+        self.cap_date = columns["date_time"] # capture datetime of each measurement
+        self.cap_second = (self.cap_date - _day_origin).astype(np.float64) # seconds since the day origin
+        self.cap_day = self.cap_second / _seconds_per_day # days since the day origin (with the fraction of the day)
+        self.lat = columns["lat"]
+        self.lon = columns["lon"]
+        self.chl = columns["chl"]
+        self.is_distinct = get_distinct_mask(self) # False for the measurements that repeat an earlier one (same time, position and Chl), they are never matched
+        self.day_order = np.argsort(self.cap_day, kind="stable") # the measurements ordered by the capture day
+        self.day_sorted = self.cap_day[self.day_order]
+        self.station_index = spatial_index.StationIndex(self.lon, self.lat) # the measurements at the same position share a station
+    def __len__(self) -> int:
+        return len(self.cap_day)
+    def get_day_window_rows(self, day: int, width: float, offset: float) -> np.ndarray: # gets the measurements within the time window of a satellite day
+        low = day + (offset - width / 2)
+        high = day + (offset + width / 2)
+        (start, stop) = np.searchsorted(self.day_sorted, [low, high], side="left")
+        rows = self.day_order[start:stop]
+        return rows[self.is_distinct[rows]]
+
+
+class MatchupResult(object):
+    def __init__(self, count: int):
+        self.chl_sat = np.full(count, np.nan) # the satellite Chl value matched to each measurement, NaN if there is no match
+        self.sat_second = np.full(count, np.nan) # the satellite day of the match (seconds since the day origin)
+        self.quality_sat = np.full(count, np.nan) # the quality index of the nearest satellite pixel of the match
+        self.distance_sat = np.full(count, np.nan) # the distance of the nearest satellite pixel of the match (in meters)
+        self.skipped_count = 0 # the number of measurements outside of the satellite grid, for each day they were in
+        self.sampled_count = 0 # the number of sampled measurements
+    def update(self, rows: np.ndarray, values: np.ndarray, sat_second: float, cap_second: np.ndarray, offset: float, quality: np.ndarray | NoneType = None, distance: np.ndarray | NoneType = None) -> None:
+        # keeps the new values of the measurements without a match, or with a match from a day further away in time
+        has_value = ~np.isnan(values)
+        rows = rows[has_value]
+        values = values[has_value]
+        cap_second = cap_second[has_value]
+        is_new = np.isnan(self.chl_sat[rows])
+        distance_in = np.abs(self.sat_second[rows] + offset * _seconds_per_day - cap_second)
+        distance_new = np.abs(sat_second + offset * _seconds_per_day - cap_second)
+        is_closer = is_new | (distance_new < distance_in)
+        self.chl_sat[rows[is_closer]] = values[is_closer]
+        self.sat_second[rows[is_closer]] = sat_second
+        if quality is not None:
+            self.quality_sat[rows[is_closer]] = quality[has_value][is_closer]
+        if distance is not None:
+            self.distance_sat[rows[is_closer]] = distance[has_value][is_closer]
+
+
+
+# FUNCTION DEFINITIONS
+
+
+# reads the columns of the in-situ data, the values of each column as a NumPy array of strings
+def read_situ_columns(filepath: str) -> ty.Dict[str, np.ndarray]:
+    if filepath.lower().endswith(".npz"):
+        with np.load(filepath) as npz:
+            return {column_name: npz[column_name].astype(str) for column_name in npz.files}
+    with open(filepath, "r", encoding="UTF-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = list(reader)
+    if len(rows) == 0:
+        return {column_name: np.zeros(0, dtype=str) for column_name in header}
+    values = np.array(rows, dtype=str)
+    return {column_name: values[:, i] for (i, column_name) in enumerate(header)}
+
+
+# converts string values to floats, empty values are NaN
+def parse_float_column(values: np.ndarray) -> np.ndarray:
+    values = np.asarray(values, dtype=str)
+    result = np.full(len(values), np.nan)
+    has_value = values != ""
+    result[has_value] = values[has_value].astype(np.float64)
+    return result
+
+
+# parses the datetime texts of a column, the texts that are not datetimes (empty ones, or ones that are not real dates like '2012-02-30') are NaT
+# like 'parse_datetime' in the notebook, where such a value is NA and its measurement is left out
+def parse_datetime_column(values: np.ndarray) -> np.ndarray:
+    values = np.asarray(values, dtype=str)
+    (text_array, inverse) = np.unique(values, return_inverse=True)
+    result = np.full(len(text_array), np.datetime64("NaT", "s"))
+    for (i, text) in enumerate(text_array.tolist()):
+        try:
+            result[i] = np.datetime64(text, "s") if text != "" else np.datetime64("NaT", "s")
+        except ValueError:
+            pass
+    return result[inverse.reshape(-1)]
+
+
+# reads the in-situ data and parses the columns used in the matchup
+def read_situ_data(filepath: str) -> ty.Dict[str, np.ndarray]:
+    columns = read_situ_columns(filepath)
+    for column_name in ["lon", "lat", "chl", "quality"]:
+        columns[column_name] = parse_float_column(columns[column_name])
+    columns["date_time"] = parse_datetime_column(columns["date_time"])
+    return columns
+
+
+# finds the measurements that can be matched (with a Chl value, capture time and position)
+def get_situ_valid_mask(columns: ty.Dict[str, np.ndarray]) -> np.ndarray:
+    return ~np.isnan(columns["chl"]) & ~np.isnat(columns["date_time"]) & ~np.isnan(columns["lon"]) & ~np.isnan(columns["lat"])
+
+
+# finds the measurements that pass the filters of sections 2.1 and 2.2 of the notebook
+def get_situ_filter_mask(
+    columns: ty.Dict[str, np.ndarray],
+    chl_max: float = setting_situ_chl_max,
+    lon_range: ty.Tuple[float, float] = (setting_limit_lon_min, setting_limit_lon_max),
+    lat_range: ty.Tuple[float, float] = (setting_limit_lat_min, setting_limit_lat_max),
+    min_quality_threshold: float | NoneType = setting_situ_min_quality_threshold,
+    file_mark_list: ty.List[str] = setting_acceptable_file_mark_list,
+    datetime_range: ty.Tuple[str, str] = (setting_situ_datetime_min, setting_situ_datetime_max)
+) -> np.ndarray:
+    keep = get_situ_valid_mask(columns)
+    with np.errstate(invalid="ignore"):
+        keep &= columns["chl"] < chl_max
+        keep &= (columns["lon"] >= lon_range[0]) & (columns["lon"] <= lon_range[1])
+        keep &= (columns["lat"] >= lat_range[0]) & (columns["lat"] <= lat_range[1])
+        if min_quality_threshold is not None:
+            # measurements without a quality are removed as well
+            keep &= columns["quality"] >= min_quality_threshold
+    if len(file_mark_list) > 0:
+        keep &= np.isin(np.char.upper(columns["file_type"]), [file_mark.upper() for file_mark in file_mark_list])
+    keep &= columns["date_time"] > np.datetime64(datetime_range[0], "s")
+    keep &= columns["date_time"] < np.datetime64(datetime_range[1], "s")
+    return keep
+
+
+# reads the in-situ data and keeps the measurements used in the matchup (sections 2.1 and 2.2 of the notebook)
+def get_situ_data(filepath: str) -> SituData:
+    columns = read_situ_data(filepath)
+    keep = get_situ_filter_mask(columns)
+    return SituData({column_name: values[keep] for (column_name, values) in columns.items()})
+
+
+# groups the measurements with the same capture time, position and Chl value (like 'distinct' in the notebook)
+# returns the group of each measurement and the first measurement of each group
+def get_distinct_groups(situ: SituData) -> ty.Tuple[np.ndarray, np.ndarray]:
+    if len(situ.cap_second) == 0:
+        return (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+    key = np.stack([situ.cap_second, situ.lat, situ.lon, situ.chl], axis=1)
+    (_, index_first, group) = np.unique(key, axis=0, return_index=True, return_inverse=True)
+    return (group.reshape(-1), index_first)
+
+
+# finds the first of the measurements with the same capture time, position and Chl value
+# returns a mask that is True for the first measurement of each group
+def get_distinct_mask(situ: SituData) -> np.ndarray:
+    mask = np.zeros(len(situ.cap_second), dtype=bool)
+    mask[get_distinct_groups(situ)[1]] = True
+    return mask
+
+
+# fills the values of the stations without a value with the average of the nearest grid values within the radius (in meters)
+def fill_gaps(values: np.ndarray, grid: np.ndarray, location: spatial_index.GridLocation, station: np.ndarray, radius: float, count: int, origin: ty.Tuple[int, int]) -> np.ndarray:
+    is_gap = np.isnan(values)
+    if radius <= 0 or not np.any(is_gap):
+        return values
+    (nearest_values, _) = location.get_nearest_valid_pixels(grid, station[is_gap], count, radius, origin)
+    has_value = ~np.all(np.isnan(nearest_values), axis=1)
+    values = values.copy()
+    values[np.flatnonzero(is_gap)[has_value]] = np.nanmean(nearest_values[has_value], axis=1)
+    return values
+
+
+# samples the satellite data of a day at the stations
+# returns the Chl value, the quality index of the nearest pixel (NaN if it isn't read) and the distance of the nearest pixel (in meters) of each station
+def sample_sat_day(reader: sat_reader.SatReader, location: spatial_index.GridLocation, station: np.ndarray, day_index: int, method: str, gap_fill_radius: float, gap_fill_count: int, with_quality: bool) -> np.ndarray:
+    margin = location.get_radius_margin(gap_fill_radius) if gap_fill_radius > 0 else (0, 0)
+    window = location.get_sample_window(station, margin)
+    (grid, window) = reader.get_day_slice(sat_reader._sat_variable_chl, day_index, window)
+    origin = (window[0], window[2])
+    result = np.full((len(station), 3), np.nan)
+    values = spatial_index.sample_grid(grid, location.index_lon[station], location.index_lat[station], method, origin)
+    result[:, 0] = fill_gaps(values, grid, location, station, gap_fill_radius, gap_fill_count, origin)
+    if with_quality and sat_reader._sat_variable_quality in reader.variable_list:
+        (grid_quality, window_quality) = reader.get_day_slice(sat_reader._sat_variable_quality, day_index, window)
+        result[:, 1] = spatial_index.sample_grid(grid_quality, location.index_lon[station], location.index_lat[station], "NN", (window_quality[0], window_quality[2]))
+    # the nearest pixel is the one used by the nearest neighbour sampling
+    nearest_lon = np.clip(location.lon_whole[station] - 1 + (location.lon_fract[station] > 0.5), 0, location.shape[1] - 1)
+    nearest_lat = np.clip(location.lat_whole[station] - 1 + (location.lat_fract[station] > 0.5), 0, location.shape[0] - 1)
+    result[:, 2] = spatial_index.lon_lat_to_dist(location.lon[station], location.lat[station], location.grid_lon[nearest_lon], location.grid_lat[nearest_lat])
+    return result
+
+
+# gets the satellite values (see 'sample_sat_day') of the stations of a day, taking them from the cache if it is given
+# only the stations without cached values are sampled (the day isn't read at all if all of them are cached)
+def get_sat_day_values(reader: sat_reader.SatReader, location: spatial_index.GridLocation, station: np.ndarray, day_index: int, method: str, gap_fill_radius: float, gap_fill_count: int, with_quality: bool, cache: matchup_cache.MatchupCache | NoneType = None) -> np.ndarray:
+    if cache is None:
+        return sample_sat_day(reader, location, station, day_index, method, gap_fill_radius, gap_fill_count, with_quality)
+    file_id = cache.get_file_id(reader.filepath)
+    mode = matchup_cache.get_mode(method, gap_fill_radius, gap_fill_count)
+    position = matchup_cache.get_position_keys(location.index_lon[station], location.index_lat[station])
+    (found, values) = cache.get_values(file_id, day_index, mode, position)
+    if not np.all(found):
+        # the cached values always have the quality index, so that they can be used by any run
+        values[~found] = sample_sat_day(reader, location, station[~found], day_index, method, gap_fill_radius, gap_fill_count, True)
+        cache.put_values(file_id, day_index, mode, position[~found], values[~found])
+    return values
+
+
+# matches the in-situ measurements with the satellite data of a file, day by day
+# the grid locations of the stations are found once for each grid (and reused for all files with the same grid)
+# only the days with measurements within their time window are read, and only the part of the grid around these measurements
+# each station is sampled once for each day, even if it has more measurements (for example at different depths)
+def matchup_sat_data(situ: SituData, reader: sat_reader.SatReader, result: MatchupResult, method: str, width: float, offset: float, gap_fill_radius: float = setting_matchup_gap_fill_radius, gap_fill_count: int = setting_matchup_gap_fill_count, cache: matchup_cache.MatchupCache | NoneType = None, with_quality: bool = setting_joined_sat_quality_columns) -> None:
+    location = situ.station_index.get_grid_location(reader.lon, reader.lat)
+    for day_index in reader.get_day_index_list(situ.day_sorted, width, offset):
+        rows = situ.get_day_window_rows(reader.day[day_index], width, offset)
+        station = situ.station_index.point_station[rows]
+        # measurements outside of the satellite grid are skipped
+        outside = location.is_outside[station]
+        result.skipped_count += np.count_nonzero(outside)
+        rows = rows[~outside]
+        if len(rows) == 0:
+            continue
+        (station, station_inverse) = np.unique(station[~outside], return_inverse=True)
+        values = get_sat_day_values(reader, location, station, day_index, method, gap_fill_radius, gap_fill_count, with_quality, cache)[station_inverse]
+        result.sampled_count += len(rows)
+        result.update(rows, values[:, 0], reader.time_second[day_index], situ.cap_second[rows], offset, values[:, 1], values[:, 2])
+
+
+# gets the satellite data files that overlap the in-situ days and area, in alphabetical order
+# the contents of the files are taken from the catalog of the satellite folder (which is updated first)
+def get_sat_filepath_list(directory: str, pattern: str, situ: SituData, width: float = setting_day_width_interval, offset: float = setting_day_offset_interval) -> ty.List[str]:
+    catalog = sat_catalog.update_catalog(directory)
+    if len(situ) == 0:
+        return []
+    return sat_catalog.get_overlapping_filepath_list(directory, catalog, pattern, situ.day_sorted, width, offset,
+        (np.min(situ.lon), np.max(situ.lon)), (np.min(situ.lat), np.max(situ.lat)))
+
+
+# matches the in-situ measurements with the satellite data of all files
+def matchup(situ: SituData, sat_filepath_list: ty.List[str], method: str = setting_matchup_sampling_method, width: float = setting_day_width_interval, offset: float = setting_day_offset_interval, gap_fill_radius: float = setting_matchup_gap_fill_radius, gap_fill_count: int = setting_matchup_gap_fill_count, cache: matchup_cache.MatchupCache | NoneType = None, with_quality: bool = setting_joined_sat_quality_columns) -> MatchupResult:
+    if method not in _sampling_method_list:
+        raise ValueError("Unknown sampling method '{:}', the options are: {:}".format(method, ", ".join(_sampling_method_list)))
+    result = MatchupResult(len(situ))
+    for (i, filepath) in enumerate(sat_filepath_list, start = 1):
+        _logger.info("Satellite file {:}, {:}/{:}".format(os.path.basename(filepath), i, len(sat_filepath_list)))
+        with sat_reader.SatReader(filepath) as reader:
+            matchup_sat_data(situ, reader, result, method, width, offset, gap_fill_radius, gap_fill_count, cache, with_quality)
+            _logger.debug("Read {:} of {:} days ({:} grid points).".format(reader.read_count, len(reader.day), reader.read_cell_count))
+    return result
+
+
+# formats datetimes (seconds since the day origin) the same way as in the in-situ data
+def format_datetime(seconds: np.ndarray) -> ty.List[str]:
+    return [str(value) for value in (_day_origin + seconds.astype(np.int64)).astype("datetime64[s]")]
+
+
+# saves the measurements that have a satellite Chl value (section 4 of the notebook)
+def save_joined_data(situ: SituData, result: MatchupResult, filepath: str, with_quality: bool = setting_joined_sat_quality_columns) -> int:
+    rows = np.flatnonzero(~np.isnan(result.chl_sat))
+    columns = [
+        situ.id[rows],
+        [str(seq) for seq in range(1, len(rows) + 1)],
+        situ.file_type[rows],
+        format_datetime(situ.cap_second[rows]),
+        [str(value) for value in situ.lat[rows]],
+        [str(value) for value in situ.lon[rows]],
+        [str(value) for value in situ.chl[rows]],
+        format_datetime(result.sat_second[rows]),
+        [str(value) for value in result.chl_sat[rows]]
+    ]
+    column_name_list = _joined_column_list
+    if with_quality:
+        columns += [["" if np.isnan(value) else str(value) for value in result.quality_sat[rows]], [str(value) for value in result.distance_sat[rows]]]
+        column_name_list = column_name_list + _joined_quality_column_list
+    with open(filepath, "w", encoding="UTF-8", newline="") as f:
+        f.write(",".join(column_name_list) + "\n")
+        f.write("".join([",".join(line) + "\n" for line in zip(*columns)]))
+    return len(rows)
+
+
+
+
+# main function
+def main() -> None:
+
+    argument_parser = argparse.ArgumentParser(description="Joins the in-situ chlorophyll data with the satellite chlorophyll data.")
+    argument_parser.add_argument("--situ", default=path_to_in_situ, help="the in-situ data (output of ODV_parse.py)")
+    argument_parser.add_argument("--sat", default=path_to_sat, help="the directory with the satellite data files")
+    argument_parser.add_argument("--pattern", default=setting_sat_filename_pattern, help="the names of the satellite data files")
+    argument_parser.add_argument("--method", default=setting_matchup_sampling_method, choices=_sampling_method_list, help="the sampling method")
+    argument_parser.add_argument("--day-width", type=float, default=setting_day_width_interval, help="the width of the time window around a satellite day (in days)")
+    argument_parser.add_argument("--day-offset", type=float, default=setting_day_offset_interval, help="the offset of the center of the time window from the start of a satellite day (in days)")
+    argument_parser.add_argument("--gap-fill-radius", type=float, default=setting_matchup_gap_fill_radius, help="fill the points without a satellite value with the nearest satellite values within this distance (in meters)")
+    argument_parser.add_argument("--out", default=filepath_to_joined_data_csv, help="the joined data (.csv file)")
+    argument_parser.add_argument("--quality-columns", action="store_true", default=setting_joined_sat_quality_columns, help="also save the quality index of the nearest satellite pixel and its distance")
+    argument_parser.add_argument("--cache", default=filepath_to_matchup_cache, help="the matchup cache (SQLite file), which keeps the sampled satellite values between runs")
+    arguments = argument_parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    situ = get_situ_data(arguments.situ)
+    _logger.info("The in-situ data frame contains {:} data points.".format(len(situ)))
+    sat_filepath_list = get_sat_filepath_list(arguments.sat, arguments.pattern, situ, arguments.day_width, arguments.day_offset)
+    cache = matchup_cache.MatchupCache(arguments.cache) if arguments.cache is not None else None
+    try:
+        result = matchup(situ, sat_filepath_list, arguments.method, arguments.day_width, arguments.day_offset, arguments.gap_fill_radius, setting_matchup_gap_fill_count, cache, arguments.quality_columns)
+    finally:
+        if cache is not None:
+            _logger.info("Matchup cache: {:} station values reused, {:} sampled.".format(cache.hit_count, cache.miss_count))
+            cache.close()
+    if result.skipped_count > 0:
+        _logger.info("{:} points were skipped because they are outside of the satellite grid.".format(result.skipped_count))
+    joined_count = save_joined_data(situ, result, arguments.out, arguments.quality_columns)
+    _logger.info("There are {:} out of {:} ({:.2f}%) data points with corresponding satellite data.".format(
+        joined_count, len(situ), 100 * joined_count / max(1, len(situ))))
+
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# matchup cache
+# keeps the sampled satellite values of the in-situ stations between runs in an SQLite file, so that joining the data again
+# (for example after adding a few in-situ files) only samples the new stations
+# the values are kept for each satellite file, day (time index), station position and sampling mode (method and gap filling),
+# they are removed when the satellite file changes, and the least recently used days are removed when the cache grows too large
+
+
+
+import os
+import sqlite3
+import logging
+import typing as ty
+import numpy as np
+
+
+
+# USER VARIABLES
+
+# the maximum number of values kept in the cache (about 60 bytes each on disk)
+setting_matchup_cache_max_entry_count = 10_000_000
+
+
+
+# PROGRAM VARIABLES
+
+_logger = logging.getLogger("matchup_cache")
+
+
+
+# PROGRAM CONSTANTS
+
+# increase when the sampling or the stored values change, so that the previously cached values are not used anymore
+_cache_version = 1
+
+# the station positions are quantized to this fraction of a grid cell (stations closer than that share their values)
+_position_steps_per_cell = 1_000_000
+
+
+
+# OBJECT DEFINITIONS
+
+
+class MatchupCache(object):
+    def __init__(self, filepath: str, max_entry_count: int = setting_matchup_cache_max_entry_count):
+        self.filepath = filepath
+        self.max_entry_count = max_entry_count
+        self.connection = sqlite3.connect(filepath)
+        self.hit_count = 0 # the number of station values taken from the cache
+        self.miss_count = 0 # the number of station values that had to be sampled
+        self.file_id_map = {} # the ids of the satellite files already checked in this run
+        self.create_tables()
+        self.run = self.get_meta("run", 0) + 1 # the number of this run, the entries used by the oldest runs are removed first
+        self.set_meta("run", self.run)
+        self.connection.commit()
+    def __enter__(self):
+        return self
+    def __exit__(self, *args) -> None:
+        self.close()
+    def create_tables(self) -> None: # creates the tables, or recreates them if they are from a different version
+        cursor = self.connection.cursor()
+        cursor.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+        if self.get_meta("version", _cache_version) != _cache_version:
+            _logger.info("The matchup cache '{:}' is from a different version, it is cleared.".format(self.filepath))
+            cursor.execute("DROP TABLE IF EXISTS entry")
+            cursor.execute("DROP TABLE IF EXISTS sat_file")
+        self.set_meta("version", _cache_version)
+        cursor.execute("CREATE TABLE IF NOT EXISTS sat_file (file_id INTEGER PRIMARY KEY, filepath TEXT UNIQUE, size INTEGER, mtime_ns INTEGER)")
+        cursor.execute(
+            "CREATE TABLE IF NOT EXISTS entry ("
+            "file_id INTEGER, time_index INTEGER, mode TEXT, position_lon INTEGER, position_lat INTEGER, chl REAL, quality REAL, distance REAL, run INTEGER, "
+            "PRIMARY KEY (file_id, time_index, mode, position_lon, position_lat)) WITHOUT ROWID")
+        cursor.execute("CREATE INDEX IF NOT EXISTS entry_run ON entry (run)")
+    def get_meta(self, name: str, default: int) -> int:
+        row = self.connection.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return default if row is None else row[0]
+    def set_meta(self, name: str, value: int) -> None:
+        self.connection.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value))
+    def get_file_id(self, filepath: str) -> int: # gets the id of a satellite file (checked once in a run), the values of the file are removed if it has changed since they were cached
+        filepath = os.path.realpath(filepath)
+        if filepath in self.file_id_map:
+            return self.file_id_map[filepath]
+        self.file_id_map[filepath] = self.check_file(filepath)
+        return self.file_id_map[filepath]
+    def check_file(self, filepath: str) -> int:
+        stat = os.stat(filepath)
+        row = self.connection.execute("SELECT file_id, size, mtime_ns FROM sat_file WHERE filepath = ?", (filepath,)).fetchone()
+        if row is not None and (row[1], row[2]) == (stat.st_size, stat.st_mtime_ns):
+            return row[0]
+        if row is not None:
+            _logger.info("The satellite file '{:}' has changed, its cached values are removed.".format(filepath))
+            self.connection.execute("DELETE FROM entry WHERE file_id = ?", (row[0],))
+            self.connection.execute("UPDATE sat_file SET size = ?, mtime_ns = ? WHERE file_id = ?", (stat.st_size, stat.st_mtime_ns, row[0]))
+            self.connection.commit()
+            return row[0]
+        cursor = self.connection.execute("INSERT INTO sat_file (filepath, size, mtime_ns) VALUES (?, ?, ?)", (filepath, stat.st_size, stat.st_mtime_ns))
+        self.connection.commit()
+        return cursor.lastrowid
+    def get_values(self, file_id: int, time_index: int, mode: str, position: np.ndarray) -> ty.Tuple[np.ndarray, np.ndarray]: # gets the cached values (chl, quality, distance) of the station positions of a day, returns a mask of the found positions and their values (NaN for the others)
+        found = np.zeros(len(position), dtype=bool)
+        values = np.full((len(position), 3), np.nan)
+        row_list = self.connection.execute(
+            "SELECT position_lon, position_lat, chl, quality, distance FROM entry WHERE file_id = ? AND time_index = ? AND mode = ?", (file_id, int(time_index), mode)).fetchall()
+        if len(row_list) > 0:
+            row_map = {(row[0], row[1]): row[2:] for row in row_list}
+            for (i, key) in enumerate(map(tuple, position.tolist())):
+                row = row_map.get(key)
+                if row is not None:
+                    found[i] = True
+                    values[i] = [np.nan if value is None else value for value in row]
+            # the day is marked as used by this run
+            self.connection.execute("UPDATE entry SET run = ? WHERE file_id = ? AND time_index = ? AND mode = ? AND run != ?", (self.run, file_id, int(time_index), mode, self.run))
+        self.hit_count += np.count_nonzero(found)
+        self.miss_count += len(position) - np.count_nonzero(found)
+        return (found, values)
+    def put_values(self, file_id: int, time_index: int, mode: str, position: np.ndarray, values: np.ndarray) -> None: # stores the values (chl, quality, distance) of the station positions of a day
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO entry (file_id, time_index, mode, position_lon, position_lat, chl, quality, distance, run) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(file_id, int(time_index), mode, key[0], key[1], *[None if np.isnan(value) else value for value in row], self.run) for (key, row) in zip(position.tolist(), values.tolist())])
+    def evict(self) -> int: # removes the values used by the oldest runs until there are at most the maximum number of values, returns the number of removed values
+        count = self.connection.execute("SELECT COUNT(*) FROM entry").fetchone()[0]
+        if count <= self.max_entry_count:
+            return 0
+        removed_count = self.connection.execute(
+            "DELETE FROM entry WHERE (file_id, time_index, mode, position_lon, position_lat) IN "
+            "(SELECT file_id, time_index, mode, position_lon, position_lat FROM entry ORDER BY run LIMIT ?)", (count - self.max_entry_count,)).rowcount
+        _logger.info("Removed {:} values of the oldest runs from the matchup cache.".format(removed_count))
+        return removed_count
+    def close(self) -> None:
+        self.evict()
+        self.connection.commit()
+        self.connection.close()
+
+
+
+# FUNCTION DEFINITIONS
+
+
+# gets the cache keys of the station positions from their fractional grid indexes (lon, lat)
+def get_position_keys(index_lon: np.ndarray, index_lat: np.ndarray) -> np.ndarray:
+    return np.stack([np.round(index_lon * _position_steps_per_cell), np.round(index_lat * _position_steps_per_cell)], axis=1).astype(np.int64)
+
+
+# gets the cache mode of a sampling method with the gap filling settings
+def get_mode(method: str, gap_fill_radius: float, gap_fill_count: int) -> str:
+    if gap_fill_radius <= 0:
+        return method
+    return "{:}+gap_fill:{:}:{:}".format(method, float(gap_fill_radius), int(gap_fill_count))
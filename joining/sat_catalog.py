@@ -0,0 +1,186 @@
+# satellite data catalog
+# records the contents of the satellite data files (time axis, lon/lat extent, grid spacing and variables) in a small index file,
+# so that only the files that overlap the in-situ data have to be opened
+# the index is updated incrementally, only the new and changed files are opened again
+
+
+
+import os
+import sys
+import json
+import glob
+import fnmatch
+import logging
+import argparse
+import typing as ty
+from types import NoneType
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import sat_reader
+
+
+
+# USER VARIABLES
+
+# the files in the satellite folder that are recorded in the catalog
+setting_catalog_filename_pattern = "*.nc"
+
+
+
+# PROGRAM VARIABLES
+
+_logger = logging.getLogger("sat_catalog")
+
+
+
+# PROGRAM CONSTANTS
+
+# the name of the catalog file (in the satellite folder)
+_catalog_filename = "sat_catalog.json"
+
+# increase when the recorded contents of the files change, so that the previous catalog is not used anymore
+_catalog_version = 1
+
+
+
+# FUNCTION DEFINITIONS
+
+
+# gets the size and the modification time of a file, a changed file has a different size or modification time
+def get_file_stat(filepath: str) -> ty.Tuple[int, int]:
+    stat = os.stat(filepath)
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+# gets the step of an axis (the median difference between its values), None if it has less than two values
+def get_axis_step(values: np.ndarray) -> float | NoneType:
+    if len(values) < 2:
+        return None
+    return float(np.median(np.diff(values)))
+
+
+# opens a satellite data file and records its contents
+def get_catalog_entry(filepath: str) -> dict:
+    (size, mtime_ns) = get_file_stat(filepath)
+    with sat_reader.SatReader(filepath) as reader:
+        return {
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "variables": reader.variable_list,
+            "time_second": reader.time_second.tolist(),
+            "lon_min": float(np.nanmin(reader.lon)),
+            "lon_max": float(np.nanmax(reader.lon)),
+            "lon_step": get_axis_step(reader.lon),
+            "lon_count": len(reader.lon),
+            "lat_min": float(np.nanmin(reader.lat)),
+            "lat_max": float(np.nanmax(reader.lat)),
+            "lat_step": get_axis_step(reader.lat),
+            "lat_count": len(reader.lat)
+        }
+
+
+# gets the path of the catalog of a satellite folder
+def get_catalog_filepath(directory: str) -> str:
+    return os.path.join(directory, _catalog_filename)
+
+
+# loads the catalog, returns an empty catalog if it doesn't exist or is from a different version
+def load_catalog(filepath: str) -> dict:
+    empty = {"version": _catalog_version, "files": {}}
+    if not os.path.isfile(filepath):
+        return empty
+    try:
+        with open(filepath, "r", encoding="UTF-8") as f:
+            catalog = json.load(f)
+    except (OSError, ValueError) as e:
+        _logger.warning("Could not load the satellite data catalog '{:}': {:}".format(filepath, e))
+        return empty
+    if catalog.get("version") != _catalog_version:
+        return empty
+    return catalog
+
+
+# saves the catalog
+def save_catalog(catalog: dict, filepath: str) -> None:
+    with open(filepath, "w", encoding="UTF-8") as f:
+        json.dump(catalog, f, indent=1)
+
+
+# records the satellite data files of a folder in its catalog, opening only the files that are new or have changed since the last time
+# files that can't be read are not recorded (they are tried again the next time)
+# returns the catalog
+def update_catalog(directory: str, pattern: str = setting_catalog_filename_pattern) -> dict:
+    filepath_catalog = get_catalog_filepath(directory)
+    catalog = load_catalog(filepath_catalog)
+    entry_map = catalog["files"]
+    filename_list = sorted([os.path.basename(filepath) for filepath in glob.glob(os.path.join(directory, pattern))])
+
+    changed = False
+    for filename in list(entry_map.keys()):
+        if not os.path.isfile(os.path.join(directory, filename)):
+            del entry_map[filename]
+            changed = True
+    count_new = 0
+    for filename in filename_list:
+        filepath = os.path.join(directory, filename)
+        entry = entry_map.get(filename)
+        if entry is not None and (entry["size"], entry["mtime_ns"]) == get_file_stat(filepath):
+            continue
+        try:
+            entry_map[filename] = get_catalog_entry(filepath)
+        except (OSError, KeyError, ValueError) as e:
+            _logger.warning("Could not read the satellite data file '{:}', it is not included in the catalog: {:}".format(filepath, e))
+            entry_map.pop(filename, None)
+        changed = True
+        count_new += 1
+    catalog["files"] = {filename: entry_map[filename] for filename in sorted(entry_map.keys())}
+    if changed:
+        save_catalog(catalog, filepath_catalog)
+    _logger.info("The satellite data catalog contains {:} files ({:} new or changed).".format(len(catalog["files"]), count_new))
+    return catalog
+
+
+# checks if a file of the catalog has a day with any of the (sorted) in-situ days within its time window, and if its grid overlaps the area
+def entry_overlaps(entry: dict, day_sorted: np.ndarray, width: float, offset: float, lon_range: ty.Tuple[float, float], lat_range: ty.Tuple[float, float]) -> bool:
+    if lon_range[1] < entry["lon_min"] or lon_range[0] > entry["lon_max"] or lat_range[1] < entry["lat_min"] or lat_range[0] > entry["lat_max"]:
+        return False
+    day = np.trunc(np.array(entry["time_second"], dtype=np.float64) / sat_reader._seconds_per_day)
+    start = np.searchsorted(day_sorted, day + (offset - width / 2), side="left")
+    stop = np.searchsorted(day_sorted, day + (offset + width / 2), side="left")
+    return bool(np.any(stop > start))
+
+
+# gets the files of the catalog with names matching the pattern that overlap the in-situ days and area, in alphabetical order
+def get_overlapping_filepath_list(directory: str, catalog: dict, pattern: str, day_sorted: np.ndarray, width: float, offset: float, lon_range: ty.Tuple[float, float], lat_range: ty.Tuple[float, float]) -> ty.List[str]:
+    filepath_list = []
+    for (filename, entry) in catalog["files"].items():
+        if fnmatch.fnmatch(filename, pattern) and entry_overlaps(entry, day_sorted, width, offset, lon_range, lat_range):
+            filepath_list.append(os.path.join(directory, filename))
+    return filepath_list
+
+
+
+
+# main function
+def main() -> None:
+
+    argument_parser = argparse.ArgumentParser(description="Records the contents of the satellite data files in a catalog.")
+    argument_parser.add_argument("directory", help="the directory with the satellite data files")
+    argument_parser.add_argument("--pattern", default=setting_catalog_filename_pattern, help="the names of the satellite data files")
+    arguments = argument_parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    catalog = update_catalog(arguments.directory, arguments.pattern)
+    for (filename, entry) in catalog["files"].items():
+        time_second = np.array(entry["time_second"], dtype=np.float64)
+        time_range = [str(sat_reader._day_origin + np.int64(second)) for second in [time_second.min(), time_second.max()]] if len(time_second) > 0 else ["", ""]
+        print("{:<24s}{:>6d} days  {:s} - {:s}  lon {:.3f} - {:.3f}  lat {:.3f} - {:.3f}  {:s}".format(
+            filename, len(time_second), time_range[0], time_range[1], entry["lon_min"], entry["lon_max"], entry["lat_min"], entry["lat_max"], ", ".join(entry["variables"])))
+
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# satellite data reader
+# reads the satellite chlorophyll data (Copernicus REP NetCDF files) lazily: only the days (time slices) that are needed,
+# and only the part of the grid around the in-situ points, instead of the whole file at once
+
+
+
+import collections
+import typing as ty
+from types import NoneType
+import numpy as np
+import netCDF4
+
+
+
+# USER VARIABLES
+
+# number of decoded day slices (of each file) kept in memory, the least recently used slice is removed first
+setting_day_cache_size = 16
+
+
+
+# PROGRAM CONSTANTS
+
+# the days of the in-situ and satellite data are counted from this time
+_day_origin = np.datetime64("2000-01-01T00:00:00", "s")
+_seconds_per_day = 86400
+
+# the time axis of the satellite files is in seconds since this time (if the time variable doesn't specify its units)
+_sat_time_origin_default = "1981-01-01"
+_sat_time_unit_seconds_map = {
+    "seconds": 1,
+    "minutes": 60,
+    "hours": 3600,
+    "days": _seconds_per_day
+}
+
+_sat_variable_chl = "CHL"
+_sat_variable_quality = "QI"
+_sat_dimension_lon = ["lon", "longitude"]
+_sat_dimension_lat = ["lat", "latitude"]
+_sat_dimension_time = ["time"]
+
+
+
+# OBJECT DEFINITIONS
+
+
+class SatReader(object):
+    def __init__(self, filepath: str, cache_size: int = setting_day_cache_size):
+        self.filepath = filepath
+        self.nc_file = netCDF4.Dataset(filepath, "r") # kept open until close() is called
+        dimensions = self.nc_file.variables[_sat_variable_chl].dimensions
+        self.name_lon = find_name(dimensions, _sat_dimension_lon)
+        self.name_lat = find_name(dimensions, _sat_dimension_lat)
+        self.name_time = find_name(dimensions, _sat_dimension_time)
+        self.lon = np.ma.filled(self.nc_file.variables[self.name_lon][:].astype(np.float64), np.nan)
+        self.lat = np.ma.filled(self.nc_file.variables[self.name_lat][:].astype(np.float64), np.nan)
+        self.time_second = get_time_second(self.nc_file.variables[self.name_time]) # seconds since the day origin, for each day
+        self.day = np.trunc(self.time_second / _seconds_per_day).astype(np.int64) # whole days since the day origin, for each day
+        self.shape = (len(self.lat), len(self.lon))
+        self.variable_list = [name for name in [_sat_variable_chl, _sat_variable_quality] if name in self.nc_file.variables] # the variables of the file that can be read
+        self.cache_size = max(1, cache_size)
+        self.cache = collections.OrderedDict() # (variable name, time index) -> (window, values), the most recently used last
+        self.read_count = 0 # the number of day slices read from the file
+        self.read_cell_count = 0 # the number of grid cells read from the file
+    def __enter__(self):
+        return self
+    def __exit__(self, *args) -> None:
+        self.close()
+    def close(self) -> None:
+        self.cache.clear()
+        self.nc_file.close()
+    def get_day_index_list(self, day_sorted: np.ndarray, width: float, offset: float) -> np.ndarray: # gets the time indexes of the days with at least one of the (sorted) in-situ days within their time window
+        low = self.day + (offset - width / 2)
+        high = self.day + (offset + width / 2)
+        start = np.searchsorted(day_sorted, low, side="left")
+        stop = np.searchsorted(day_sorted, high, side="left")
+        return np.flatnonzero(stop > start)
+    def get_day_slice(self, variable_name: str, time_index: int, window: ty.Tuple[int, int, int, int]) -> ty.Tuple[np.ndarray, ty.Tuple[int, int, int, int]]: # gets the values (lat, lon) of a day within a window (lat start, lat stop, lon start, lon stop), along with the window of the returned values (it can be larger than the requested one)
+        key = (variable_name, int(time_index))
+        cached = self.cache.get(key)
+        if cached is not None and window_contains(cached[0], window):
+            self.cache.move_to_end(key)
+            return (cached[1], cached[0])
+        values = self.read_day_slice(variable_name, time_index, window)
+        self.cache[key] = (window, values)
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return (values, window)
+    def read_day_slice(self, variable_name: str, time_index: int, window: ty.Tuple[int, int, int, int]) -> np.ndarray: # reads the values (lat, lon) of a day within a window from the file, missing values are NaN
+        variable = self.nc_file.variables[variable_name]
+        index_map = {
+            self.name_time: int(time_index),
+            self.name_lat: slice(window[0], window[1]),
+            self.name_lon: slice(window[2], window[3])
+        }
+        values = np.ma.filled(variable[tuple([index_map[name] for name in variable.dimensions])].astype(np.float64), np.nan)
+        if variable.dimensions.index(self.name_lat) > variable.dimensions.index(self.name_lon):
+            values = values.T
+        self.read_count += 1
+        self.read_cell_count += values.size
+        return values
+
+
+
+# FUNCTION DEFINITIONS
+
+
+# gets the name of the first dimension (or variable) of the file with one of the given names
+def find_name(names: ty.Iterable[str], name_list: ty.List[str]) -> str | NoneType:
+    names_lower = {name.lower(): name for name in names}
+    for name in name_list:
+        if name in names_lower:
+            return names_lower[name]
+    return None
+
+
+# gets the times of a time variable as seconds since the day origin
+# the units of the variable are used if they are given as '<unit> since <datetime>', otherwise the values are seconds since 1981-01-01
+def get_time_second(variable) -> np.ndarray:
+    values = np.ma.filled(variable[:].astype(np.float64), np.nan)
+    (multiplier, origin) = (1, _sat_time_origin_default)
+    units = getattr(variable, "units", "").strip().split(" since ")
+    if len(units) == 2 and units[0].lower() in _sat_time_unit_seconds_map:
+        multiplier = _sat_time_unit_seconds_map[units[0].lower()]
+        origin = units[1].strip().replace(" ", "T").rstrip("Z")
+    origin_second = (np.datetime64(origin, "s") - _day_origin).astype(np.float64)
+    return values * multiplier + origin_second
+
+
+# checks if a window (lat start, lat stop, lon start, lon stop) contains another one
+def window_contains(window: ty.Tuple[int, int, int, int], window_inner: ty.Tuple[int, int, int, int]) -> bool:
+    return window[0] <= window_inner[0] and window_inner[1] <= window[1] and window[2] <= window_inner[2] and window_inner[3] <= window[3]
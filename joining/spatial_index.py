@@ -0,0 +1,224 @@
+# spatial index of the in-situ points
+# the in-situ stations are often visited many times at the same coordinates, so the positions of the points are deduplicated into stations
+# and the grid location of each station (its grid cell and interpolation fractions) is found only once for each grid (satellite or bathymetry)
+# the grids are sampled the same way as in the joining notebook (nearest neighbour or bilinear interpolation)
+# it also finds the grid points around a station (within a radius, or the nearest ones with a value), which can be used to fill cloud gaps
+
+
+
+import typing as ty
+import numpy as np
+
+
+
+# PROGRAM CONSTANTS
+
+# radius of the Earth (in meters), used for the distances between the points
+_earth_radius = 6370e3
+
+
+
+# OBJECT DEFINITIONS
+
+
+class GridLocation(object):
+    def __init__(self, grid_lon: np.ndarray, grid_lat: np.ndarray, lon: np.ndarray, lat: np.ndarray):
+        self.grid_lon = grid_lon # the longitude axis of the grid
+        self.grid_lat = grid_lat # the latitude axis of the grid
+        self.shape = (len(grid_lat), len(grid_lon)) # the shape of the grid (lat, lon)
+        self.lon = lon # the longitude of each station
+        self.lat = lat # the latitude of each station
+        self.index_lon = get_fractional_index(grid_lon, lon) # the fractional 1-based longitude index of each station, NaN outside of the grid
+        self.index_lat = get_fractional_index(grid_lat, lat) # the fractional 1-based latitude index of each station, NaN outside of the grid
+        self.is_outside = np.isnan(self.index_lon) | np.isnan(self.index_lat) # True for the stations outside of the grid
+        (self.lon_whole, self.lon_fract) = get_whole_index(np.where(self.is_outside, 1, self.index_lon)) # the grid cell and the interpolation fractions of each station (1-based)
+        (self.lat_whole, self.lat_fract) = get_whole_index(np.where(self.is_outside, 1, self.index_lat))
+        self.nearest_lon = np.floor(np.where(self.is_outside, 1, self.index_lon) - 0.5).astype(np.int64) # the 0-based indexes of the nearest grid point of each station
+        self.nearest_lat = np.floor(np.where(self.is_outside, 1, self.index_lat) - 0.5).astype(np.int64)
+    def get_sample_window(self, station: np.ndarray, margin: ty.Tuple[int, int] = (0, 0)) -> ty.Tuple[int, int, int, int]: # gets the window of the grid (lat start, lat stop, lon start, lon stop) with all grid points needed to sample the stations, extended by the margin (lat, lon) of grid points
+        station = station[~self.is_outside[station]]
+        if len(station) == 0:
+            return (0, 0, 0, 0)
+        # each station uses its grid point and the next one in both directions
+        lon_whole = self.lon_whole[station]
+        lat_whole = self.lat_whole[station]
+        return (
+            int(np.clip(lat_whole.min() - 1 - margin[0], 0, self.shape[0])), int(np.clip(lat_whole.max() + 1 + margin[0], 0, self.shape[0])),
+            int(np.clip(lon_whole.min() - 1 - margin[1], 0, self.shape[1])), int(np.clip(lon_whole.max() + 1 + margin[1], 0, self.shape[1]))
+        )
+    def get_radius_margin(self, radius: float) -> ty.Tuple[int, int]: # gets the number of grid points (lat, lon) around the nearest grid point that can be within the radius (in meters) of a station
+        if len(self.grid_lon) < 2 or len(self.grid_lat) < 2:
+            return (0, 0)
+        step_lat = np.min(np.abs(np.diff(self.grid_lat))) * np.pi / 180 * _earth_radius
+        cos_lat_min = np.cos(np.deg2rad(np.max(np.abs(self.grid_lat))))
+        step_lon = np.min(np.abs(np.diff(self.grid_lon))) * np.pi / 180 * _earth_radius * cos_lat_min
+        return (int(np.ceil(radius / step_lat)) + 1, int(np.ceil(radius / step_lon)) + 1)
+    def get_neighbour_pixels(self, station: np.ndarray, radius: float) -> ty.Tuple[np.ndarray, np.ndarray, np.ndarray]: # gets the 0-based grid indexes (lat, lon) and the distances of the grid points around each station (one row for each station), the distance is infinite for the points outside of the grid or the radius
+        (margin_lat, margin_lon) = self.get_radius_margin(radius)
+        (offset_lat, offset_lon) = np.meshgrid(np.arange(-margin_lat, margin_lat + 1), np.arange(-margin_lon, margin_lon + 1), indexing="ij")
+        index_lat = self.nearest_lat[station][:, None] + offset_lat.ravel()[None, :]
+        index_lon = self.nearest_lon[station][:, None] + offset_lon.ravel()[None, :]
+        inside = (index_lat >= 0) & (index_lat < self.shape[0]) & (index_lon >= 0) & (index_lon < self.shape[1]) & ~self.is_outside[station][:, None]
+        index_lat = np.clip(index_lat, 0, self.shape[0] - 1)
+        index_lon = np.clip(index_lon, 0, self.shape[1] - 1)
+        distance = lon_lat_to_dist(self.lon[station][:, None], self.lat[station][:, None], self.grid_lon[index_lon], self.grid_lat[index_lat])
+        distance = np.where(inside & (distance <= radius), distance, np.inf)
+        return (index_lat, index_lon, distance)
+    def get_pixels_within_radius(self, station: np.ndarray, radius: float) -> ty.Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: # gets all grid points within the radius (in meters) of the stations, as the station, the 0-based grid indexes (lat, lon) and the distance of each grid point
+        (index_lat, index_lon, distance) = self.get_neighbour_pixels(station, radius)
+        (row, column) = np.nonzero(np.isfinite(distance))
+        return (station[row], index_lat[row, column], index_lon[row, column], distance[row, column])
+    def get_nearest_valid_pixels(self, grid: np.ndarray, station: np.ndarray, count: int, radius: float, origin: ty.Tuple[int, int] = (0, 0)) -> ty.Tuple[np.ndarray, np.ndarray]: # gets the values and the distances of the nearest grid points with a value (up to count of them, within the radius in meters) of each station, NaN (and infinite distance) where there are fewer of them
+        # the grid can be a window of the whole grid, with its first point at the 0-based origin (lat, lon), the points outside of the window are not used
+        (index_lat, index_lon, distance) = self.get_neighbour_pixels(station, radius)
+        index_lat = index_lat - origin[0]
+        index_lon = index_lon - origin[1]
+        inside = (index_lat >= 0) & (index_lat < grid.shape[0]) & (index_lon >= 0) & (index_lon < grid.shape[1])
+        values = grid[np.clip(index_lat, 0, grid.shape[0] - 1), np.clip(index_lon, 0, grid.shape[1] - 1)]
+        distance = np.where(inside & ~np.isnan(values), distance, np.inf)
+        order = np.argsort(distance, axis=1, kind="stable")[:, :count]
+        distance = np.take_along_axis(distance, order, axis=1)
+        values = np.where(np.isfinite(distance), np.take_along_axis(values, order, axis=1), np.nan)
+        if values.shape[1] < count:
+            padding = count - values.shape[1]
+            values = np.pad(values, ((0, 0), (0, padding)), constant_values=np.nan)
+            distance = np.pad(distance, ((0, 0), (0, padding)), constant_values=np.inf)
+        return (values, distance)
+
+
+class StationIndex(object):
+    def __init__(self, lon: np.ndarray, lat: np.ndarray):
+        if len(lon) == 0:
+            (positions, inverse) = (np.zeros((0, 2)), np.zeros(0, dtype=np.int64))
+        else:
+            (positions, inverse) = np.unique(np.stack([lon, lat], axis=1), axis=0, return_inverse=True)
+        self.lon = positions[:, 0] # the longitude of each station
+        self.lat = positions[:, 1] # the latitude of each station
+        self.point_station = inverse.ravel() # the station of each point
+        self.location_map = {} # the grid locations of the stations, for each grid (the bytes of its axes)
+    def __len__(self) -> int:
+        return len(self.lon)
+    def get_grid_location(self, grid_lon: np.ndarray, grid_lat: np.ndarray) -> GridLocation: # gets the locations of the stations in a grid, they are found only once for each grid
+        key = (np.asarray(grid_lon, dtype=np.float64).tobytes(), np.asarray(grid_lat, dtype=np.float64).tobytes())
+        location = self.location_map.get(key)
+        if location is None:
+            location = GridLocation(grid_lon, grid_lat, self.lon, self.lat)
+            self.location_map[key] = location
+        return location
+
+
+
+# FUNCTION DEFINITIONS
+
+
+# finds the fractional indexes of the values in an ordered array (like 'bisect_find' with 'interpolate = TRUE' in the notebook)
+# the indexes start at 1 (as in the notebook), values outside of the array get NaN
+def get_fractional_index(array: np.ndarray, values: np.ndarray) -> np.ndarray:
+    if len(array) > 1 and array[0] > array[-1]:
+        # a descending array is searched in reverse
+        return len(array) + 1 - get_fractional_index(array[::-1], values)
+    result = np.full(len(values), np.nan)
+    if len(array) < 2:
+        return result
+    inside = (values >= array[0]) & (values <= array[-1])
+    values = values[inside]
+    # the left point is the last one not above the value, but never the last point of the array
+    left = np.clip(np.searchsorted(array, values, side="right") - 1, 0, len(array) - 2)
+    alpha = (values - array[left]) / (array[left + 1] - array[left])
+    result[inside] = (left + 1) + alpha
+    return result
+
+
+# splits fractional 1-based indexes into their whole and fractional parts
+# the whole part is computed as in the notebook (a whole index points to the next grid point, with a fraction of 0)
+def get_whole_index(index: np.ndarray) -> ty.Tuple[np.ndarray, np.ndarray]:
+    index_whole = np.trunc(index).astype(np.int64) - (index < 0) + (index == np.trunc(index))
+    return (index_whole, np.mod(index, 1))
+
+
+# gets the values of a 2D grid (lat, lon) at whole 1-based indexes, NaN for indexes outside of the grid
+# the grid can be a window of a larger grid, with its first point at the 0-based origin (lat, lon) of the larger grid
+def get_grid_values(grid: np.ndarray, index_lon: np.ndarray, index_lat: np.ndarray, origin: ty.Tuple[int, int] = (0, 0)) -> np.ndarray:
+    (len_lat, len_lon) = grid.shape
+    index_lon = index_lon - 1 - origin[1]
+    index_lat = index_lat - 1 - origin[0]
+    inside = (index_lon >= 0) & (index_lon < len_lon) & (index_lat >= 0) & (index_lat < len_lat)
+    result = np.full(len(index_lon), np.nan)
+    result[inside] = grid[index_lat[inside], index_lon[inside]]
+    return result
+
+
+# samples a 2D grid (lat, lon) at the fractional 1-based indexes of all points at once (like 'bilinear_interpolation' in the notebook)
+# method is one of "NN", "BILIN_NAIVE" and "BILIN_ADVANCED" (the missing values are replaced from the neighbouring points where possible)
+# the grid can be a window of the whole grid (see get_grid_values), it has to contain all grid points of the whole grid used by the points
+# returns the sampled values, NaN for points without a value
+def sample_grid(grid: np.ndarray, index_lon: np.ndarray, index_lat: np.ndarray, method: str, origin: ty.Tuple[int, int] = (0, 0)) -> np.ndarray:
+    (a_whole, a_fract) = get_whole_index(index_lon)
+    (b_whole, b_fract) = get_whole_index(index_lat)
+
+    if method == "NN":
+        return get_grid_values(grid, a_whole + (a_fract > 0.5), b_whole + (b_fract > 0.5), origin)
+
+    p11 = get_grid_values(grid, a_whole, b_whole, origin)
+    p12 = get_grid_values(grid, a_whole, b_whole + 1, origin)
+    p21 = get_grid_values(grid, a_whole + 1, b_whole, origin)
+    p22 = get_grid_values(grid, a_whole + 1, b_whole + 1, origin)
+    n11 = np.isnan(p11)
+    n12 = np.isnan(p12)
+    n21 = np.isnan(p21)
+    n22 = np.isnan(p22)
+    na_count = n11.astype(np.int64) + n12 + n21 + n22
+
+    if method == "BILIN_ADVANCED":
+        # only one point doesn't have a value, replace it with the average of its two neighbours
+        one = na_count == 1
+        p11 = np.where(one & n11, (p12 + p21) / 2, p11)
+        p12 = np.where(one & n12, (p11 + p22) / 2, p12)
+        p21 = np.where(one & n21, (p11 + p22) / 2, p21)
+        p22 = np.where(one & n22, (p12 + p21) / 2, p22)
+
+    # full bilinear interpolation, the average of both directions
+    edgeW = p11 * (1 - a_fract) + p21 * a_fract
+    edgeE = p12 * (1 - a_fract) + p22 * a_fract
+    bilin1 = edgeW * (1 - b_fract) + edgeE * b_fract
+    edgeS = p11 * (1 - b_fract) + p12 * b_fract
+    edgeN = p21 * (1 - b_fract) + p22 * b_fract
+    bilin2 = edgeS * (1 - a_fract) + edgeN * a_fract
+    result = (bilin1 + bilin2) / 2
+    if method != "BILIN_ADVANCED":
+        return np.where(na_count == 0, result, np.nan)
+
+    # two opposite points with missing values, interpolate along the other diagonal
+    fract_12_21 = (a_fract + (1 - b_fract)) / 2
+    fract_11_22 = (a_fract + b_fract) / 2
+    # only a single point has a value, use this point
+    p_single = np.where(~n11, p11, np.where(~n12, p12, np.where(~n21, p21, p22)))
+    condition_list = [
+        na_count <= 1,
+        (na_count == 2) & n11 & n22,
+        (na_count == 2) & n12 & n21,
+        (na_count == 2) & n11 & n12,
+        (na_count == 2) & n21 & n22,
+        (na_count == 2) & n11 & n21,
+        (na_count == 2) & n12 & n22,
+        na_count == 3
+    ]
+    choice_list = [
+        result,
+        p12 * (1 - fract_12_21) + p21 * fract_12_21,
+        p11 * (1 - fract_11_22) + p22 * fract_11_22,
+        p21 * (1 - b_fract) + p22 * b_fract,
+        p11 * (1 - b_fract) + p12 * b_fract,
+        p12 * (1 - a_fract) + p22 * a_fract,
+        p11 * (1 - a_fract) + p21 * a_fract,
+        p_single
+    ]
+    return np.select(condition_list, choice_list, default=np.nan)
+
+
+# calculates the distance (in meters) between points given in degrees (lon, lat)
+# works well for small distances
+def lon_lat_to_dist(lon1: np.ndarray, lat1: np.ndarray, lon2: np.ndarray, lat2: np.ndarray) -> np.ndarray:
+    dist_lon = (lon2 - lon1) * np.cos(np.deg2rad((lat1 + lat2) / 2)) * _earth_radius * np.pi / 180
+    dist_lat = (lat2 - lat1) * _earth_radius * np.pi / 180
+    return np.sqrt(dist_lon ** 2 + dist_lat ** 2)
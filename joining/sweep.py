@@ -0,0 +1,282 @@
+# parameter sweep of the matchup
+# joins the in-situ data with the satellite data for every combination of the settings in a grid (sampling method, time window,
+# sea floor height limit, quality threshold, file marks and area) and saves the accuracy statistics of all of them into one table
+# the in-situ data is read once, each satellite day is read once and sampled with all methods for all time windows,
+# and the other settings are only filters applied to the matched data afterwards
+
+
+
+import os
+import sys
+import csv
+import logging
+import argparse
+import itertools
+import typing as ty
+from types import NoneType
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# the bathymetry module is next to the in-situ data script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "situ"))
+import matchup
+import sat_reader
+import sat_catalog
+import matchup_cache
+import accuracy_stats
+import bathymetry
+
+
+
+# USER VARIABLES
+
+# the sampling methods (see 'setting_matchup_sampling_method' in matchup.py)
+setting_sweep_method_list = ["NN", "BILIN_NAIVE", "BILIN_ADVANCED"]
+
+# the time windows, as (width, offset) in days (see 'setting_day_width_interval' and 'setting_day_offset_interval' in matchup.py)
+setting_sweep_day_window_list = [
+    (1, 0.5),
+    (2, 0.5),
+    (3, 0.5),
+]
+
+# the limits of the sea floor height (lower bound, upper bound), the height is negative below sea level (the 'actual_depth' of the notebook, see get_floor_height)
+# None doesn't limit the height (and doesn't need the sea floor depths)
+setting_sweep_floor_height_limit_list = [
+    None,
+    #(-np.inf, 0), # any depth
+    #(-np.inf, -10), # at or below 10m
+    #(-np.inf, -20), # at or below 20m
+]
+
+# the quality thresholds (None ignores the quality)
+setting_sweep_min_quality_threshold_list = [matchup.setting_situ_min_quality_threshold]
+
+# the lists of file marks (an empty list uses all files)
+setting_sweep_file_mark_list_list = [matchup.setting_acceptable_file_mark_list]
+
+# the areas, as (lon min, lon max, lat min, lat max)
+setting_sweep_area_list = [
+    (matchup.setting_limit_lon_min, matchup.setting_limit_lon_max, matchup.setting_limit_lat_min, matchup.setting_limit_lat_max),
+]
+
+# paths to each of the bathymetry files (only used if the height is limited and the in-situ data doesn't have the sea floor depths of all measurements)
+setting_filepath_bathymetry_depth = "../data/bathymetry/bathy_h.ascii"
+setting_filepath_bathymetry_lat = "../data/bathymetry/bathy_lat.ascii"
+setting_filepath_bathymetry_lon = "../data/bathymetry/bathy_lon.ascii"
+
+# path to the results of the sweep (one row for each combination of the settings)
+filepath_to_sweep_results_csv = "sweep_results.csv"
+
+
+
+# PROGRAM VARIABLES
+
+_logger = logging.getLogger("sweep")
+
+
+
+# PROGRAM CONSTANTS
+
+# the columns of the results with the settings, followed by the accuracy statistics
+_setting_column_list = ["method", "day_width", "day_offset", "floor_height_min", "floor_height_max", "min_quality", "file_marks", "lon_min", "lon_max", "lat_min", "lat_max", "situ_count", "joined_count"]
+
+
+
+# OBJECT DEFINITIONS
+
+
+class SweepSetting(object):
+    def __init__(self, method: str, day_window: ty.Tuple[float, float], floor_height_limit: ty.Tuple[float, float] | NoneType, min_quality_threshold: float | NoneType, file_mark_list: ty.List[str], area: ty.Tuple[float, float, float, float]):
+        self.method = method
+        self.day_window = (float(day_window[0]), float(day_window[1])) # (width, offset)
+        self.floor_height_limit = floor_height_limit # None if the height is not limited
+        self.min_quality_threshold = min_quality_threshold
+        self.file_mark_list = file_mark_list
+        self.area = area # (lon min, lon max, lat min, lat max)
+    def get_row(self) -> ty.List[str]: # gets the values of the setting columns of the results
+        (height_min, height_max) = ("", "") if self.floor_height_limit is None else (str(self.floor_height_limit[0]), str(self.floor_height_limit[1]))
+        return [self.method, str(self.day_window[0]), str(self.day_window[1]), height_min, height_max,
+            "" if self.min_quality_threshold is None else str(self.min_quality_threshold), " ".join(self.file_mark_list)] + [str(value) for value in self.area]
+
+
+
+# FUNCTION DEFINITIONS
+
+
+# gets all combinations of the settings
+def get_setting_list(
+    method_list: ty.List[str] = setting_sweep_method_list,
+    day_window_list: ty.List[ty.Tuple[float, float]] = setting_sweep_day_window_list,
+    floor_height_limit_list: ty.List[ty.Tuple[float, float] | NoneType] = setting_sweep_floor_height_limit_list,
+    min_quality_threshold_list: ty.List[float | NoneType] = setting_sweep_min_quality_threshold_list,
+    file_mark_list_list: ty.List[ty.List[str]] = setting_sweep_file_mark_list_list,
+    area_list: ty.List[ty.Tuple[float, float, float, float]] = setting_sweep_area_list
+) -> ty.List[SweepSetting]:
+    for method in method_list:
+        if method not in matchup._sampling_method_list:
+            raise ValueError("Unknown sampling method '{:}', the options are: {:}".format(method, ", ".join(matchup._sampling_method_list)))
+    return [SweepSetting(*values) for values in itertools.product(method_list, day_window_list, floor_height_limit_list, min_quality_threshold_list, file_mark_list_list, area_list)]
+
+
+# gets the height of the sea floor at the measurements (negative below sea level, so the opposite of the 'floor_depth' column of the in-situ data)
+# it is taken from the 'floor_depth' column (filled by ODV_parse.py with the '--bathymetry' argument), only the measurements without it are sampled from the bathymetry data (like section 2.3 of the notebook)
+def get_floor_height(columns: ty.Dict[str, np.ndarray]) -> np.ndarray:
+    floor_height = -matchup.parse_float_column(columns["floor_depth"]) if "floor_depth" in columns else np.full(len(columns["lon"]), np.nan)
+    missing = np.isnan(floor_height) & ~np.isnan(columns["lon"]) & ~np.isnan(columns["lat"])
+    if np.any(missing):
+        _logger.info("Sampling the sea floor height of {:} measurements without a sea floor depth from the bathymetry data.".format(np.count_nonzero(missing)))
+        grid = bathymetry.load_bathymetry(setting_filepath_bathymetry_depth, setting_filepath_bathymetry_lat, setting_filepath_bathymetry_lon)
+        floor_height[missing] = grid.sample_height(columns["lon"][missing], columns["lat"][missing])
+    return floor_height
+
+
+# finds the measurements that pass the filters of a setting (a mask of the in-situ data)
+def get_setting_mask(setting: SweepSetting, columns: ty.Dict[str, np.ndarray], floor_height: np.ndarray | NoneType) -> np.ndarray:
+    keep = matchup.get_situ_filter_mask(columns,
+        lon_range=setting.area[0:2], lat_range=setting.area[2:4], min_quality_threshold=setting.min_quality_threshold, file_mark_list=setting.file_mark_list)
+    if setting.floor_height_limit is not None:
+        # like in the notebook, an infinite bound also keeps the measurements without a height
+        (height_min, height_max) = setting.floor_height_limit
+        with np.errstate(invalid="ignore"):
+            keep &= (height_min == -np.inf) | (floor_height >= height_min)
+            keep &= (height_max == np.inf) | (floor_height <= height_max)
+    return keep
+
+
+# matches the in-situ measurements with the satellite data of a file for all sampling methods and time windows at once
+# each day is read once (the part of the grid around the measurements of all time windows) and each station is sampled once with each method (or taken from the cache),
+# the results are the same as separate runs of 'matchup.matchup_sat_data'
+def matchup_sat_data_sweep(situ: matchup.SituData, reader: sat_reader.SatReader, result_map: ty.Dict[ty.Tuple[str, float, float], matchup.MatchupResult], method_list: ty.List[str], day_window_list: ty.List[ty.Tuple[float, float]], gap_fill_radius: float = matchup.setting_matchup_gap_fill_radius, gap_fill_count: int = matchup.setting_matchup_gap_fill_count, cache: matchup_cache.MatchupCache | NoneType = None) -> None:
+    location = situ.station_index.get_grid_location(reader.lon, reader.lat)
+    day_index_map = {day_window: set(reader.get_day_index_list(situ.day_sorted, *day_window).tolist()) for day_window in day_window_list}
+    for day_index in sorted(set().union(*day_index_map.values())):
+        row_map = {}
+        for day_window in day_window_list:
+            if day_index not in day_index_map[day_window]:
+                continue
+            rows = situ.get_day_window_rows(reader.day[day_index], *day_window)
+            # measurements outside of the satellite grid are skipped
+            outside = location.is_outside[situ.station_index.point_station[rows]]
+            for method in method_list:
+                result_map[(method, *day_window)].skipped_count += np.count_nonzero(outside)
+            if np.any(~outside):
+                row_map[day_window] = rows[~outside]
+        if len(row_map) == 0:
+            continue
+        station = np.unique(situ.station_index.point_station[np.concatenate(list(row_map.values()))])
+        for method in method_list:
+            # the first method reads the day, the others reuse it from the reader's cache
+            values = matchup.get_sat_day_values(reader, location, station, day_index, method, gap_fill_radius, gap_fill_count, False, cache)[:, 0]
+            for (day_window, rows) in row_map.items():
+                result = result_map[(method, *day_window)]
+                result.sampled_count += len(rows)
+                result.update(rows, values[np.searchsorted(station, situ.station_index.point_station[rows])], reader.time_second[day_index], situ.cap_second[rows], day_window[1])
+
+
+# gets the satellite data files that overlap the in-situ days and area of any of the time windows, in alphabetical order
+def get_sat_filepath_list(directory: str, pattern: str, situ: matchup.SituData, day_window_list: ty.List[ty.Tuple[float, float]]) -> ty.List[str]:
+    catalog = sat_catalog.update_catalog(directory)
+    if len(situ) == 0:
+        return []
+    filepath_set = set()
+    for (width, offset) in day_window_list:
+        filepath_set.update(sat_catalog.get_overlapping_filepath_list(directory, catalog, pattern, situ.day_sorted, width, offset,
+            (np.min(situ.lon), np.max(situ.lon)), (np.min(situ.lat), np.max(situ.lat))))
+    return sorted(filepath_set)
+
+
+# joins the in-situ data with the satellite data for all settings and calculates the accuracy statistics of each of them
+# returns the rows of the results table
+def sweep(columns: ty.Dict[str, np.ndarray], sat_directory: str, sat_pattern: str, setting_list: ty.List[SweepSetting], cache: matchup_cache.MatchupCache | NoneType = None) -> ty.List[ty.List[str]]:
+    method_list = list(dict.fromkeys([setting.method for setting in setting_list]))
+    day_window_list = list(dict.fromkeys([setting.day_window for setting in setting_list]))
+
+    # the measurements that pass the filters of any setting are matched once
+    keep = np.zeros(len(columns["chl"]), dtype=bool)
+    floor_height = None
+    if any([setting.floor_height_limit is not None for setting in setting_list]):
+        floor_height = get_floor_height(columns)
+    for setting in setting_list:
+        keep |= get_setting_mask(setting, columns, floor_height)
+    columns = {column_name: values[keep] for (column_name, values) in columns.items()}
+    floor_height = floor_height[keep] if floor_height is not None else None
+    situ = matchup.SituData(columns)
+    _logger.info("The in-situ data frame contains {:} data points for all settings.".format(len(situ)))
+
+    result_map = {(method, *day_window): matchup.MatchupResult(len(situ)) for method in method_list for day_window in day_window_list}
+    sat_filepath_list = get_sat_filepath_list(sat_directory, sat_pattern, situ, day_window_list)
+    for (i, filepath) in enumerate(sat_filepath_list, start = 1):
+        _logger.info("Satellite file {:}, {:}/{:}".format(os.path.basename(filepath), i, len(sat_filepath_list)))
+        with sat_reader.SatReader(filepath) as reader:
+            matchup_sat_data_sweep(situ, reader, result_map, method_list, day_window_list, cache=cache)
+            _logger.debug("Read {:} of {:} days ({:} grid points).".format(reader.read_count, len(reader.day), reader.read_cell_count))
+
+    # only the first of the repeated measurements is matched, the others get its values (they have the same time and position)
+    (group, index_first) = matchup.get_distinct_groups(situ)
+    row_list = []
+    for setting in setting_list:
+        result = result_map[(setting.method, *setting.day_window)]
+        rows = np.flatnonzero(get_setting_mask(setting, columns, floor_height))
+        # the repeated measurements are removed after filtering, like in the notebook
+        (_, index_distinct) = np.unique(group[rows], return_index=True)
+        rows = rows[np.sort(index_distinct)]
+        chl_sat = result.chl_sat[index_first[group[rows]]]
+        joined = rows[~np.isnan(chl_sat)]
+        chl_sat = chl_sat[~np.isnan(chl_sat)]
+        valid = accuracy_stats.get_valid_rows(situ.chl[joined], chl_sat)
+        stats = accuracy_stats.get_accuracy_stats(situ.chl[joined], chl_sat, valid)
+        row_list.append(setting.get_row() + [str(len(rows)), str(len(joined))] + [str(stats[name]) for (name, _, _) in accuracy_stats._stat_description_list])
+    return row_list
+
+
+# saves the results table
+def save_results(row_list: ty.List[ty.List[str]], filepath: str) -> None:
+    with open(filepath, "w", encoding="UTF-8", newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(_setting_column_list + [name for (name, _, _) in accuracy_stats._stat_description_list])
+        writer.writerows(row_list)
+
+
+
+
+# main function
+def main() -> None:
+
+    argument_parser = argparse.ArgumentParser(description="Joins the in-situ data with the satellite data for every combination of the settings and saves the accuracy statistics of all of them.")
+    argument_parser.add_argument("--situ", default=matchup.path_to_in_situ, help="the in-situ data (output of ODV_parse.py)")
+    argument_parser.add_argument("--sat", default=matchup.path_to_sat, help="the directory with the satellite data files")
+    argument_parser.add_argument("--pattern", default=matchup.setting_sat_filename_pattern, help="the names of the satellite data files")
+    argument_parser.add_argument("--method", nargs="+", default=setting_sweep_method_list, choices=matchup._sampling_method_list, help="the sampling methods")
+    argument_parser.add_argument("--day-window", type=float, nargs=2, action="append", metavar=("WIDTH", "OFFSET"), help="a time window (in days), can be given more times")
+    argument_parser.add_argument("--height-limit", type=float, nargs=2, action="append", metavar=("MIN", "MAX"), help="a sea floor height limit, negative below sea level (use -inf or inf for no bound), can be given more times")
+    argument_parser.add_argument("--quality", type=float, nargs="+", help="the quality thresholds")
+    argument_parser.add_argument("--out", default=filepath_to_sweep_results_csv, help="the results table (.csv file)")
+    argument_parser.add_argument("--cache", default=matchup.filepath_to_matchup_cache, help="the matchup cache (SQLite file), which keeps the sampled satellite values between runs")
+    arguments = argument_parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    setting_list = get_setting_list(
+        arguments.method,
+        [tuple(day_window) for day_window in arguments.day_window] if arguments.day_window else setting_sweep_day_window_list,
+        [tuple(limit) for limit in arguments.height_limit] if arguments.height_limit else setting_sweep_floor_height_limit_list,
+        arguments.quality if arguments.quality else setting_sweep_min_quality_threshold_list
+    )
+    _logger.info("Sweeping {:} combinations of the settings.".format(len(setting_list)))
+    columns = matchup.read_situ_data(arguments.situ)
+    cache = matchup_cache.MatchupCache(arguments.cache) if arguments.cache is not None else None
+    try:
+        row_list = sweep(columns, arguments.sat, arguments.pattern, setting_list, cache)
+    finally:
+        if cache is not None:
+            _logger.info("Matchup cache: {:} station values reused, {:} sampled.".format(cache.hit_count, cache.miss_count))
+            cache.close()
+    save_results(row_list, arguments.out)
+    _logger.info("Saved the results into '{:}'.".format(arguments.out))
+
+
+
+
+if __name__ == "__main__":
+    main()